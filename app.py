@@ -1,6 +1,19 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
+from models.parallel_scorer import pool_stats
+from models.scorers import parse_scorers
+from models.trend_engine import GRANULARITIES
 from reddit_sentiment import ReviewSentimentAnalyzer
+from utils import metrics
+from utils.job_queue import DONE, FAILED, JobQueue, JobStore
+from utils.profiling import RequestProfiler, requested_mode
+from utils.response import compact_sentiment, json_response
+from utils.result_cache import ResultCache
+from utils.single_flight import SingleFlight
+from visualization.chart_service import CHART_KINDS, MIMETYPES, ChartService, chart_data, chart_key
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -8,9 +21,192 @@ load_dotenv()
 
 app = Flask(__name__)
 
-# Initialize analyzers
+# Initialize analyzers (cheap: the Reddit client and lexicons are loaded lazily)
 review_analyzer = ReviewSentimentAnalyzer()
 
+# Load NLTK, the lexicons and the Reddit client in the background so the worker
+# can accept requests right away; a request arriving first simply waits for them.
+if os.getenv('WARM_UP', '1') != '0':
+    threading.Thread(target=review_analyzer.warm_up, daemon=True).start()
+
+# Keep the local review corpus fresh when it is enabled (USE_REVIEW_CORPUS=1)
+corpus_ingester = review_analyzer.start_corpus_ingester()
+
+# Cache successful analyses so repeat lookups skip the Reddit search and scoring.
+# Concurrent misses for the same query share one search, also across gunicorn
+# workers (see utils/single_flight.py; SINGLE_FLIGHT_DIR=off for in-process only).
+result_cache = ResultCache(
+    ttl=int(os.getenv('RESULT_CACHE_TTL', 300)),
+    max_size=int(os.getenv('RESULT_CACHE_MAX_SIZE', 256)),
+    stale_ttl=int(os.getenv('RESULT_CACHE_STALE_TTL', 600)),
+    single_flight=SingleFlight()
+)
+
+# Charts are rendered on a worker-process pool (started on first use) and cached by content hash
+chart_service = ChartService()
+
+def _analysis_failure(data, default):
+    return RuntimeError(data.get('error') or data.get('message') or default) if data else RuntimeError(default)
+
+def _run_analyze_job(params, report):
+    """Background /analyze: streams the search so running aggregates show up as job progress."""
+    search_query, scorers = params['search_query'], params.get('scorers')
+
+    def compute(_):
+        report({'stage': 'searching'})
+        for event in review_analyzer.stream_sentiment(search_query, scorers=scorers):
+            if event['type'] == 'summary':
+                report({'stage': 'scoring', **{k: v for k, v in event.items() if k != 'type'}})
+            elif event['type'] == 'done':
+                return event['result']
+            elif event['type'] == 'error':
+                return {'success': False, 'error': event['error']}
+
+    sentiment_data = result_cache.get_or_compute(
+        _cache_key(search_query, scorers), compute,
+        should_cache=lambda data: bool(data and data.get('success'))
+    )
+    if not sentiment_data or not sentiment_data.get('success', False):
+        raise _analysis_failure(sentiment_data, 'Analysis failed')
+    return {'search_query': search_query, 'sentiment': sentiment_data}
+
+def _complete_comparison(data):
+    """Only cache comparisons where every title's searches succeeded."""
+    return bool(data and data.get('success') and not any(data.get('errors') or []))
+
+def _run_compare_job(params, report):
+    """Background /compare."""
+    titles, scorers, period = params['titles'], params.get('scorers'), params['period']
+    report({'stage': 'searching', 'titles': len(titles)})
+    comparison = result_cache.get_or_compute(
+        _compare_key(titles, scorers, period),
+        lambda _: review_analyzer.compare_titles(titles, scorers=scorers, period=period),
+        should_cache=_complete_comparison
+    )
+    if not comparison.get('success', False):
+        raise _analysis_failure(comparison, 'Comparison failed')
+    return comparison
+
+# Async mode (?async=1 on /analyze and /compare): jobs go to a SQLite job store shared by
+# all workers and run on JOB_WORKERS background threads per worker, so a request
+# returns a job id right away instead of holding a sync worker for the whole analysis.
+# Workers start with the app, so jobs still queued (or abandoned) from a previous run are picked up.
+try:
+    job_queue = JobQueue(JobStore(), {'analyze': _run_analyze_job, 'compare': _run_compare_job}).start()
+except Exception as e:
+    print(f"WARNING: Job store unavailable, async mode disabled: {e}")
+    job_queue = None
+
+@metrics.register_collector
+def _component_metrics():
+    """Cache, dedup and pool counters the components already keep, read at scrape time."""
+    cache = result_cache.stats()
+    yield ('book_review_result_cache_events_total', 'counter', 'Result cache lookups by outcome, and evictions',
+           [({'event': event}, cache[event]) for event in ('hits', 'stale_hits', 'misses', 'evictions')])
+    yield ('book_review_result_cache_entries', 'gauge', 'Queries in the result cache', [({}, cache['size'])])
+    if result_cache.single_flight is not None:
+        flights = result_cache.single_flight.stats()
+        yield ('book_review_single_flight_total', 'counter',
+               'Cache-miss computations run here, or coalesced onto another thread / worker, or run after a wait timed out',
+               [({'outcome': outcome}, flights[outcome]) for outcome in ('executed', 'coalesced_local', 'coalesced_remote', 'timeouts')])
+
+    if review_analyzer.score_store is not None:
+        store = review_analyzer.score_store.stats()
+        yield ('book_review_score_store_lookups_total', 'counter', 'Post score store lookups by outcome',
+               [({'result': 'hit'}, store['hits']), ({'result': 'miss'}, store['misses'])])
+
+    if job_queue is not None:
+        jobs = job_queue.stats()
+        yield ('book_review_jobs_total', 'counter', 'Async jobs submitted, joined onto an identical pending job, completed or failed here',
+               [({'event': event}, jobs[event]) for event in ('submitted', 'deduplicated', 'completed', 'failed')])
+        yield ('book_review_jobs', 'gauge', 'Jobs in the job store by status',
+               [({'status': status}, count) for status, count in job_queue.store.stats().items()])
+
+    charts = chart_service.stats()
+    yield ('book_review_chart_requests_total', 'counter', 'Chart requests served from the cache or rendered',
+           [({'result': 'hit'}, charts['hits']), ({'result': 'render'}, charts['renders'])])
+    yield ('book_review_chart_cache_bytes', 'gauge', 'Bytes of rendered charts cached', [({}, charts['cache_bytes'])])
+    yield ('book_review_chart_renders_in_flight', 'gauge', 'Charts being rendered on the pool', [({}, charts['in_flight'])])
+
+    if review_analyzer.deduplicator is not None:
+        dedup = review_analyzer.deduplicator.stats()
+        yield ('book_review_dedup_posts_total', 'counter', 'Posts checked for duplicates, and dropped by match kind',
+               [({'kind': kind}, dedup[kind]) for kind in ('seen', 'exact', 'crosspost', 'near')])
+
+    scoring = pool_stats()
+    yield ('book_review_scoring_batches_total', 'counter', 'Parallel-mode scoring batches run in-process (small) or on the process pool',
+           [({'where': 'local'}, scoring['local_batches']), ({'where': 'pool'}, scoring['pool_batches'])])
+    yield ('book_review_scoring_pool_chunks_total', 'counter', 'Chunks sent to scoring pools', [({}, scoring['pool_chunks'])])
+    yield ('book_review_scoring_pool_failures_total', 'counter', 'Scoring pool failures', [({}, scoring['pool_failures'])])
+    yield ('book_review_scoring_pool_workers', 'gauge', 'Worker processes in live scoring pools', [({}, scoring['pool_workers'])])
+
+@app.before_request
+def _start_request():
+    g.request_start = time.perf_counter()
+    # Opt-in profiling (PROFILING_ENABLED=1): ?profile=1 or X-Profile: cprofile|pyinstrument
+    mode = requested_mode(request.values, request.headers)
+    if mode is not None:
+        g.profiler = RequestProfiler.start(mode)
+        g.profile_busy = g.profiler is None
+
+@app.after_request
+def _finish_request(response):
+    # For streamed responses this is the time to the first byte, not to the end of the stream
+    endpoint = request.endpoint or 'unmatched'
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        report = profiler.stop()
+        if response.is_streamed:
+            response.headers['X-Profile'] = 'unavailable for streamed responses'
+        else:
+            # The report replaces the body; the original status is kept in a header
+            return Response(report, mimetype='text/plain',
+                            headers={'X-Profile': profiler.mode, 'X-Profiled-Status': str(response.status_code)})
+    elif g.pop('profile_busy', False):
+        response.headers['X-Profile'] = 'busy' # Another request is being profiled
+    return response
+
+@app.teardown_request
+def _stop_profiler(error=None):
+    # Only reached with a profiler still running if the view raised before after_request
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Stage timings, request latency and component counters in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def _requested_scorers():
+    """Scorer names from ?scorers=vader_fast,textblob, or None for the server defaults. Raises ValueError."""
+    spec = request.values.get('scorers')
+    return parse_scorers(spec) if spec else None
+
+def _cache_key(search_query, scorers):
+    # Results computed with a non-default scorer selection are cached separately
+    return search_query if scorers is None else f"{search_query}\x1f{','.join(scorers)}"
+
+def _compare_key(titles, scorers, period):
+    return _cache_key(f"compare:{period}: {' | '.join(titles)}", scorers)
+
+def _wants_job():
+    return request.values.get('async', '').lower() in ('1', 'true', 'yes')
+
+def _submit_job(kind, params, dedup_key):
+    """202 with the job id and where to poll it; identical pending submissions share one job."""
+    if job_queue is None:
+        return jsonify({'error': 'Async mode is unavailable.'}), 503
+    job_id, created = job_queue.submit(kind, params, dedup_key=ResultCache.normalize_key(dedup_key))
+    status_url = f'/jobs/{job_id}'
+    response = jsonify({'job_id': job_id, 'created': created, 'status_url': status_url,
+                        'events_url': f'{status_url}/events'})
+    response.headers['Location'] = status_url
+    return response, 202
+
 @app.route('/')
 def index():
     
@@ -25,8 +221,21 @@ def analyze():
         if not search_query:
             return jsonify({'error': 'Please enter a book title or author.'}), 400
 
-        # Fetch Reddit reviews
-        sentiment_data = review_analyzer.analyze_sentiment(search_query)
+        try:
+            scorers = _requested_scorers()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if _wants_job():
+            return _submit_job('analyze', {'search_query': search_query, 'scorers': scorers},
+                               f"analyze:{_cache_key(search_query, scorers)}")
+
+        # Fetch Reddit reviews (served from the result cache when possible)
+        sentiment_data = result_cache.get_or_compute(
+            _cache_key(search_query, scorers),
+            lambda _: review_analyzer.analyze_sentiment(search_query, scorers=scorers),
+            should_cache=lambda data: bool(data and data.get('success'))
+        )
 
     
         result = {
@@ -36,15 +245,219 @@ def analyze():
 
         # Check if sentiment analysis itself returned an error
         if sentiment_data and not sentiment_data.get('success', False):
-             # Pass the error message from the analyzer if available
-             return jsonify({'error': sentiment_data.get('error', 'Analysis failed')}), 500
+             # Pass the error message from the analyzer if available (503 if Reddit is rate limiting / down)
+             status = 503 if sentiment_data.get('reddit_unavailable') else 500
+             return jsonify({'error': sentiment_data.get('error', 'Analysis failed')}), status
+
+        # Lean mode: ?format=compact with optional fields, snippet, page_size, category and cursor
+        if request.values.get('format') == 'compact':
+            fields = [f for f in request.values.get('fields', '').split(',') if f]
+            result['sentiment'] = compact_sentiment(
+                sentiment_data,
+                fields=fields,
+                snippet=request.values.get('snippet', 200, type=int),
+                page_size=min(max(request.values.get('page_size', 20, type=int), 1), 100),
+                category=request.values.get('category'),
+                cursor=request.values.get('cursor')
+            )
 
-        return jsonify(result)
+        return json_response(result, accept_encoding=request.headers.get('Accept-Encoding', ''))
 
     except Exception as e:
         # Log the exception for debugging
         print(f"Error in /analyze route: {str(e)}")
         return jsonify({'error': f'An internal server error occurred: {str(e)}'}), 500
 
+def _requested_titles():
+    """
+    Titles from a JSON body {"titles": [...]} or form field(s) `titles` (one per
+    line, or repeated), de-duplicated case-insensitively. Raises ValueError.
+    """
+    payload = request.get_json(silent=True) or {}
+    titles = payload.get('titles') if isinstance(payload, dict) else None
+    if titles is None:
+        titles = [line for value in request.form.getlist('titles') for line in value.splitlines()]
+    if not isinstance(titles, list) or not all(isinstance(title, str) for title in titles):
+        raise ValueError('titles must be a list of book titles or authors.')
+    unique = {}
+    for title in titles:
+        if title.strip():
+            unique.setdefault(ResultCache.normalize_key(title), title.strip())
+    if not unique:
+        raise ValueError('Please enter at least one book title or author.')
+    max_titles = int(os.getenv('COMPARE_MAX_TITLES', 50))
+    if len(unique) > max_titles:
+        raise ValueError(f'At most {max_titles} titles can be compared at once.')
+    return list(unique.values())
+
+@app.route('/compare', methods=['POST'])
+def compare():
+    """Sentiment for several titles in one call, as per-title columns (see ReviewSentimentAnalyzer.compare_titles)."""
+    try:
+        titles = _requested_titles()
+        scorers = _requested_scorers()
+        period = request.values.get('period') or (request.get_json(silent=True) or {}).get('period') or 'M'
+        if period not in GRANULARITIES:
+            raise ValueError(f"period must be one of {', '.join(GRANULARITIES)}.")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    key = _compare_key(titles, scorers, period)
+    if _wants_job():
+        return _submit_job('compare', {'titles': titles, 'scorers': scorers, 'period': period}, key)
+
+    try:
+        comparison = result_cache.get_or_compute(
+            key,
+            lambda _: review_analyzer.compare_titles(titles, scorers=scorers, period=period),
+            should_cache=_complete_comparison
+        )
+        if not comparison.get('success', False):
+            # 503 if Reddit is rate limiting / down, as for /analyze
+            status = 503 if comparison.get('reddit_unavailable') else 500
+            return jsonify({'error': comparison.get('error', 'Comparison failed')}), status
+        return json_response(comparison, accept_encoding=request.headers.get('Accept-Encoding', ''))
+    except Exception as e:
+        print(f"Error in /compare route: {str(e)}")
+        return jsonify({'error': f'An internal server error occurred: {str(e)}'}), 500
+
+def _cached_events(sentiment_data):
+    """Replay a cached analyze_sentiment result as stream events."""
+    for category in ('positive', 'neutral', 'negative'):
+        for post in sentiment_data.get(f'{category}_posts', []):
+            yield {'type': 'post', 'post': post}
+    yield {'type': 'done', 'result': sentiment_data}
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Streams each scored post as NDJSON as soon as it is ready, plus periodic running aggregates."""
+    search_query = request.form.get('search_query', '')
+
+    if not search_query:
+        return jsonify({'error': 'Please enter a book title or author.'}), 400
+
+    try:
+        scorers = _requested_scorers()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cache_key = _cache_key(search_query, scorers)
+
+    def generate():
+        cached = result_cache.get(cache_key)
+        events = _cached_events(cached) if cached else review_analyzer.stream_sentiment(search_query, scorers=scorers)
+        try:
+            for event in events:
+                if event['type'] == 'done':
+                    sentiment_data = event['result']
+                    if cached is None and sentiment_data.get('success'):
+                        result_cache.set(cache_key, sentiment_data)
+                    # Posts were already streamed; only send the final aggregates
+                    event = {
+                        'type': 'done',
+                        'search_query': search_query,
+                        'sentiment': {k: v for k, v in sentiment_data.items() if not k.endswith('_posts')}
+                    }
+                yield json.dumps(event) + '\n'
+        except Exception as e:
+            print(f"Error in /analyze/stream route: {str(e)}")
+            yield json.dumps({'type': 'error', 'error': f'An internal server error occurred: {str(e)}'}) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Don't let a reverse proxy buffer the stream
+    return response
+
+def _job_view(job):
+    view = {'job_id': job['id'], 'kind': job['kind'], 'status': job['status'], 'progress': job['progress'],
+            'created_at': job['created_at'], 'finished_at': job['finished_at']}
+    if job['status'] == DONE:
+        view['result'] = job['result']
+    elif job['status'] == FAILED:
+        view['error'] = job['error']
+    return view
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status, latest progress and (once done) the result of an async job; 404 once the result has expired."""
+    job = job_queue.store.get(job_id) if job_queue is not None else None
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    return json_response(_job_view(job), accept_encoding=request.headers.get('Accept-Encoding', ''))
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    NDJSON stream of an async job: a `progress` event whenever its progress
+    changes, then `done` (with the result) or `error`. The stream ends after
+    ?timeout= seconds (default 25, at most 120) with a `pending` event; the
+    client reconnects to keep waiting. It holds a worker while open, so
+    clients under load should prefer polling /jobs/<id>.
+    """
+    if job_queue is None or job_queue.store.get(job_id) is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    timeout = min(max(request.args.get('timeout', 25, type=float), 0), 120)
+
+    def generate():
+        deadline = time.monotonic() + timeout
+        last = None
+        while True:
+            job = job_queue.store.get(job_id)
+            if job is None:
+                yield json.dumps({'type': 'error', 'error': 'Unknown or expired job.'}) + '\n'
+                return
+            if job['status'] in (DONE, FAILED):
+                event = {'type': 'done', 'result': job['result']} if job['status'] == DONE \
+                    else {'type': 'error', 'error': job['error']}
+                yield json.dumps(event) + '\n'
+                return
+            if job['progress'] != last:
+                last = job['progress']
+                yield json.dumps({'type': 'progress', 'status': job['status'], 'progress': last}) + '\n'
+            if time.monotonic() >= deadline:
+                yield json.dumps({'type': 'pending', 'status': job['status']}) + '\n'
+                return
+            time.sleep(0.25)
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/chart/<kind>.<fmt>')
+def chart(kind, fmt):
+    """Trend or distribution chart for ?q=<query> as PNG or SVG, with an ETag of the chart's content hash."""
+    if kind not in CHART_KINDS or fmt not in MIMETYPES:
+        return jsonify({'error': f'Unknown chart {kind}.{fmt}'}), 404
+
+    search_query = request.args.get('q', '')
+    if not search_query:
+        return jsonify({'error': 'Please enter a book title or author.'}), 400
+
+    try:
+        sentiment_data = result_cache.get_or_compute(
+            search_query,
+            review_analyzer.analyze_sentiment,
+            should_cache=lambda data: bool(data and data.get('success'))
+        )
+        if not sentiment_data: # The analyzer returned nothing at all
+            return jsonify({'error': 'Analysis failed'}), 500
+        if not sentiment_data.get('success', False):
+            status = 503 if sentiment_data.get('reddit_unavailable') else 404
+            return jsonify({'error': sentiment_data.get('error') or sentiment_data.get('message', 'Analysis failed')}), status
+
+        data = chart_data(sentiment_data, kind)
+        title = f"{'Sentiment Trend' if kind == 'trend' else 'Sentiment Distribution'}: {search_query}"
+        key = chart_key(kind, data, fmt, title)
+        headers = {'ETag': f'"{key}"', 'Cache-Control': f"public, max-age={os.getenv('RESULT_CACHE_TTL', 300)}"}
+        if request.if_none_match.contains(key):
+            return Response(status=304, headers=headers) # Client already has this exact chart
+
+        body, _ = chart_service.render(kind, data, fmt, title)
+        return Response(body, mimetype=MIMETYPES[fmt], headers=headers)
+
+    except Exception as e:
+        print(f"Error in /chart route: {str(e)}")
+        return jsonify({'error': f'An internal server error occurred: {str(e)}'}), 500
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
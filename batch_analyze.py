@@ -0,0 +1,287 @@
+"""
+Batch sentiment analysis for a whole catalog of titles.
+
+    python batch_analyze.py titles.csv -o results.jsonl
+    python batch_analyze.py titles.jsonl -o results_parquet --format parquet --workers 8
+
+Titles are read from a CSV (the `--column` column, or the first one) or a JSONL
+file (objects with a `--column` key, or plain strings). Each title gets one
+summary row, written as soon as it is ready, so memory use doesn't grow with the
+catalog. Re-running with the same output resumes: titles that already have a
+row are skipped, and titles that failed with an error are retried.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from models.result_assembly import CATEGORY_NAMES
+from reddit_sentiment import ReviewSentimentAnalyzer
+from utils.score_store import PostScoreStore
+
+SUMMARY_COLUMNS = (
+    'title', 'success', 'post_count', 'average_sentiment', 'average_textblob',
+    'positive', 'neutral', 'negative', 'top_post_url', 'error', 'seconds'
+)
+
+
+def read_titles(path, column='title'):
+    """Yield non-empty, de-duplicated titles from a CSV or JSONL file, in file order."""
+    seen = set()
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            rows = (json.loads(line) for line in f if line.strip())
+            titles = (row.get(column) if isinstance(row, dict) else row for row in rows)
+        else:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if column in header:
+                index, first = header.index(column), []
+            else: # No matching header: the first column holds titles, first row included
+                index, first = 0, header[:1]
+            titles = _chain(first, (row[index] for row in reader if len(row) > index))
+        for title in titles:
+            title = title.strip() if isinstance(title, str) else ''
+            if title and title not in seen:
+                seen.add(title)
+                yield title
+
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
+
+
+def summarize_title(title, aggregate, seconds):
+    """One output row for a title from its SentimentAggregate (None if the analysis failed)."""
+    row = dict.fromkeys(SUMMARY_COLUMNS)
+    post_count = aggregate.post_count if aggregate is not None else 0
+    row.update(title=title, success=bool(post_count), post_count=post_count, seconds=round(seconds, 3))
+    row.update(dict.fromkeys(CATEGORY_NAMES, 0))
+    if post_count:
+        row.update(aggregate.distribution())
+        row['average_sentiment'] = aggregate.stats.mean
+        row['average_textblob'] = aggregate.textblob.mean if aggregate.textblob.count else None
+        row['top_post_url'] = aggregate.top_post()['url']
+    return row
+
+
+class JsonlSummaryWriter:
+    """Appends one JSON line per title and flushes it, so the output doubles as the checkpoint."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def completed(self):
+        """Titles that already have a row without an error. A truncated last line (crash mid-write) is ignored."""
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get('error'):
+                    done.discard(row.get('title'))
+                else:
+                    done.add(row.get('title'))
+        return done
+
+    def write(self, row):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(row) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetSummaryWriter:
+    """
+    Writes rows to a directory of Parquet part files, `rows_per_part` rows each.
+    Parts are written to a temp name and renamed, so a crash never leaves a
+    broken part; at most the unflushed rows of the current part are redone on resume.
+    The directory can be read back with pandas.read_parquet(path).
+    """
+
+    def __init__(self, path, rows_per_part=500):
+        import pyarrow # noqa: F401 -- fail at startup, not after the first part's worth of work
+        self.path = path
+        self.rows_per_part = rows_per_part
+        self._rows = []
+        os.makedirs(path, exist_ok=True)
+        self._next_part = len(self._parts())
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def completed(self):
+        import pyarrow.parquet as pq
+        done = set()
+        for part in self._parts():
+            table = pq.read_table(part, columns=['title', 'error'])
+            for title, error in zip(table.column('title').to_pylist(), table.column('error').to_pylist()):
+                if error:
+                    done.discard(title)
+                else:
+                    done.add(title)
+        return done
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.rows_per_part:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(self._rows, schema=_parquet_schema())
+        final = os.path.join(self.path, f'part-{self._next_part:05d}.parquet')
+        pq.write_table(table, final + '.tmp')
+        os.replace(final + '.tmp', final)
+        self._next_part += 1
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('title', pa.string()), ('success', pa.bool_()), ('post_count', pa.int64()),
+        ('average_sentiment', pa.float64()), ('average_textblob', pa.float64()),
+        ('positive', pa.int64()), ('neutral', pa.int64()), ('negative', pa.int64()),
+        ('top_post_url', pa.string()), ('error', pa.string()), ('seconds', pa.float64()),
+    ])
+
+
+class ProgressReporter:
+    """Prints done/total, throughput and ETA at most every `every` seconds."""
+
+    def __init__(self, total, every=5.0):
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last = 0.0
+
+    def update(self, row, force=False):
+        if row is not None:
+            self.done += 1
+            self.failed += bool(row.get('error'))
+        now = time.monotonic()
+        if not force and now - self._last < self.every:
+            return
+        self._last = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.done
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "unknown"
+        print(f"[{self.done}/{self.total}] {rate:.2f} titles/s, {self.failed} failed, ETA {eta}")
+
+
+def run_batch(titles, writer, analyzer_factory, workers=4, limit=100, total=None, report_every=5.0):
+    """
+    Score `titles` with `workers` threads and stream one row per title to `writer`.
+
+    Each worker thread gets its own analyzer from `analyzer_factory()` (PRAW
+    clients shouldn't be shared between threads). At most 2 * workers titles are
+    in flight, so the title source is consumed lazily.
+    """
+    local = threading.local()
+
+    def analyze(title):
+        started = time.monotonic()
+        try:
+            analyzer = getattr(local, 'analyzer', None)
+            if analyzer is None:
+                analyzer = local.analyzer = analyzer_factory()
+            if not analyzer.reddit:
+                raise RuntimeError('Reddit API initialization failed. Check credentials.')
+            # Folded into running aggregates as posts arrive, so large --limit values don't hold every post
+            aggregate = analyzer.aggregate_sentiment(title, limit=limit, top_k=1)
+            return summarize_title(title, aggregate, time.monotonic() - started)
+        except Exception as e:
+            row = summarize_title(title, None, time.monotonic() - started)
+            row['error'] = str(e)
+            return row
+
+    progress = ProgressReporter(total if total is not None else 0, every=report_every)
+    titles = iter(titles)
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                while len(in_flight) < workers * 2:
+                    title = next(titles, None)
+                    if title is None:
+                        break
+                    in_flight.add(pool.submit(analyze, title))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    row = future.result()
+                    writer.write(row)
+                    progress.update(row)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            writer.close()
+    progress.update(None, force=True)
+    return progress.done, progress.failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a catalog of book titles against Reddit.")
+    parser.add_argument('input', help="CSV or JSONL file of titles")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file, or directory for --format parquet")
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), default=None,
+                        help="Output format (default: from the output name)")
+    parser.add_argument('--column', default='title', help="CSV column / JSON key holding the title")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('BATCH_WORKERS', 4)))
+    parser.add_argument('--limit', type=int, default=100, help="Posts fetched per title")
+    parser.add_argument('--report-every', type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    output_format = args.format or ('jsonl' if args.output.lower().endswith(('.jsonl', '.ndjson')) else 'parquet')
+    try:
+        writer = ParquetSummaryWriter(args.output) if output_format == 'parquet' else JsonlSummaryWriter(args.output)
+    except ImportError:
+        print("Parquet output needs pyarrow (pip install pyarrow); use a .jsonl output instead.")
+        return
+
+    completed = writer.completed()
+    total = sum(1 for title in read_titles(args.input, args.column) if title not in completed)
+    print(f"{total} titles to analyze ({len(completed)} already done in {args.output}).")
+    pending = (title for title in read_titles(args.input, args.column) if title not in completed)
+
+    # One score cache for all workers; each thread has its own connection to it
+    try:
+        store = PostScoreStore()
+    except Exception as e:
+        print(f"WARNING: Score cache disabled: {e}")
+        store = None
+    factory = lambda: ReviewSentimentAnalyzer(score_store=store, use_corpus=False)
+
+    done, failed = run_batch(pending, writer, factory, workers=args.workers, limit=args.limit,
+                             total=total, report_every=args.report_every)
+    print(f"Finished: {done} titles analyzed, {failed} failed (re-run to retry them).")
+
+
+if __name__ == "__main__":
+    main()
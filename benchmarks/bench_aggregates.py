@@ -0,0 +1,189 @@
+"""
+Time and peak memory of summarizing a large stream of scored posts: the
+materialized way (every post dict kept, one DataFrame, .mean() / value_counts
+/ np.histogram / quantile / nlargest) against the constant-memory
+SentimentAggregate of models/aggregates.py fed batch by batch (both times
+include building the synthetic post dicts).
+
+Also checks the aggregate's answers: mean and variance to float precision,
+the 20-bin histogram and category counts exactly, t-digest quantiles within
+--rank-error in rank (or --value-error in value), and the top posts per
+category exactly; that merging --shards aggregates built separately (and sent through JSON) gives the same
+summary as one pass; and that ReviewSentimentAnalyzer.aggregate_sentiment
+agrees with analyze_sentiment on FakeReddit. Exits 1 if a check fails.
+
+Usage:
+    python benchmarks/bench_aggregates.py --posts 1000000 --batch 10000 --shards 8
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('USE_REVIEW_CORPUS', '0')
+
+import numpy as np
+
+from models.aggregates import HISTOGRAM_BINS, HISTOGRAM_RANGE, SUMMARY_QUANTILES, SentimentAggregate
+from models.result_assembly import CATEGORY_NAMES, assemble, posts_frame
+
+TOP_K = 10
+
+
+def post_batches(n, batch, seed=0):
+    """Synthetic scored-post dicts shaped like score_posts() output, `batch` at a time."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, batch):
+        size = min(batch, n - start)
+        # Skewed towards positive, with a spike of exact zeros (posts VADER finds nothing in)
+        sentiment = np.clip(rng.normal(0.3, 0.45, size), -1, 1).round(4)
+        sentiment[rng.random(size) < 0.1] = 0.0
+        textblob = np.clip(sentiment * 0.5 + rng.normal(0, 0.1, size), -1, 1)
+        scores = (rng.pareto(1.2, size) * 3).astype(np.int64) # Many ties, a few large
+        yield [{
+            'id': f"p{start + i:07d}",
+            'title': f"Thoughts on book #{(start + i) % 5000}",
+            'score': int(scores[i]),
+            'sentiment': float(sentiment[i]),
+            'sentiment_textblob': float(textblob[i]),
+            'created_utc': 1_600_000_000 + (start + i) * 30,
+            'url': f"https://reddit.com/r/books/comments/p{start + i:07d}/",
+        } for i in range(size)]
+
+
+def materialized(n, batch):
+    posts = [post for chunk in post_batches(n, batch) for post in chunk]
+    frame = posts_frame(posts)
+    sentiment = frame['sentiment']
+    _, distribution, by_category = assemble(posts)
+    return {
+        'mean': float(sentiment.mean()),
+        'variance': float(sentiment.var()),
+        'histogram': np.histogram(sentiment, bins=HISTOGRAM_BINS, range=HISTOGRAM_RANGE)[0].tolist(),
+        'distribution': distribution,
+        'top': {name: [post['id'] for post in by_category[name][:TOP_K]] for name in CATEGORY_NAMES},
+        'sorted': np.sort(sentiment.to_numpy()),
+    }
+
+
+def streamed(n, batch):
+    aggregate = SentimentAggregate(top_k=TOP_K)
+    for chunk in post_batches(n, batch):
+        aggregate.add_posts(chunk)
+    return aggregate
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def quantile_error(ordered, q, value):
+    """(rank error, value error) of an estimate of the q quantile of the sorted array `ordered`."""
+    low = np.searchsorted(ordered, value, side='left') / len(ordered)
+    high = np.searchsorted(ordered, value, side='right') / len(ordered)
+    rank = 0.0 if low <= q <= high else min(abs(q - low), abs(q - high))
+    return rank, abs(value - float(np.quantile(ordered, q)))
+
+
+def summary_matches(expected, aggregate, rank_error, value_tolerance):
+    """Differences between the materialized results and an aggregate's, as a list of messages."""
+    summary = aggregate.summary()
+    stats = summary['sentiment_stats']
+    problems = []
+    if not math.isclose(summary['average_sentiment'], expected['mean'], rel_tol=1e-9, abs_tol=1e-12):
+        problems.append(f"mean {summary['average_sentiment']} != {expected['mean']}")
+    if not math.isclose(stats['std'] ** 2, expected['variance'], rel_tol=1e-9):
+        problems.append(f"variance {stats['std'] ** 2} != {expected['variance']}")
+    if stats['histogram']['counts'] != expected['histogram']:
+        problems.append("histogram counts differ")
+    if summary['sentiment_distribution'] != expected['distribution'] \
+            or list(summary['sentiment_distribution']) != list(expected['distribution']):
+        problems.append(f"distribution {summary['sentiment_distribution']} != {expected['distribution']}")
+    for q, value in zip(SUMMARY_QUANTILES, stats['quantiles'].values()):
+        rank, value_error = quantile_error(expected['sorted'], q, value)
+        # Next to a point mass (the many exact 0.0 and 1.0 scores) a tiny value error is a large rank error
+        if rank > rank_error and value_error > value_tolerance:
+            problems.append(f"quantile {q}: {value:.4f} is off by {rank:.4f} in rank, {value_error:.4f} in value")
+    for name in CATEGORY_NAMES:
+        if [post['id'] for post in summary[f'{name}_posts']] != expected['top'][name]:
+            problems.append(f"top {name} posts differ")
+    return problems
+
+
+def sharded(n, batch, shards):
+    """Aggregates built on `shards` disjoint slices of the stream, sent through JSON and merged."""
+    parts = [SentimentAggregate(top_k=TOP_K) for _ in range(shards)]
+    for i, chunk in enumerate(post_batches(n, batch)):
+        parts[i * shards * batch // n].add_posts(chunk) # Contiguous slices, in stream order
+    merged = SentimentAggregate.from_dict(json.loads(json.dumps(parts[0].to_dict())))
+    for part in parts[1:]:
+        merged.merge(SentimentAggregate.from_dict(json.loads(json.dumps(part.to_dict()))))
+    return merged
+
+
+def analyzer_parity():
+    """aggregate_sentiment against analyze_sentiment on the same FakeReddit search."""
+    from benchmarks.fake_reddit import FakeReddit
+    from reddit_sentiment import ReviewSentimentAnalyzer
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        analyzer = ReviewSentimentAnalyzer(score_store=False)
+        analyzer.score_store = None
+        analyzer.reddit = FakeReddit(posts_per_query=300, page_size=100)
+        result = analyzer.analyze_sentiment('Dune')
+        summary = analyzer.aggregate_sentiment('Dune', limit=100, top_k=5, batch_size=32).summary()
+    return (result['post_count'] == summary['post_count']
+            and math.isclose(result['average_sentiment'], summary['average_sentiment'], rel_tol=1e-12)
+            and result['sentiment_distribution'] == summary['sentiment_distribution']
+            and all([post['id'] for post in result[f'{name}_posts'][:5]] == [post['id'] for post in summary[f'{name}_posts']]
+                    for name in CATEGORY_NAMES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=10_000, help='Posts per streamed batch')
+    parser.add_argument('--shards', type=int, default=8)
+    parser.add_argument('--rank-error', type=float, default=0.01, help='Largest quantile rank error accepted...')
+    parser.add_argument('--value-error', type=float, default=0.01, help='...unless the value is at most this far off')
+    args = parser.parse_args()
+
+    expected, materialized_s, materialized_peak = measure(materialized, args.posts, args.batch)
+    aggregate, streamed_s, streamed_peak = measure(streamed, args.posts, args.batch)
+    print(f"{args.posts} posts in batches of {args.batch}")
+    print(f"{'':>13} {'seconds':>8} {'peak MB':>8}")
+    print(f"{'materialized':>13} {materialized_s:>8.2f} {materialized_peak / 2**20:>8.1f}")
+    print(f"{'streamed':>13} {streamed_s:>8.2f} {streamed_peak / 2**20:>8.1f}")
+    print(f"aggregate state: {len(json.dumps(aggregate.to_dict())) / 1024:.1f} KB as JSON, "
+          f"{len(aggregate.digest.means)} t-digest centroids")
+    for q, value in aggregate.summary()['sentiment_stats']['quantiles'].items():
+        rank, value_error = quantile_error(expected['sorted'], float(q), value)
+        print(f"  q{q}: {value:+.4f} (exact {np.quantile(expected['sorted'], float(q)):+.4f}), "
+              f"rank error {rank:.4f}, value error {value_error:.4f}")
+
+    checks = {
+        'single pass': summary_matches(expected, aggregate, args.rank_error, args.value_error),
+        f'{args.shards} shards merged': summary_matches(expected, sharded(args.posts, args.batch, args.shards),
+                                                         args.rank_error, args.value_error),
+    }
+    ok = True
+    for label, problems in checks.items():
+        print(f"{label}: {'ok' if not problems else '; '.join(problems)}")
+        ok &= not problems
+    parity = analyzer_parity()
+    print(f"aggregate_sentiment vs analyze_sentiment: {'ok' if parity else 'DIFF'}")
+    sys.exit(0 if ok and parity else 1)
+
+
+if __name__ == '__main__':
+    main()
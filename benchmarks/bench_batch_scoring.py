@@ -0,0 +1,123 @@
+"""
+Posts/sec of per-row scoring (VADER + TextBlob per post) versus BatchSentimentScorer.
+
+A second table isolates VADER: NLTK's polarity_scores and FastVader.compound
+per row against the batched path (FastVader.compound_batch via
+score_vader), up to 1M rows, and checks the batched scores are identical.
+
+Usage:
+    python benchmarks/bench_batch_scoring.py --sizes 100,10000,1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.sentiment import SentimentIntensityAnalyzer
+from textblob import TextBlob
+
+from models.batch_scorer import BatchSentimentScorer
+from models.fast_vader import FastVader
+
+TITLES = [
+    "Looking for books like {book}", "Just finished {book}", "Thoughts on {book}?",
+    "{book} discussion thread", "Recommend me something after {book}", "Rereading {book}",
+]
+BOOKS = ["Dune", "The Hobbit", "Mistborn", "Hyperion", "Piranesi", "The Name of the Wind", "Neuromancer"]
+OPINIONS = [
+    "I absolutely loved it, the worldbuilding is amazing", "honestly it was a boring slog",
+    "the ending felt rushed and disappointing", "one of the best books I have ever read",
+    "the characters are flat but the plot is great", "not sure how I feel about the sequel",
+    "the prose is beautiful and haunting", "I hated the middle section",
+    "which edition should I buy", "the audiobook narrator is fantastic",
+]
+
+
+def make_corpus(size, seed=42):
+    """Synthetic post texts with a realistic share of repeated titles and crossposts."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        if texts and rng.random() < 0.1: # Crosspost / copy-paste
+            texts.append(rng.choice(texts))
+            continue
+        title = rng.choice(TITLES).format(book=rng.choice(BOOKS))
+        body = " ".join(rng.sample(OPINIONS, rng.randint(0, 3)))
+        texts.append(f"{title} {body} {rng.randint(0, 10**6)}".strip())
+    return texts
+
+
+def bench_per_row(texts, sia):
+    start = time.perf_counter()
+    for text in texts:
+        sia.polarity_scores(text)['compound']
+        TextBlob(text).sentiment.polarity
+    return time.perf_counter() - start
+
+
+def bench_batch(texts, scorer):
+    start = time.perf_counter()
+    scorer.score_batch(texts)
+    return time.perf_counter() - start
+
+
+def bench_vader(sizes, sia, baseline_max):
+    """VADER only: per-row NLTK and FastVader against batched scoring. Returns False on a score mismatch."""
+    fast = FastVader(sia.lexicon)
+    scorer = BatchSentimentScorer(sia)
+    ok = True
+    print(f"\nVADER only\n{'size':>10} {'nltk rows/s':>12} {'fast rows/s':>12} {'batch rows/s':>13} {'vs nltk':>8} {'vs fast':>8}")
+    for size in sizes:
+        texts = make_corpus(size)
+        start = time.perf_counter()
+        batched = scorer.score_vader(texts)
+        batch_rate = size / (time.perf_counter() - start)
+        start = time.perf_counter()
+        per_row = [fast.compound(text) for text in texts]
+        fast_rate = size / (time.perf_counter() - start)
+        ok &= batched.tolist() == per_row
+        if size <= baseline_max:
+            start = time.perf_counter()
+            for text in texts:
+                sia.polarity_scores(text)['compound']
+            nltk_rate = size / (time.perf_counter() - start)
+            print(f"{size:>10} {nltk_rate:>12.0f} {fast_rate:>12.0f} {batch_rate:>13.0f} "
+                  f"{batch_rate / nltk_rate:>7.1f}x {batch_rate / fast_rate:>7.1f}x")
+        else:
+            print(f"{size:>10} {'skipped':>12} {fast_rate:>12.0f} {batch_rate:>13.0f} {'-':>8} {batch_rate / fast_rate:>7.1f}x")
+    print(f"batched scores identical to per-row: {'ok' if ok else 'DIFF'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,10000,1000000', help='Comma-separated corpus sizes')
+    parser.add_argument('--baseline-max', type=int, default=10000,
+                        help='Skip the per-row baseline above this size (it is slow)')
+    parser.add_argument('--vader-baseline-max', type=int, default=1000000,
+                        help='Skip the per-row NLTK VADER baseline above this size')
+    args = parser.parse_args()
+
+    sia = SentimentIntensityAnalyzer()
+    scorer = BatchSentimentScorer(sia)
+    scorer.score_batch(["warm up"]) # Load the TextBlob lexicon outside the timed region
+
+    print(f"{'size':>10} {'per-row posts/s':>16} {'batch posts/s':>14} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        texts = make_corpus(size)
+        batch_rate = size / bench_batch(texts, scorer)
+        if size <= args.baseline_max:
+            row_rate = size / bench_per_row(texts, sia)
+            print(f"{size:>10} {row_rate:>16.0f} {batch_rate:>14.0f} {batch_rate / row_rate:>7.1f}x")
+        else:
+            print(f"{size:>10} {'skipped':>16} {batch_rate:>14.0f} {'-':>8}")
+
+    ok = bench_vader([int(s) for s in args.sizes.split(',')], sia, args.vader_baseline_max)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
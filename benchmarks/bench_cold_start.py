@@ -0,0 +1,60 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import the web app
+(the point where gunicorn can start serving) and to answer its first /analyze
+request against the fake Reddit backend.
+
+Each measurement runs in a new interpreter so nothing is cached in-process.
+
+Usage:
+    python benchmarks/bench_cold_start.py --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+ready = time.perf_counter() - start
+from benchmarks.fake_reddit import FakeReddit
+app.review_analyzer.reddit = FakeReddit(posts_per_query=100)
+response = app.app.test_client().post('/analyze', data={{'search_query': 'Dune'}})
+first = time.perf_counter() - start
+print(json.dumps({{'ready': ready, 'first_response': first, 'status': response.status_code}}))
+'''
+
+
+def run_once(warm_up, tmpdir):
+    env = dict(os.environ, WARM_UP='1' if warm_up else '0', POST_SCORE_DB=os.path.join(tmpdir, 'scores.sqlite3'))
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD.format(root=ROOT)], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'warm-up thread':>15} {'ready (s)':>10} {'first response (s)':>19}")
+    for warm_up in (False, True):
+        results = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                results.append(run_once(warm_up, tmpdir))
+        ready = statistics.median(r['ready'] for r in results)
+        first = statistics.median(r['first_response'] for r in results)
+        print(f"{str(warm_up):>15} {ready:>10.3f} {first:>19.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Wall-clock time of comparing N titles: ReviewSentimentAnalyzer.compare_titles
+(one concurrent fetch, shared scoring) against N sequential single-title
+analyses, the round trips an editor makes without /compare.
+
+Searches go over HTTP to the local stub server (benchmarks/stub_reddit_server.py)
+with --latency seconds per request; --overlap of each title's posts are shared
+with the other titles, and --duplicate-rate are copies of earlier posts, which
+may be shared ones. Also checks that both give every title the same average
+sentiment and post count (duplicates are dropped per title, as when it is
+analyzed alone), and that POST /compare answers. Then checks outages:
+with every search failing /compare answers 503, with one title's search
+failing that title is marked in `errors`, and neither result is cached.
+
+Usage:
+    python benchmarks/bench_compare.py --titles 1,5,10,25,50 --latency 0.2 --concurrency 8
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('WARM_UP', '0')
+os.environ.setdefault('USE_REVIEW_CORPUS', '0')
+
+from benchmarks.fake_reddit import FakeReddit
+from benchmarks.stub_reddit_server import start_stub_server
+from reddit_sentiment import ReviewSentimentAnalyzer
+from utils.async_reddit import AsyncRedditFetcher, HttpSearchBackend
+from utils.reddit_http import RedditUnavailable
+
+
+class FailingBackend:
+    """Wraps a search backend; searches for `failing` queries (or all, if None) raise RedditUnavailable."""
+
+    def __init__(self, backend, failing=None):
+        self.backend = backend
+        self.failing = failing
+
+    def wait_time(self):
+        return self.backend.wait_time()
+
+    async def search(self, query, subreddit, limit=100):
+        if self.failing is None or query in self.failing:
+            raise RedditUnavailable("Reddit is rate limiting or not responding (stub outage); try again shortly.")
+        return await self.backend.search(query, subreddit, limit=limit)
+
+
+def sequential(analyzer, titles):
+    """One search + summary per title, as separate /analyze calls would do."""
+    results = {}
+    for title in titles:
+        posts = analyzer.fetch_posts_many([title])[title]
+        results[title] = analyzer.summarize_posts(title, posts)
+    return results
+
+
+def same_results(comparison, results):
+    for i, title in enumerate(comparison['titles']):
+        expected = results[title]
+        if comparison['post_count'][i] != expected.get('post_count', 0):
+            return False
+        average = comparison['average_sentiment'][i]
+        if expected.get('success') and not math.isclose(average, expected['average_sentiment'], abs_tol=1e-9):
+            return False
+    return True
+
+
+def check_outages(app, analyzer, base_url):
+    """POST /compare while all searches fail, then while one title's fails: 503 / marked, and nothing cached."""
+    client = app.app.test_client()
+    ok = True
+    for label, failing, titles in (('all searches fail', None, ['Book 1', 'Book 2']),
+                                   ('one title fails', {'Book 4'}, ['Book 3', 'Book 4'])):
+        analyzer.async_fetcher = AsyncRedditFetcher(FailingBackend(HttpSearchBackend(base_url=base_url), failing))
+        app.result_cache.invalidate()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            response = client.post('/compare', json={'titles': titles})
+        body = response.get_json()
+        cached = app.result_cache.stats()['size'] > 0
+        if failing is None:
+            passed = response.status_code == 503 and 'error' in body
+            outcome = f"{response.status_code} {body.get('error')!r}"
+        else:
+            passed = (response.status_code == 200 and body['errors'][0] is None and body['errors'][1] is not None
+                      and body['post_count'][1] == 0)
+            outcome = f"{response.status_code}, errors {[bool(error) for error in body.get('errors', [])]}"
+        passed &= not cached
+        ok &= passed
+        print(f"{label}: {outcome}, cached {cached} -> {'ok' if passed else 'FAILED'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--titles', default='1,5,10,25,50', help='Numbers of titles to compare, comma-separated')
+    parser.add_argument('--posts', type=int, default=100, help='Posts per title')
+    parser.add_argument('--overlap', type=float, default=0.2, help='Share of posts that match every title')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Share of posts that copy an earlier one')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per stub request')
+    parser.add_argument('--concurrency', type=int, default=8, help='Searches in flight (REDDIT_MAX_CONCURRENCY)')
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.titles.split(',')]
+
+    server, base_url = start_stub_server(FakeReddit(posts_per_query=args.posts, overlap=args.overlap,
+                                                    duplicate_rate=args.duplicate_rate), args.latency,
+                                         ratelimit=100000, window=60)
+    analyzer = ReviewSentimentAnalyzer(score_store=False)
+    analyzer.score_store = None # Every post is scored in both setups
+    analyzer.async_fetcher = AsyncRedditFetcher(HttpSearchBackend(base_url=base_url), max_concurrency=args.concurrency)
+    for name in analyzer.scorer_names:
+        analyzer.get_scorer(name).score(["warm up"])
+
+    print(f"{'titles':>7} {'sequential s':>13} {'compare s':>10} {'speedup':>8} {'s/title':>8} {'scored':>7} {'shared':>7} {'parity':>7}")
+    ok = True
+    for n in sizes:
+        titles = [f"Book {i}" for i in range(n)]
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            results = sequential(analyzer, titles)
+            sequential_s = time.perf_counter() - start
+            start = time.perf_counter()
+            comparison = analyzer.compare_titles(titles)
+            compare_s = time.perf_counter() - start
+        parity = comparison['success'] and same_results(comparison, results)
+        ok &= parity
+        print(f"{n:>7} {sequential_s:>13.2f} {compare_s:>10.2f} {sequential_s / compare_s:>7.1f}x {compare_s / n:>8.3f} "
+              f"{comparison['unique_posts']:>7} {comparison['shared_posts']:>7} {'ok' if parity else 'DIFF':>7}")
+
+    import app
+    app.review_analyzer = analyzer
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        response = app.app.test_client().post('/compare', json={'titles': ['Book 1', 'book 1', 'Book 2'], 'period': 'W'})
+    body = response.get_json()
+    route_ok = response.status_code == 200 and body['titles'] == ['Book 1', 'Book 2']
+    print(f"\nPOST /compare: {response.status_code}, titles {body.get('titles')}, {len(body['trend']['periods'])} weekly periods"
+          if route_ok else f"\nPOST /compare failed: {response.status_code} {body}")
+    outages_ok = check_outages(app, analyzer, base_url)
+    server.shutdown()
+    sys.exit(0 if ok and route_ok and outages_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
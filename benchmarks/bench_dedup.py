@@ -0,0 +1,96 @@
+"""
+Duplicate detection quality and scaling of utils/dedup.py on the fake corpus.
+
+Reports, per corpus size, posts/sec through DedupSession.filter, how many of
+the planted duplicates (crossposts and one-word edits) were dropped, how many
+originals were wrongly dropped, and the scoring work saved. Also checks that a
+crosspost is dropped whether it arrives before or after its original, even
+when its text differs; exits 1 if not.
+
+Usage:
+    python benchmarks/bench_dedup.py --sizes 1000,10000,100000 --duplicate-rate 0.2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_reddit import FakeReddit, FakeSubmission, FakeSubreddit
+from reddit_sentiment import crosspost_parent, post_fullname, post_text
+from utils.dedup import Deduplicator
+
+
+def run(size, duplicate_rate, batch_size):
+    fake = FakeReddit(posts_per_query=size, duplicate_rate=duplicate_rate)
+    posts = fake.corpus('Dune')
+    # Titles are unique per original and copied by its duplicates, so they identify the groups
+    groups = {post.title for post in posts}
+
+    session = Deduplicator().session()
+    kept = []
+    start = time.perf_counter()
+    for i in range(0, len(posts), batch_size):
+        kept.extend(session.filter(posts[i:i + batch_size], post_text, lambda post: post.score,
+                                   crosspost_parent, post_fullname))
+    elapsed = time.perf_counter() - start
+    report = session.close()
+
+    kept_groups = {post.title for post in kept}
+    return {
+        'posts_per_s': len(posts) / elapsed,
+        'planted': len(posts) - len(groups),
+        'dropped': len(posts) - len(kept),
+        'missed': len(kept) - len(kept_groups), # Duplicates that got through
+        'wrongly_merged': len(groups) - len(kept_groups), # Distinct posts lost as "duplicates"
+        'saved_chars': report['dropped_chars'],
+        'report': report,
+    }
+
+
+def check_crossposts():
+    """An original and its crosspost (different text) keep only the higher-scored one, in either order."""
+    fake = FakeReddit()
+    original = FakeSubmission('abc', 'Loved Dune', 'The worldbuilding in Dune is unmatched, I reread it every year.',
+                              10, 1700000000, FakeSubreddit(fake, 'books'))
+    crosspost = FakeSubmission('def', 'Loved Dune', 'Crossposting from r/books, thoughts?',
+                               50, 1700000100, FakeSubreddit(fake, 'fantasy'), crosspost_parent='t3_abc')
+    failures = []
+    for order in ([original, crosspost], [crosspost, original]):
+        for batches in ([order], [[post] for post in order]): # One batch, then one post per batch
+            session = Deduplicator().session()
+            kept = [post for batch in batches
+                    for post in session.filter(batch, post_text, lambda post: post.score, crosspost_parent, post_fullname)]
+            report = session.close()
+            # Within a batch the higher-scored crosspost wins; across batches whichever came first was already kept
+            expected = ['def'] if len(batches) == 1 else [order[0].id]
+            label = f"{' then '.join(post.id for post in order)} in {len(batches)} batch(es)"
+            if [post.id for post in kept] != expected or report['crosspost'] != 1:
+                failures.append(f"{label}: kept {[post.id for post in kept]}, report {report}")
+    for failure in failures:
+        print(f"FAIL crosspost {failure}")
+    if not failures:
+        print("crossposts: dropped in either order, in one batch or across batches")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--batch-size', type=int, default=25, help='Posts per filter() call, as in iter_reddit_reviews')
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'posts/s':>9} {'planted':>8} {'dropped':>8} {'missed':>7} {'wrong':>6} {'saved chars':>12}  breakdown")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        r = run(size, args.duplicate_rate, args.batch_size)
+        breakdown = {k: r['report'][k] for k in ('exact', 'crosspost', 'near')}
+        print(f"{size:>8} {r['posts_per_s']:>9.0f} {r['planted']:>8} {r['dropped']:>8} {r['missed']:>7} {r['wrongly_merged']:>6} "
+              f"{r['saved_chars']:>12}  {breakdown}")
+    if not check_crossposts():
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Web-tier responsiveness under a burst of analyses: synchronous /analyze
+against async mode (?async=1, utils/job_queue.py).
+
+The app runs behind --slots request slots, like gunicorn sync workers, with a
+slow FakeReddit (--page-latency per listing page). A burst of --requests
+analyses for --queries distinct titles arrives at once, followed by a cheap
+probe request (GET /jobs/<unknown id>). Reports how long the probe waited for
+a slot and when the burst's results were ready; in async mode, also how many
+jobs the burst created (identical pending submissions share one job).
+
+Then checks the job store itself: two queues on one SQLite file (two workers)
+never run a job twice, finished jobs expire after the result TTL, and a job
+abandoned by a dead worker is queued again once and then failed. Also checks
+that a queue started after a restart runs the jobs left queued or abandoned
+without any new submission, and that the heartbeat keeps a long, silent job
+from being taken for abandoned. Exits 1 if a check fails.
+
+Usage:
+    python benchmarks/bench_jobs.py --slots 4 --requests 32 --queries 8 --page-latency 0.25
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+JOB_DIR = tempfile.mkdtemp(prefix='bench_jobs_')
+os.environ.update(WARM_UP='0', USE_REVIEW_CORPUS='0', SINGLE_FLIGHT_DIR='off',
+                  JOB_DB=os.path.join(JOB_DIR, 'jobs.sqlite3'))
+
+sys.stdout, real_stdout = open(os.devnull, 'w'), sys.stdout # Keep the pipeline's progress prints out of the report
+import app
+from benchmarks.fake_reddit import FakeReddit
+from utils.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobStore
+sys.stdout = real_stdout
+
+
+def burst(args, use_jobs):
+    """Returns (probe wait s, seconds until every result was ready, jobs created, {query: post_count})."""
+    app.result_cache.invalidate()
+    client = app.app.test_client()
+    queries = [f"Book {i % args.queries}" for i in range(args.requests)]
+    suffix = '?async=1' if use_jobs else ''
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.slots) as slots: # One request at a time per slot, like sync workers
+        responses = [slots.submit(client.post, f'/analyze{suffix}', data={'search_query': query}) for query in queries]
+        probe = slots.submit(lambda: (client.get('/jobs/none'), time.perf_counter()))
+        probe_s = probe.result()[1] - start
+        responses = [response.result() for response in responses]
+
+    counts, job_ids = {}, {}
+    for query, response in zip(queries, responses):
+        body = response.get_json()
+        if use_jobs:
+            job_ids[body['job_id']] = query
+        elif response.status_code == 200:
+            counts[query] = body['sentiment']['post_count']
+    while use_jobs and len(counts) < len(job_ids): # Poll, as a client would
+        for job_id, query in job_ids.items():
+            job = client.get(f'/jobs/{job_id}').get_json()
+            if job['status'] in (DONE, FAILED) and query not in counts:
+                counts[query] = job['result']['sentiment']['post_count'] if job['status'] == DONE else None
+        time.sleep(0.05)
+    return probe_s, time.perf_counter() - start, len(job_ids), counts
+
+
+def check_exclusive_claims(path, jobs=50):
+    runs = Counter()
+    lock = threading.Lock()
+
+    def handler(params, report):
+        with lock:
+            runs[params['n']] += 1
+        time.sleep(0.01)
+        return params
+
+    queues = [JobQueue(JobStore(path), {'count': handler}, workers=3, poll_interval=0.02) for _ in range(2)]
+    for n in range(jobs):
+        queues[n % 2].submit('count', {'n': n})
+    queues[0].submit('count', {'n': jobs - 1}) # Identical to a job still queued behind the others
+    deadline = time.monotonic() + 30
+    while sum(queue.completed for queue in queues) < jobs and time.monotonic() < deadline:
+        time.sleep(0.05)
+    for queue in queues:
+        queue.stop()
+    split = [queue.completed for queue in queues]
+    ok = len(runs) == jobs and set(runs.values()) == {1}
+    print(f"  two queues, one store: {jobs} jobs run {sum(runs.values())} times, split {split[0]}/{split[1]} -> "
+          f"{'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def check_expiry(path):
+    store = JobStore(path, result_ttl=0.2)
+    job_id, _ = store.submit('count', {}, 'expiry')
+    store.claim()
+    store.finish(job_id, {'ok': True})
+    kept = store.get(job_id) is not None
+    time.sleep(0.3)
+    expired = store.get(job_id) is None
+    deleted = store.purge()
+    ok = kept and expired and deleted == 1
+    print(f"  result TTL: readable before expiry {kept}, gone after {expired}, purged {deleted} -> {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def check_abandoned(path):
+    store = JobStore(path, stale_after=0.1)
+    job_id, _ = store.submit('count', {}, 'abandoned')
+    states = []
+    for _ in range(2):
+        store.claim() # ...and the worker dies
+        time.sleep(0.15)
+        store.purge()
+        states.append(store.get(job_id)['status'])
+    ok = states == [QUEUED, FAILED]
+    print(f"  abandoned job: {' then '.join(states)} -> {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def check_restart(path):
+    store = JobStore(path, stale_after=0.2)
+    queued_id, _ = store.submit('count', {'n': 1}, 'left-queued') # Submitted before the restart
+    abandoned_id, _ = store.submit('count', {'n': 2}, 'left-running')
+    store.claim() # Claims the older job...
+    store.claim() # ...and this one, then the process dies
+    time.sleep(0.25)
+    queue = JobQueue(JobStore(path, stale_after=0.2), {'count': lambda params, report: params},
+                     workers=1, poll_interval=0.02).start() # No submit
+    deadline = time.monotonic() + 10
+    while queue.completed < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    queue.stop()
+    jobs = [store.get(queued_id), store.get(abandoned_id)]
+    ok = all(job['status'] == DONE for job in jobs)
+    print(f"  after a restart: queued job {jobs[0]['status']}, abandoned job {jobs[1]['status']} "
+          f"(attempt {jobs[1]['attempts']}) -> {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def check_heartbeat(path):
+    runs = []
+
+    def silent(params, report):
+        runs.append(params)
+        time.sleep(1.0) # Never reports progress
+        return params
+
+    queue = JobQueue(JobStore(path, stale_after=0.3), {'slow': silent}, workers=1, poll_interval=0.02)
+    job_id, _ = queue.submit('slow', {})
+    other = JobStore(path, stale_after=0.3) # Another worker process looking for abandoned jobs
+    seen = set() # Statuses observed while the handler runs
+    while queue.completed + queue.failed < 1:
+        other.purge()
+        status = other.get(job_id)['status']
+        if runs and queue.completed + queue.failed < 1: # Claimed and not finished yet
+            seen.add(status)
+        time.sleep(0.05)
+    queue.stop()
+    job = other.get(job_id)
+    ok = seen == {RUNNING} and job['status'] == DONE and job['attempts'] == 1 and len(runs) == 1
+    print(f"  1s job without progress, 0.3s stale limit: status {'/'.join(sorted(seen))} while it ran, {job['status']} "
+          f"after {len(runs)} run(s) -> {'ok' if ok else 'FAILED'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--slots', type=int, default=4, help='Concurrent requests served (sync workers)')
+    parser.add_argument('--requests', type=int, default=32, help='Analyses in the burst')
+    parser.add_argument('--queries', type=int, default=8, help='Distinct titles among them')
+    parser.add_argument('--page-latency', type=float, default=0.25, help='Seconds per FakeReddit listing page (4 per search)')
+    args = parser.parse_args()
+
+    app.review_analyzer.reddit = FakeReddit(posts_per_query=100, page_size=25, page_latency=args.page_latency)
+    app.review_analyzer.score_store = None
+    for name in app.review_analyzer.scorer_names:
+        app.review_analyzer.get_scorer(name).score(["warm up"])
+    app.job_queue.stop() # Started by the app; restart with the same analysis capacity as the sync setup
+    app.job_queue.workers = args.slots
+    app.job_queue.poll_interval = 0.05
+    app.job_queue.start()
+
+    print(f"{args.requests} analyses of {args.queries} titles on {args.slots} slots")
+    print(f"{'mode':>6} {'probe wait s':>13} {'all results s':>14} {'jobs':>5}")
+    sys.stdout = open(os.devnull, 'w')
+    sync = burst(args, use_jobs=False)
+    jobs = burst(args, use_jobs=True)
+    sys.stdout = real_stdout
+    for label, (probe_s, total_s, created, _) in (('sync', sync), ('async', jobs)):
+        print(f"{label:>6} {probe_s:>13.3f} {total_s:>14.2f} {created if label == 'async' else '-':>5}")
+    app.job_queue.stop()
+
+    ok = jobs[0] < 0.5 and jobs[3] == sync[3] and len(jobs[3]) == args.queries
+    ok &= app.job_queue.stats()['submitted'] == args.queries
+    print(f"async results match sync: {'ok' if jobs[3] == sync[3] else 'DIFF'}; "
+          f"jobs submitted {app.job_queue.stats()['submitted']}, joined {app.job_queue.stats()['deduplicated']}")
+
+    print("job store:")
+    ok &= check_exclusive_claims(os.path.join(JOB_DIR, 'claims.sqlite3'))
+    ok &= check_expiry(os.path.join(JOB_DIR, 'expiry.sqlite3'))
+    ok &= check_abandoned(os.path.join(JOB_DIR, 'abandoned.sqlite3'))
+    ok &= check_restart(os.path.join(JOB_DIR, 'restart.sqlite3'))
+    ok &= check_heartbeat(os.path.join(JOB_DIR, 'heartbeat.sqlite3'))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Checks of the Reddit client plumbing (utils/reddit_http.py) against the local
+stub server and FakeReddit, with injected latency and 429s:
+
+  keepalive   sequential searches over pooled keep-alive connections vs a new connection per request
+  retries     concurrent searches with --error-rate of requests answered 429: every search completes
+  deadline    slow stub: searches return partial results or fail within their deadline
+  ratelimit   stub allows --ratelimit requests per --window s: the scheduler follows the
+              X-Ratelimit-* headers instead of running into 429s like an unscheduled client
+  praw_path   ReviewSentimentAnalyzer on FakeReddit with 429s: retried listing pages complete the
+              search, and a Reddit that only answers 429 gives a 'Reddit unavailable' error
+  credentials ReviewSentimentAnalyzer.reddit from many threads: credentials are checked with one
+              token request per process, a 429 during the check doesn't switch Reddit off, a 401 does
+
+Exits 1 if any check fails.
+
+Usage:
+    python benchmarks/bench_reddit_client.py --error-rate 0.3 --latency 0.02
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('REDDIT_BACKOFF_BASE', '0.05') # Keep the backoff short for a quick run
+os.environ.setdefault('USE_REVIEW_CORPUS', '0')
+
+from benchmarks.fake_reddit import FakeReddit
+from benchmarks.stub_reddit_server import start_stub_server
+from utils.async_reddit import AsyncRedditFetcher, HttpSearchBackend
+from utils.reddit_http import REDDIT_EVENTS, ConnectionPool, RedditHttpClient, TokenBucket
+
+POSTS = 300 # Three 100-post pages per search
+
+
+class UnscheduledBucket(TokenBucket):
+    """Never waits and ignores rate-limit headers: a client without the scheduler."""
+
+    def acquire(self, deadline=None):
+        pass
+
+    def update(self, headers):
+        pass
+
+    def pause(self, seconds):
+        pass
+
+
+def client(max_idle=10, bucket=None, attempts=None):
+    return RedditHttpClient(pool=ConnectionPool(max_idle=max_idle), bucket=bucket or TokenBucket(rate=1000, capacity=1000),
+                            attempts=attempts)
+
+
+@contextmanager
+def quiet():
+    """Keep per-search error prints and retry warnings off the report."""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield
+
+
+def stub(posts, latency, **options):
+    """Stub server with a rate limit too generous to matter unless the check sets its own."""
+    options = {'ratelimit': 100000, 'window': 60, **options}
+    return start_stub_server(FakeReddit(posts_per_query=posts), latency, **options)
+
+
+def backend(base_url, http_client, deadline=None):
+    return HttpSearchBackend(base_url=base_url, client=http_client, deadline=deadline)
+
+
+def check_keepalive(args):
+    rows = []
+    for label, max_idle in (('new connection', 0), ('keep-alive', 10)):
+        server, base_url = stub(POSTS, args.latency)
+        fetcher = AsyncRedditFetcher(backend(base_url, client(max_idle)), max_concurrency=1)
+        start = time.perf_counter()
+        with quiet():
+            found = fetcher.search_many([f"book {i}" for i in range(args.searches)], ['books'], limit=POSTS)
+        elapsed = time.perf_counter() - start
+        requests = server.handler.requests_served
+        rows.append((label, requests, server.handler.connections, elapsed / requests * 1000,
+                     all(len(posts) == POSTS for posts in found.values())))
+        server.shutdown()
+    for label, requests, connections, per_request_ms, complete in rows:
+        print(f"  {label:>14}: {requests} requests on {connections} connection(s), {per_request_ms:.2f} ms/request")
+    return rows[1][2] == 1 and all(row[4] for row in rows)
+
+
+def check_retries(args):
+    ok = True
+    for label, attempts in (('no retries', 1), ('retries', None)):
+        server, base_url = stub(POSTS, args.latency, error_rate=args.error_rate, retry_after=0)
+        fetcher = AsyncRedditFetcher(backend(base_url, client(attempts=attempts)), max_concurrency=4)
+        retries_before = REDDIT_EVENTS.value(event='retry')
+        start = time.perf_counter()
+        with quiet():
+            found = fetcher.search_many([f"book {i}" for i in range(args.searches)], ['books'], limit=POSTS)
+        elapsed = time.perf_counter() - start
+        complete = sum(1 for posts in found.values() if len(posts) == POSTS)
+        print(f"  {label:>14}: {complete}/{args.searches} searches complete, {server.handler.errors_served} 429s served, "
+              f"{REDDIT_EVENTS.value(event='retry') - retries_before} retries, {elapsed:.2f}s")
+        if attempts is None:
+            ok = complete == args.searches
+        server.shutdown()
+    return ok
+
+
+def check_deadline(args):
+    ok = True
+    for label, latency, deadline, expect in (('partial', 0.4, 1.0, 'partial'), ('nothing', 2.0, 0.5, 'error')):
+        server, base_url = stub(POSTS, latency)
+        fetcher = AsyncRedditFetcher(backend(base_url, client(), deadline=deadline), max_concurrency=1)
+        start = time.perf_counter()
+        # Errors are reported (and the query left empty) by search_many itself
+        with quiet():
+            posts = fetcher.search_many(['book'], ['books'], limit=POSTS)['book']
+        elapsed = time.perf_counter() - start
+        outcome = 'error' if not posts else ('partial' if len(posts) < POSTS else 'complete')
+        print(f"  {label:>14}: {latency}s/request, {deadline}s deadline -> {len(posts)} posts ({outcome}) in {elapsed:.2f}s")
+        # One in-flight request may run up to its socket timeout, which the deadline caps
+        ok &= outcome == expect and elapsed < deadline + 0.5
+        server.shutdown()
+    return ok
+
+
+def check_ratelimit(args):
+    ok = True
+    for label, bucket in (('unscheduled', UnscheduledBucket()), ('scheduled', TokenBucket(rate=1000, capacity=10))):
+        server, base_url = stub(100, 0.0, ratelimit=args.ratelimit, window=args.window)
+        fetcher = AsyncRedditFetcher(backend(base_url, client(bucket=bucket, attempts=1)), max_concurrency=4)
+        start = time.perf_counter()
+        with quiet():
+            found = fetcher.search_many([f"book {i}" for i in range(2 * args.ratelimit)], ['books'], limit=100)
+        elapsed = time.perf_counter() - start
+        complete = sum(1 for posts in found.values() if posts)
+        print(f"  {label:>14}: {complete}/{len(found)} searches complete, {server.handler.errors_served} 429s, {elapsed:.2f}s "
+              f"({args.ratelimit} requests per {args.window:g}s allowed)")
+        if label == 'scheduled':
+            ok = complete == len(found) and server.handler.errors_served == 0
+        server.shutdown()
+    return ok
+
+
+def check_praw_path(args):
+    from reddit_sentiment import ReviewSentimentAnalyzer
+    with quiet():
+        analyzer = ReviewSentimentAnalyzer(score_store=False, dedup=False)
+        analyzer.score_store = None
+        flaky = FakeReddit(posts_per_query=100, page_size=10, error_rate=args.error_rate, retry_after=0)
+        analyzer.reddit = flaky
+        result = analyzer.analyze_sentiment('Dune')
+        down = FakeReddit(posts_per_query=100, page_size=10, error_rate=1.0, retry_after=0)
+        analyzer.reddit = down
+        start = time.perf_counter()
+        failed = analyzer.analyze_sentiment('Dune')
+        elapsed = time.perf_counter() - start
+    print(f"  {'flaky':>14}: {flaky.errors} 429s on {flaky.requests} pages -> {result.get('post_count', 0)} posts")
+    print(f"  {'always 429':>14}: {down.requests} pages tried in {elapsed:.2f}s -> {failed.get('error')!r}")
+    return result.get('post_count') == 100 and failed.get('reddit_unavailable') is True
+
+
+class CheckError(Exception):
+    """Shaped like prawcore's response errors: `response.status_code` is what is_transient() reads."""
+
+    def __init__(self, status):
+        super().__init__(f"received {status} HTTP response")
+        self.response = type('Response', (), {'status_code': status, 'headers': {}})()
+
+
+def check_credentials(args):
+    import reddit_sentiment
+    statuses = [] # Status each credential check fails with, in order; None succeeds
+    calls = []
+
+    class Client:
+        def __init__(self):
+            self.auth = self
+
+        def scopes(self):
+            calls.append(threading.get_ident())
+            status = statuses.pop(0) if statuses else None
+            if status is not None:
+                raise CheckError(status)
+
+    local = threading.local()
+
+    def thread_reddit():
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        return local.client
+
+    def from_threads(analyzer, threads=8):
+        clients = []
+        workers = [threading.Thread(target=lambda: clients.append(analyzer.reddit)) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return clients
+
+    real, reddit_sentiment.thread_reddit = reddit_sentiment.thread_reddit, thread_reddit
+    os.environ['REDDIT_CHECK_RETRY'] = '0'
+    try:
+        with quiet():
+            statuses[:] = [429]
+            analyzer = reddit_sentiment.ReviewSentimentAnalyzer(score_store=False, dedup=False)
+            first = analyzer.reddit # 429: handed out unchecked, checked again next time
+            clients = from_threads(analyzer)
+            transient_calls = len(calls)
+            statuses[:] = [401]
+            rejected = reddit_sentiment.ReviewSentimentAnalyzer(score_store=False, dedup=False)
+            rejected_clients = [rejected.reddit] + from_threads(rejected)
+    finally:
+        reddit_sentiment.thread_reddit = real
+        del os.environ['REDDIT_CHECK_RETRY']
+    print(f"  {'429 then ok':>14}: {transient_calls} credential checks for 9 threads, "
+          f"{len({id(c) for c in [first] + clients})} clients, {sum(c is None for c in [first] + clients)} None")
+    print(f"  {'401':>14}: {sum(c is None for c in rejected_clients)}/{len(rejected_clients)} threads got None")
+    return (first is not None and all(c is not None for c in clients) and transient_calls == 2
+            and len({id(c) for c in [first] + clients}) == 9 and all(c is None for c in rejected_clients))
+
+
+CHECKS = {
+    'keepalive': check_keepalive,
+    'retries': check_retries,
+    'deadline': check_deadline,
+    'ratelimit': check_ratelimit,
+    'praw_path': check_praw_path,
+    'credentials': check_credentials,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checks', default=','.join(CHECKS))
+    parser.add_argument('--searches', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stub adds to every request')
+    parser.add_argument('--error-rate', type=float, default=0.3, help='Share of requests answered 429')
+    parser.add_argument('--ratelimit', type=int, default=20)
+    parser.add_argument('--window', type=float, default=2.0)
+    args = parser.parse_args()
+
+    failed = []
+    for name in args.checks.split(','):
+        print(f"{name}:")
+        if not CHECKS[name](args):
+            failed.append(name)
+            print("  FAILED")
+    print(f"\n{'FAILED: ' + ', '.join(failed) if failed else 'All checks passed.'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Payload size and serialization time of the /analyze response: full vs compact
+format, json vs orjson, and gzip / brotli compressed sizes.
+
+Usage:
+    python benchmarks/bench_response_payload.py --sizes 100,1000
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_reddit import FILLER, WORDS_NEGATIVE, WORDS_POSITIVE
+from utils import response
+
+
+def make_result(size, seed=0):
+    """A synthetic analyze_sentiment result with `size` posts and realistic body lengths."""
+    rng = random.Random(seed)
+    categorized = {'positive': [], 'neutral': [], 'negative': []}
+    vocabulary = FILLER + WORDS_POSITIVE + WORDS_NEGATIVE
+    for i in range(size):
+        sentiment = round(rng.uniform(-1, 1), 4)
+        category = 'positive' if sentiment >= 0.05 else ('negative' if sentiment <= -0.05 else 'neutral')
+        categorized[category].append({
+            'id': f'p{i}', 'kind': 'post', 'title': f'Thoughts on Dune #{i}',
+            'text': ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(20, 400))),
+            'score': rng.randint(0, 5000), 'sentiment': sentiment, 'sentiment_textblob': round(rng.uniform(-1, 1), 4),
+            'created_utc': 1704110400.0, 'url': f'https://reddit.com/r/books/comments/p{i}/',
+            'subreddit': 'books', 'sentiment_category': category,
+        })
+    return {
+        'success': True, 'average_sentiment': 0.1, 'post_count': size,
+        'sentiment_distribution': {k: len(v) for k, v in categorized.items()},
+        **{f'{k}_posts': v for k, v in categorized.items()},
+    }
+
+
+def timed(fn, repeat=5):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000')
+    args = parser.parse_args()
+
+    print(f"{'posts':>6} {'format':>8} {'bytes':>9} {'gzip':>8} {'brotli':>8} {'json ms':>8} {'orjson ms':>10}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        full = {'search_query': 'Dune', 'sentiment': make_result(size)}
+        compact = {'search_query': 'Dune', 'sentiment': response.compact_sentiment(full['sentiment'])}
+        for name, payload in (('full', full), ('compact', compact)):
+            body = response.dumps(payload)
+            json_ms = timed(lambda: json.dumps(payload))
+            orjson_ms = timed(lambda: response.orjson.dumps(payload)) if response.orjson else float('nan')
+            br = len(response.brotli.compress(body, quality=5)) if response.brotli else float('nan')
+            print(f"{size:>6} {name:>8} {len(body):>9} {len(gzip.compress(body, 6)):>8} {br:>8} "
+                  f"{json_ms:>8.2f} {orjson_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Time and memory of analyze_sentiment's result assembly: the DataFrame version
+(DataFrame -> .apply categories -> sort_values -> three masked copies ->
+to_dict('records')) versus models/result_assembly.py.
+
+Inputs are synthetic scored-post dicts shaped like score_posts() output, at
+three scales: a search's posts, a search with comment harvesting, and a
+batch_analyze catalog. Also checks both give the same summary (posts with
+equal scores may come out in a different order) and compares DataFrame
+memory of pd.DataFrame(posts) against posts_frame(posts).
+
+Usage:
+    python benchmarks/bench_result_assembly.py --catalog 200000
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from benchmarks.fake_reddit import FILLER, WORDS_NEGATIVE, WORDS_POSITIVE
+from models.result_assembly import CATEGORY_NAMES, assemble, posts_frame
+from reddit_sentiment import sentiment_category
+
+SUBREDDITS = ['books', 'suggestmeabook', 'literature', 'bookclub', 'sci-fi', 'fantasy', 'printsf']
+
+
+def make_posts(n, kind='post', words=80, seed=0):
+    rng = random.Random(seed)
+    vocab = FILLER + WORDS_POSITIVE + WORDS_NEGATIVE
+    posts = []
+    for i in range(n):
+        post_id = f"{kind[0]}{i:07d}"
+        subreddit = rng.choice(SUBREDDITS)
+        posts.append({
+            'id': post_id,
+            'kind': kind,
+            'title': f"Thoughts on book #{i % 5000}",
+            'text': " ".join(rng.choice(vocab) for _ in range(rng.randint(words // 2, words))),
+            'score': int(rng.paretovariate(1.2)) - 1, # Mostly small, many ties, a few large
+            'sentiment': round(rng.uniform(-1, 1), 4),
+            'sentiment_textblob': None,
+            'created_utc': 1_600_000_000 + rng.randint(0, 3 * 365) * 86400,
+            'url': f"https://reddit.com/r/{subreddit}/comments/{post_id}/",
+            'subreddit': subreddit,
+        })
+    return posts
+
+
+def legacy_summarize(posts):
+    """analyze_sentiment's assembly before models/result_assembly.py (including get_reddit_reviews' DataFrame)."""
+    posts_df = pd.DataFrame(posts)
+    avg_sentiment = posts_df['sentiment'].mean()
+    posts_df['sentiment_category'] = posts_df['sentiment'].apply(sentiment_category)
+    sentiment_counts = posts_df['sentiment_category'].value_counts().to_dict()
+    posts_df = posts_df.sort_values(by='score', ascending=False)
+    by_category = {name: posts_df[posts_df['sentiment_category'] == name].to_dict('records') for name in CATEGORY_NAMES}
+    return float(avg_sentiment), sentiment_counts, by_category
+
+
+def same_summary(expected, got):
+    (avg_a, dist_a, cats_a), (avg_b, dist_b, cats_b) = expected, got
+    if not math.isclose(avg_a, avg_b, rel_tol=1e-12, abs_tol=1e-12) or dist_a != dist_b:
+        return False
+    for name in CATEGORY_NAMES:
+        a, b = cats_a[name], cats_b[name]
+        if [p['score'] for p in a] != [p['score'] for p in b] or {p['id'] for p in a} != {p['id'] for p in b}:
+            return False
+    return True
+
+
+def measure(fn, posts, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(posts)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(posts)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100, help='Posts in one search')
+    parser.add_argument('--comments', type=int, default=20000, help='Posts plus harvested comments in one search')
+    parser.add_argument('--catalog', type=int, default=200000, help='Rows for a batch_analyze catalog')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = [
+        ('posts', make_posts(args.posts, 'post', words=80)),
+        ('comments', make_posts(args.posts, 'post', words=80) + make_posts(args.comments - args.posts, 'comment', words=25, seed=1)),
+        ('catalog', make_posts(args.catalog, 'post', words=80, seed=2)),
+    ]
+
+    print(f"{'input':>9} {'rows':>8} {'legacy ms':>10} {'new ms':>9} {'speedup':>8} {'legacy peak MB':>15} {'new peak MB':>12} "
+          f"{'df MB':>7} {'compact df MB':>14} {'parity':>7}")
+    ok = True
+    for name, posts in inputs:
+        repeat = args.repeat if len(posts) < 100000 else max(1, args.repeat // 2)
+        parity = same_summary(legacy_summarize(posts), assemble(posts))
+        ok &= parity
+        legacy_s, legacy_peak = measure(legacy_summarize, posts, repeat)
+        new_s, new_peak = measure(assemble, posts, repeat)
+        df_mb = frame_bytes(pd.DataFrame(posts)) / 1e6
+        compact_mb = frame_bytes(posts_frame(posts)) / 1e6
+        print(f"{name:>9} {len(posts):>8} {legacy_s * 1000:>10.2f} {new_s * 1000:>9.2f} {legacy_s / new_s:>7.1f}x "
+              f"{legacy_peak / 1e6:>15.1f} {new_peak / 1e6:>12.1f} {df_mb:>7.1f} {compact_mb:>14.1f} {'ok' if parity else 'DIFF':>7}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Load test for /analyze request coalescing (utils/single_flight.py).
+
+Starts --workers processes, each running the Flask app the way a gunicorn
+worker would, with a slow FakeReddit backend. At the same moment every worker
+fires --threads concurrent POST /analyze requests for one query. Reports the
+Reddit searches actually made and the request latencies for three setups:
+
+  none    no coalescing: every request searches
+  local   coalescing within each worker only (one search per worker)
+  shared  coalescing across workers through the lease directory (one search in total)
+
+Usage:
+    python benchmarks/bench_single_flight.py --workers 4 --threads 16 --page-latency 0.5
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUERY = 'Dune'
+
+
+def worker(mode, lease_dir, threads, page_latency, start_at):
+    """One app worker process: returns (searches made, status codes, latencies, single-flight stats)."""
+    os.environ.update(WARM_UP='0', USE_REVIEW_CORPUS='0')
+    sys.stdout = open(os.devnull, 'w') # Keep the pipeline's progress prints out of the report
+
+    import app
+    from benchmarks.fake_reddit import FakeReddit
+    from utils.single_flight import SingleFlight
+
+    fake = FakeReddit(posts_per_query=100, page_size=25, page_latency=page_latency)
+    app.review_analyzer.reddit = fake
+    app.review_analyzer.score_store = None # Every search is scored in full
+    for name in app.review_analyzer.scorer_names:
+        app.review_analyzer.get_scorer(name).score(["warm up"])
+    app.result_cache.single_flight = {
+        'none': None,
+        'local': SingleFlight(lease_dir='off'),
+        'shared': SingleFlight(lease_dir=lease_dir),
+    }[mode]
+
+    statuses, latencies = [], []
+    lock = threading.Lock()
+
+    def request():
+        client = app.app.test_client()
+        start = time.perf_counter()
+        response = client.post('/analyze', data={'search_query': QUERY})
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    pool = [threading.Thread(target=request) for _ in range(threads)]
+    time.sleep(max(0.0, start_at - time.time()))
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    stats = app.result_cache.single_flight.stats() if app.result_cache.single_flight else {}
+    return fake.searches, statuses, latencies, stats
+
+
+def run(mode, workers, threads, page_latency):
+    with tempfile.TemporaryDirectory() as lease_dir:
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers) as pool:
+            start_at = time.time() + 8 # Time for every worker to import the app and load VADER
+            results = pool.starmap(worker, [(mode, lease_dir, threads, page_latency, start_at)] * workers)
+    searches = sum(r[0] for r in results)
+    statuses = [status for r in results for status in r[1]]
+    latencies = sorted(latency for r in results for latency in r[2])
+    totals = {}
+    for r in results:
+        for key, value in r[3].items():
+            totals[key] = totals.get(key, 0) + value
+    return searches, statuses, latencies, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent requests per worker')
+    parser.add_argument('--page-latency', type=float, default=0.5, help='Seconds per fake listing page (4 pages per search)')
+    parser.add_argument('--modes', default='none,local,shared')
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.threads} concurrent requests for '{QUERY}'")
+    print(f"{'mode':>7} {'requests':>9} {'non-200':>8} {'searches':>9} {'p50 s':>7} {'max s':>7}  single-flight")
+    failed = False
+    for mode in args.modes.split(','):
+        searches, statuses, latencies, totals = run(mode, args.workers, args.threads, args.page_latency)
+        errors = sum(1 for status in statuses if status != 200)
+        failed |= bool(errors) or (mode == 'shared' and searches != 1)
+        print(f"{mode:>7} {len(statuses):>9} {errors:>8} {searches:>9} {statistics.median(latencies):>7.2f} "
+              f"{latencies[-1]:>7.2f}  {totals}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+End-to-end latency of fetch-then-score versus the streaming pipeline
+(ReviewSentimentAnalyzer.iter_reddit_reviews) against a local fake Reddit source.
+
+Then streams --parallel-posts posts through an analyzer with parallel scoring
+(2 workers, --chunk-size) and checks its batches were scored on the process
+pool rather than in-process. Exits 1 if the pool was never used.
+
+Usage:
+    python benchmarks/bench_streaming_pipeline.py --posts 500 --page-latency 0.3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_reddit import FakeReddit
+from models.parallel_scorer import pool_stats, shutdown_pools
+from reddit_sentiment import ReviewSentimentAnalyzer
+from utils.score_store import PostScoreStore
+
+SUBREDDITS = 'books+suggestmeabook+literature+bookclub+sci-fi+fantasy+printsf'
+
+
+def make_analyzer(fake, tmpdir, name):
+    analyzer = ReviewSentimentAnalyzer(score_store=PostScoreStore(os.path.join(tmpdir, f'{name}.sqlite3')))
+    analyzer.reddit = fake
+    return analyzer
+
+
+def run_sequential(analyzer, query, limit):
+    """Fetch every page first, then score (no overlap between I/O and CPU)."""
+    start = time.perf_counter()
+    submissions = list(analyzer.reddit.subreddit(SUBREDDITS).search(query, limit=limit))
+    posts = analyzer.score_posts(submissions)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(posts)
+
+
+def run_streaming(analyzer, query, limit):
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for _ in analyzer.iter_reddit_reviews(query, limit=limit):
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    return first, time.perf_counter() - start, count
+
+
+def check_parallel_pool(tmpdir, posts, chunk_size):
+    """Stream through a parallel analyzer; True if its batches reached the scoring pool."""
+    analyzer = ReviewSentimentAnalyzer(score_store=PostScoreStore(os.path.join(tmpdir, 'parallel.sqlite3')),
+                                       parallel=True, workers=2, chunk_size=chunk_size, dedup=False)
+    analyzer.reddit = FakeReddit(posts_per_query=posts, page_size=100)
+    before = pool_stats()
+    start = time.perf_counter()
+    count = sum(1 for _ in analyzer.iter_reddit_reviews('Dune', limit=posts))
+    elapsed = time.perf_counter() - start
+    after = pool_stats()
+    shutdown_pools()
+    pool_batches = after['pool_batches'] - before['pool_batches']
+    local_batches = after['local_batches'] - before['local_batches']
+    print(f"\nparallel scoring: {count} posts in {elapsed:.2f}s, batch size {analyzer.scoring_batch_size()}, "
+          f"{pool_batches} batches on the pool ({after['pool_chunks'] - before['pool_chunks']} chunks), "
+          f"{local_batches} in-process -> {'ok' if pool_batches else 'FAILED'}")
+    return pool_batches > 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--page-latency', type=float, default=0.3, help='Seconds per fake listing page')
+    parser.add_argument('--parallel-posts', type=int, default=3000, help='Posts streamed in the parallel check')
+    parser.add_argument('--chunk-size', type=int, default=250, help='Parallel scorer chunk size')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {}
+        for name, runner in (('sequential', run_sequential), ('streaming', run_streaming)):
+            fake = FakeReddit(posts_per_query=args.posts, page_size=args.page_size, page_latency=args.page_latency)
+            analyzer = make_analyzer(fake, tmpdir, name)
+            analyzer.warm_up()
+            results[name] = runner(analyzer, 'Dune', args.posts)
+
+        print(f"{'mode':>12} {'first post (s)':>15} {'total (s)':>10} {'posts':>6}")
+        for name, (first, total, count) in results.items():
+            print(f"{name:>12} {first:>15.3f} {total:>10.3f} {count:>6}")
+
+        ok = check_parallel_pool(tmpdir, args.parallel_posts, args.chunk_size)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
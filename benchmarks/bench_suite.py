@@ -0,0 +1,304 @@
+"""
+Reproducible benchmark suite for the analysis pipeline, run entirely offline against FakeReddit.
+
+Cases (each at every --sizes posts per query):
+  get_reddit_reviews        search + dedup + clean + score, no score store (every post scored)
+  get_reddit_reviews_warm   same, with every post already in the score store
+  analyze_sentiment         get_reddit_reviews + summarize_posts (capped at its 100-post search limit)
+  filter_low_quality        AdvancedReviewAnalyzer.filter_low_quality_reviews on the scored posts
+  analyze_trend             AdvancedReviewAnalyzer.analyze_trend (daily buckets, 7-day window)
+  plot_trend / plot_distribution   SentimentPlotter figure + PNG render
+  route_analyze             POST /analyze through Flask's test client, result cache cleared each run
+
+Results are written as JSON (--json) with the commit, environment and per-case
+timings, so runs can be compared across commits with --compare.
+
+Usage:
+    python benchmarks/bench_suite.py --sizes 100,1000 --repeat 5 --json results.json
+    python benchmarks/bench_suite.py --json new.json --compare results.json --max-regression 1.25
+    python benchmarks/bench_suite.py --fixture fixture.json --page-latency 0.2 --cases get_reddit_reviews
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('WARM_UP', '0') # app.py must not warm up on a background thread mid-benchmark
+os.environ.setdefault('USE_REVIEW_CORPUS', '0')
+
+from benchmarks.fake_reddit import FakeReddit
+from reddit_sentiment import ReviewSentimentAnalyzer
+from utils.score_store import PostScoreStore
+
+QUERY = 'Dune'
+
+
+class Context:
+    """Shared, lazily built objects (analyzers load their lexicons once, outside the timed runs)."""
+
+    def __init__(self, args, tmpdir):
+        self.args = args
+        self.tmpdir = tmpdir
+        self._analyzer = None
+        self._advanced = None
+        self._plotter = None
+        self._app = None
+        self._frames = {}
+
+    def fake(self, size):
+        fake = FakeReddit(posts_per_query=size, page_latency=self.args.page_latency,
+                          duplicate_rate=self.args.duplicate_rate, fixture=self.args.fixture)
+        fake.corpus(QUERY) # Build the corpus up front, outside the timings
+        return fake
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            self._analyzer = ReviewSentimentAnalyzer(score_store=PostScoreStore(os.path.join(self.tmpdir, 'unused.sqlite3')))
+            for name in self._analyzer.scorer_names:
+                self._analyzer.get_scorer(name).score(["warm up"])
+        return self._analyzer
+
+    @property
+    def advanced(self):
+        if self._advanced is None:
+            from models.sentiment_analyzer import AdvancedReviewAnalyzer
+            self._advanced = AdvancedReviewAnalyzer()
+        return self._advanced
+
+    @property
+    def plotter(self):
+        if self._plotter is None:
+            from visualization.plotter import SentimentPlotter
+            self._plotter = SentimentPlotter()
+        return self._plotter
+
+    @property
+    def app(self):
+        if self._app is None:
+            import app
+            app.review_analyzer.score_store = None
+            # Single-flight result files would answer repeat runs within their TTL, bypassing the pipeline
+            app.result_cache.single_flight = None
+            self._app = app
+        return self._app
+
+    def posts_df(self, size):
+        """Scored posts for `size`, computed once and shared by the DataFrame-level cases."""
+        if size not in self._frames:
+            analyzer = self.analyzer
+            analyzer.reddit, analyzer.score_store = self.fake(size), None
+            self._frames[size] = analyzer.get_reddit_reviews(QUERY, limit=size)
+        return self._frames[size]
+
+
+def case_get_reddit_reviews(ctx, size):
+    analyzer = ctx.analyzer
+    analyzer.reddit, analyzer.score_store = ctx.fake(size), None
+    return lambda: len(analyzer.get_reddit_reviews(QUERY, limit=size))
+
+
+def case_get_reddit_reviews_warm(ctx, size):
+    analyzer = ctx.analyzer
+    analyzer.reddit = ctx.fake(size)
+    analyzer.score_store = PostScoreStore(os.path.join(ctx.tmpdir, f'warm-{size}.sqlite3'))
+    analyzer.get_reddit_reviews(QUERY, limit=size) # Fill the store
+    return lambda: len(analyzer.get_reddit_reviews(QUERY, limit=size))
+
+
+def case_analyze_sentiment(ctx, size):
+    analyzer = ctx.analyzer
+    analyzer.reddit, analyzer.score_store = ctx.fake(size), None
+    return lambda: analyzer.analyze_sentiment(QUERY)['post_count']
+
+
+def case_filter_low_quality(ctx, size):
+    posts_df, advanced = ctx.posts_df(size), ctx.advanced
+    return lambda: len(advanced.filter_low_quality_reviews(posts_df.copy()))
+
+
+def case_analyze_trend(ctx, size):
+    posts_df, advanced = ctx.posts_df(size), ctx.advanced
+
+    def run():
+        advanced.analyze_trend(posts_df)
+        return len(posts_df)
+    return run
+
+
+def case_plot_trend(ctx, size):
+    daily = ctx.advanced.analyze_trend(ctx.posts_df(size))['daily_sentiment']
+    plotter = ctx.plotter
+
+    def run():
+        plotter.render(plotter.plot_sentiment_trend(daily))
+        return len(daily) # Points plotted
+    return run
+
+
+def case_plot_distribution(ctx, size):
+    scores = ctx.posts_df(size)['sentiment']
+    plotter = ctx.plotter
+
+    def run():
+        plotter.render(plotter.plot_sentiment_distribution(scores))
+        return len(scores)
+    return run
+
+
+def case_route_analyze(ctx, size):
+    app = ctx.app
+    app.review_analyzer.reddit = ctx.fake(size)
+    client = app.app.test_client()
+
+    def run():
+        app.result_cache.invalidate()
+        response = client.post('/analyze', data={'search_query': QUERY})
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyze returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response.get_json()['sentiment']['post_count']
+    return run
+
+
+CASES = {
+    'get_reddit_reviews': case_get_reddit_reviews,
+    'get_reddit_reviews_warm': case_get_reddit_reviews_warm,
+    'analyze_sentiment': case_analyze_sentiment,
+    'filter_low_quality': case_filter_low_quality,
+    'analyze_trend': case_analyze_trend,
+    'plot_trend': case_plot_trend,
+    'plot_distribution': case_plot_distribution,
+    'route_analyze': case_route_analyze,
+}
+
+
+def measure(run, repeat, warmup=1):
+    """Run `warmup` untimed then `repeat` timed calls; returns (seconds list, items from the last call)."""
+    for _ in range(warmup):
+        run()
+    times = []
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = run()
+        times.append(time.perf_counter() - start)
+    return times, items
+
+
+def summarize(name, size, times, items):
+    ordered = sorted(times)
+    median = statistics.median(ordered)
+    return {
+        'case': name,
+        'size': size,
+        'items': items,
+        'repeat': len(times),
+        'median_s': median,
+        'min_s': ordered[0],
+        'p95_s': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        'stdev_s': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'items_per_s': items / median if median else None,
+    }
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True, timeout=30).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = None, None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': {
+            'sizes': args.sizes, 'repeat': args.repeat, 'page_latency': args.page_latency,
+            'duplicate_rate': args.duplicate_rate, 'fixture': args.fixture,
+            'scorers': os.getenv('SENTIMENT_SCORERS'), 'scoring_parallel': os.getenv('SCORING_PARALLEL'),
+        },
+    }
+
+
+def compare(results, baseline_path, max_regression, out=sys.stdout):
+    """Print median ratios against a baseline run; returns the (case, size) pairs slower than max_regression."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['case'], r['size']): r for r in json.load(f)['results']}
+    print(f"\nvs {baseline_path}:", file=out)
+    regressions = []
+    for r in results:
+        base = baseline.get((r['case'], r['size']))
+        if base is None or not base['median_s']:
+            continue
+        ratio = r['median_s'] / base['median_s']
+        flag = ' REGRESSION' if ratio > max_regression else ''
+        print(f"{r['case']:>24} {r['size']:>7} {base['median_s'] * 1000:>10.2f}ms -> {r['median_s'] * 1000:>10.2f}ms  x{ratio:.2f}{flag}", file=out)
+        if flag:
+            regressions.append((r['case'], r['size']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000', help='Posts per query, comma-separated')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', default=','.join(CASES), help=f"Comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument('--page-latency', type=float, default=0.0, help='Seconds per fake listing page')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0)
+    parser.add_argument('--fixture', help='Recorded posts to replay (see benchmarks/fake_reddit.py)')
+    parser.add_argument('--json', help="Write results here ('-' for stdout)")
+    parser.add_argument('--compare', help='Baseline results JSON to compare medians against')
+    parser.add_argument('--max-regression', type=float, default=1.25,
+                        help='With --compare, exit 1 if a median is more than this many times the baseline')
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',')]
+    names = [name.strip() for name in args.cases.split(',') if name.strip()]
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    # The table goes to stderr when the JSON report is printed to stdout
+    table = sys.stderr if args.json == '-' else sys.stdout
+    print(f"{'case':>24} {'size':>7} {'median':>12} {'p95':>12} {'items':>7} {'items/s':>10}", file=table)
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ctx = Context(args, tmpdir)
+        # The pipeline prints progress on every call; keep it off the report
+        real_stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            for name in names:
+                for size in args.sizes:
+                    times, items = measure(CASES[name](ctx, size), args.repeat)
+                    result = summarize(name, size, times, items)
+                    results.append(result)
+                    print(f"{name:>24} {size:>7} {result['median_s'] * 1000:>10.2f}ms {result['p95_s'] * 1000:>10.2f}ms "
+                          f"{result['items']:>7} {result['items_per_s'] or 0:>10.0f}",
+                          file=real_stdout if table is sys.stdout else table, flush=True)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+    report = {'environment': environment(args), 'results': results}
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare and compare(results, args.compare, args.max_regression, out=table):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
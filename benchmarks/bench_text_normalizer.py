@@ -0,0 +1,67 @@
+"""
+Micro-benchmark of the shared text normalizer (utils/text.py) against the
+per-analyzer cleaners it replaced, including an equivalence check.
+
+Usage:
+    python benchmarks/bench_text_normalizer.py --size 20000
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_batch_scoring import make_corpus
+from utils.text import clean_text, simplify_text
+
+
+def legacy_clean_text(text):
+    """ReviewSentimentAnalyzer.clean_text before utils/text.py."""
+    if not isinstance(text, str):
+        return ""
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    text = re.sub(r'[^a-zA-Z0-9\s.,!?\'\"-]', '', text)
+    text = re.sub(r'<.*?>', '', text)
+    return text.strip()
+
+
+def legacy_preprocess_text(text):
+    """AdvancedReviewAnalyzer.preprocess_text before utils/text.py."""
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s.!?]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+EXTRAS = [
+    " see [this review](https://example.com/review) <b>bold</b>",
+    " www.goodreads.com/book/show/234225 — “quoted”  éè",
+    "", " \n\t multiple   spaces\n\n",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = [text + EXTRAS[i % len(EXTRAS)] for i, text in enumerate(make_corpus(args.size))]
+    pairs = (('clean_text', legacy_clean_text, clean_text), ('preprocess_text', legacy_preprocess_text, simplify_text))
+
+    print(f"{'function':>16} {'legacy us/text':>15} {'shared us/text':>15} {'speedup':>8} {'identical':>10}")
+    for name, legacy, shared in pairs:
+        identical = all(legacy(t) == shared(t) for t in texts)
+        legacy_time = min(timeit.repeat(lambda: [legacy(t) for t in texts], number=1, repeat=args.repeat))
+        shared_time = min(timeit.repeat(lambda: [shared(t) for t in texts], number=1, repeat=args.repeat))
+        print(f"{name:>16} {legacy_time / len(texts) * 1e6:>15.2f} {shared_time / len(texts) * 1e6:>15.2f} "
+              f"{legacy_time / shared_time:>7.1f}x {str(identical):>10}")
+
+
+if __name__ == '__main__':
+    main()
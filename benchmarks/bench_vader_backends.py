@@ -0,0 +1,97 @@
+"""
+Parity check and speed comparison: NLTK's SentimentIntensityAnalyzer vs models/fast_vader.py.
+
+Every text in a fixed corpus (synthetic posts, hand-written edge cases and a
+seeded mix of lexicon words, boosters, negations, caps and punctuation) must
+get exactly the same compound score from both, per text (FastVader.compound)
+and batched (FastVader.compound_batch). Exits with status 1 on any mismatch.
+
+Usage:
+    python benchmarks/bench_vader_backends.py --random 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nltk.sentiment import SentimentIntensityAnalyzer
+
+from bench_batch_scoring import make_corpus
+from models.fast_vader import FastVader
+from models.scorers import FastVaderScorer, VaderScorer
+
+EDGE_CASES = [
+    "", "   ", "a", "I", "!!!", ":) :( <3", "The book was GOOD", "The book was GOOD but the ending was BAD",
+    "not bad at all", "never so good", "never this bad", "at least it was fine", "very least good",
+    "it was kind of good", "sort of boring", "the shit", "this book is the bomb", "yeah right, great",
+    "kiss of death for the series", "bad ass heroine", "it cut the mustard", "living hand to mouth",
+    "extremely good!!!", "EXTREMELY good", "barely readable??", "so so good???", "good, good, good!",
+    "(good) [bad] {meh}", "don't like it", "isn't great", "wasn't terrible but wasn't good",
+    "great! great!! great!!!", "!great ,awful awful.", "I can't even... 10/10 would read again",
+    "uh-uh, no way", "without doubt the best", "Despite the hype it was dull", "nope nope nope",
+]
+VOCAB_EXTRA = [
+    "but", "BUT", "not", "never", "so", "this", "least", "at", "very", "kind", "of", "sort", "the",
+    "shit", "bomb", "yeah", "right", "cut", "mustard", "kiss", "death", "hand", "to", "mouth", "bad",
+    "ass", "don't", "isn't", "extremely", "EXTREMELY", "barely", "GOOD", "great!", "!great", "good,",
+    "(good)", "..", "!!!", "??", ":)", ":-(", "<3", "a", "I", "without", "uh-uh", "n't", "kind-of",
+]
+
+
+def make_parity_corpus(lexicon, random_texts, seed=7):
+    rng = random.Random(seed)
+    vocab = sorted(lexicon)[:3000] + VOCAB_EXTRA
+    texts = list(EDGE_CASES) + make_corpus(3000)
+    for _ in range(random_texts):
+        tokens = [rng.choice(vocab) for _ in range(rng.randint(0, 25))]
+        tokens = [t.upper() if rng.random() < 0.1 else t for t in tokens]
+        tokens = [t + rng.choice(['', ',', '!', '?', '.', '!!', '...', "'"]) if rng.random() < 0.3 else t for t in tokens]
+        texts.append(" ".join(tokens))
+    return texts
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    fn(texts)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--random', type=int, default=20000, help='Number of random lexicon-soup texts')
+    args = parser.parse_args()
+
+    sia = SentimentIntensityAnalyzer()
+    fast = FastVader(sia.lexicon)
+    texts = make_parity_corpus(sia.lexicon, args.random)
+
+    mismatches = [(t, sia.polarity_scores(t)['compound'], fast.compound(t)) for t in texts
+                  if sia.polarity_scores(t)['compound'] != fast.compound(t)]
+    print(f"parity: {len(texts) - len(mismatches)}/{len(texts)} texts identical")
+    for text, expected, got in mismatches[:10]:
+        print(f"  MISMATCH nltk={expected} fast={got}: {text!r}")
+    expected = [sia.polarity_scores(t)['compound'] for t in texts]
+    batched = fast.compound_batch(texts, chunk_size=5000).tolist() # Several chunks
+    batch_mismatches = [(t, e, got) for t, e, got in zip(texts, expected, batched) if e != got]
+    print(f"batched parity: {len(texts) - len(batch_mismatches)}/{len(texts)} texts identical")
+    for text, expected, got in batch_mismatches[:10]:
+        print(f"  MISMATCH nltk={expected} batch={got}: {text!r}")
+
+    rows = [
+        ('nltk per text', timed(lambda ts: [sia.polarity_scores(t) for t in ts], texts)),
+        ('fast per text', timed(lambda ts: [fast.compound(t) for t in ts], texts)),
+        ('fast batch', timed(fast.compound_batch, texts)),
+        ('vader scorer', timed(VaderScorer().score, texts)),
+        ('vader_fast scorer', timed(FastVaderScorer().score, texts)),
+    ]
+    print(f"{'backend':>18} {'texts/s':>10}")
+    for name, seconds in rows:
+        print(f"{name:>18} {len(texts) / seconds:>10.0f}")
+    sys.exit(1 if mismatches or batch_mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
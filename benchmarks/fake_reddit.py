@@ -0,0 +1,274 @@
+"""
+Offline stand-in for the parts of praw.Reddit the analyzers use.
+
+FakeReddit().subreddit(name).search(query, limit=...) yields FakeSubmission
+objects in pages, sleeping `page_latency` seconds before each page the way a
+real listing blocks on an HTTP round trip.
+
+Queries are answered from a recorded fixture when one is given (see
+record_fixture) and synthesized deterministically otherwise. Record a fixture
+with live credentials from .env:
+
+    python benchmarks/fake_reddit.py "Dune" "Project Hail Mary" -o fixture.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+from praw.exceptions import ClientException
+
+WORDS_POSITIVE = ["loved", "amazing", "beautiful", "great", "fantastic", "brilliant", "enjoyed"]
+WORDS_NEGATIVE = ["boring", "hated", "awful", "disappointing", "slow", "terrible", "confusing"]
+FILLER = ["the", "plot", "characters", "ending", "world", "writing", "series", "chapter", "book", "pacing"]
+
+
+class FakeSubreddit:
+    def __init__(self, reddit, name):
+        self._reddit = reddit
+        self.display_name = name.split('+')[0]
+
+    def search(self, query, limit=100, sort='relevance', time_filter='all', params=None):
+        self._reddit.searches += 1
+        posts = self._reddit.corpus(query)
+        after = (params or {}).get('after') # Resume after this fullname, like a listing's `after`
+        if after:
+            ids = [f"t3_{post.id}" for post in posts]
+            posts = posts[ids.index(after) + 1:] if after in ids else []
+        posts = posts[:limit]
+        page_size = self._reddit.page_size
+        for start in range(0, len(posts), page_size):
+            if self._reddit.page_latency:
+                time.sleep(self._reddit.page_latency)
+            self._reddit.requests += 1
+            self._reddit.maybe_fail()
+            yield from posts[start:start + page_size]
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class FakeResponseError(Exception):
+    """Shaped like prawcore's TooManyRequests / ServerError: the response is on `.response`."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"received {status_code} HTTP response")
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+        self.response = FakeResponse(status_code, headers)
+
+
+class FakeCommentForest(list):
+    def replace_more(self, limit=32):
+        return [] # The fake tree has no "load more" stubs
+
+
+class FakeComment:
+    def __init__(self, comment_id, body, score, created_utc, permalink):
+        self.id = comment_id
+        self.body = body
+        self.score = score
+        self.created_utc = created_utc
+        self.permalink = permalink
+        self.stickied = False
+        self.replies = FakeCommentForest()
+
+
+class FakeSubmission:
+    """
+    Like PRAW's Submission, reading `comments` (even via hasattr) fetches the tree
+    once with the current comment_sort / comment_limit, and setting either of them
+    afterwards raises ClientException.
+    """
+
+    def __init__(self, post_id, title, selftext, score, created_utc, subreddit, num_comments=0, crosspost_parent=None):
+        self._fetched = False
+        self.id = post_id
+        self.title = title
+        self.selftext = selftext
+        self.score = score
+        self.created_utc = created_utc
+        self.permalink = f"/r/{subreddit.display_name}/comments/{post_id}/"
+        self.subreddit = subreddit
+        self.num_comments = num_comments
+        self.comment_sort = 'confidence'
+        if crosspost_parent is not None: # Like PRAW, only crossposts have the attribute
+            self.crosspost_parent = crosspost_parent
+        self.comment_limit = 2048
+
+    def __setattr__(self, attribute, value):
+        if attribute in ('comment_limit', 'comment_sort') and getattr(self, '_fetched', False):
+            raise ClientException(f"Cannot update {attribute!r} because the comments for this submission "
+                                  "have already been fetched.")
+        super().__setattr__(attribute, value)
+
+    @property
+    def comments(self):
+        if not self._fetched:
+            self._comments = self._fetch_comments()
+            self._fetched = True
+        return self._comments
+
+    def _fetch_comments(self):
+        """A synthetic tree: up to `comment_limit` comments, three replies per comment."""
+        rng = random.Random(self.id)
+        total = min(self.num_comments, self.comment_limit)
+        forest = FakeCommentForest()
+        frontier = [forest]
+        for i in range(total):
+            parent = frontier[i // 3] if i >= 10 else forest # 10 top-level comments, then replies
+            words = rng.sample(FILLER, 4) + rng.sample(WORDS_POSITIVE + WORDS_NEGATIVE, 2)
+            comment = FakeComment(
+                f"{self.id}c{i}", " ".join(words) * 2, rng.randint(0, 50),
+                self.created_utc + rng.randint(0, 30) * 86400, f"{self.permalink}c{i}/"
+            )
+            parent.append(comment)
+            frontier.append(comment.replies)
+        return forest
+
+
+class FakeReddit:
+    """Deterministic synthetic corpus per query, served with configurable latency."""
+
+    def __init__(self, posts_per_query=100, page_size=100, page_latency=0.0, seed=0, comments_per_post=0,
+                 duplicate_rate=0.0, fixture=None, error_rate=0.0, error_status=429, retry_after=None, overlap=0.0):
+        self.posts_per_query = posts_per_query
+        # {query: [post dict, ...]} or a path to one; recorded posts are served first,
+        # then synthetic ones up to posts_per_query
+        self.fixture = load_fixture(fixture) if isinstance(fixture, str) else (fixture or {})
+        self.duplicate_rate = duplicate_rate # Share of posts that are crossposts / lightly edited copies
+        self.overlap = overlap # Share of each query's posts drawn from a pool common to all queries
+        self._shared = None
+        self.comments_per_post = comments_per_post
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.seed = seed
+        # Share of listing pages that fail with `error_status` (and Retry-After, if given) instead
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self._error_rng = random.Random(f"{seed}:errors")
+        self.errors = 0 # Pages failed on purpose
+        self.requests = 0 # Listing pages served
+        self.searches = 0 # search() calls
+        self._corpora = {}
+
+    def subreddit(self, name):
+        return FakeSubreddit(self, name)
+
+    def maybe_fail(self):
+        if self.error_rate and self._error_rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeResponseError(self.error_status, self.retry_after)
+
+    def corpus(self, query):
+        key = query.lower()
+        if key not in self._corpora:
+            rng = random.Random(f"{self.seed}:{key}")
+            subreddit = FakeSubreddit(self, 'books')
+            posts = [self._replay(post) for post in self.fixture.get(key, [])[:self.posts_per_query]]
+            shared = rng.sample(self.shared_pool(), len(self.shared_pool())) if self.overlap else []
+            for i in range(len(posts), self.posts_per_query):
+                if shared and rng.random() < self.overlap:
+                    posts.append(shared.pop())
+                    continue
+                if posts and self.duplicate_rate and rng.random() < self.duplicate_rate:
+                    posts.append(self._duplicate(rng, f"{zlib.crc32(key.encode()):x}{i:05d}", rng.choice(posts)))
+                    continue
+                words = rng.sample(FILLER, 5) + rng.sample(WORDS_POSITIVE if rng.random() < 0.6 else WORDS_NEGATIVE, 2)
+                rng.shuffle(words)
+                posts.append(FakeSubmission(
+                    post_id=f"{zlib.crc32(key.encode()):x}{i:05d}",
+                    title=f"Thoughts on {query} #{i}",
+                    selftext=" ".join(words) * rng.randint(1, 4),
+                    score=rng.randint(0, 500),
+                    created_utc=1.6e9 + rng.randint(0, 3 * 365) * 86400,
+                    subreddit=subreddit,
+                    num_comments=self.comments_per_post,
+                ))
+            self._corpora[key] = posts
+        return self._corpora[key]
+
+    def shared_pool(self):
+        """Posts that match every query (e.g. a thread discussing several books), for `overlap`."""
+        if self._shared is None:
+            self._shared = FakeReddit(self.posts_per_query, seed=f"{self.seed}:shared").corpus('shared')
+        return self._shared
+
+    def _replay(self, post):
+        return FakeSubmission(
+            post_id=post['id'], title=post['title'], selftext=post['selftext'], score=post['score'],
+            created_utc=post['created_utc'], subreddit=FakeSubreddit(self, post['subreddit']),
+            num_comments=self.comments_per_post, crosspost_parent=post.get('crosspost_parent'),
+        )
+
+    def _duplicate(self, rng, post_id, original):
+        """A crosspost of `original` (same text) or a copy with one word changed."""
+        selftext = original.selftext
+        crosspost_parent = None
+        if rng.random() < 0.5:
+            crosspost_parent = f"t3_{original.id}"
+        else:
+            words = selftext.split()
+            words[rng.randrange(len(words))] = rng.choice(FILLER)
+            selftext = " ".join(words)
+        return FakeSubmission(
+            post_id=post_id, title=original.title, selftext=selftext, score=rng.randint(0, 500),
+            created_utc=original.created_utc + rng.randint(0, 7) * 86400,
+            subreddit=FakeSubreddit(self, rng.choice(['suggestmeabook', 'fantasy', 'bookclub'])),
+            crosspost_parent=crosspost_parent,
+        )
+
+
+def load_fixture(path):
+    """Read a fixture written by record_fixture(): {lowercased query: [post dict, ...]}."""
+    with open(path, encoding='utf-8') as f:
+        return {query.lower(): posts for query, posts in json.load(f).items()}
+
+
+def record_fixture(reddit, queries, path, limit=100, subreddits=None):
+    """Search a live praw.Reddit for each query and save the submissions as a replayable fixture."""
+    if subreddits is None:
+        from reddit_sentiment import SUBREDDITS as subreddits
+    fixture = {}
+    for query in queries:
+        fixture[query.lower()] = [
+            {
+                'id': post.id,
+                'title': post.title,
+                'selftext': post.selftext,
+                'score': post.score,
+                'created_utc': float(post.created_utc),
+                'subreddit': post.subreddit.display_name,
+                'crosspost_parent': vars(post).get('crosspost_parent'),
+            }
+            for post in reddit.subreddit(subreddits).search(query, limit=limit, sort='relevance', time_filter='all')
+        ]
+        print(f"Recorded {len(fixture[query.lower()])} posts for '{query}'.")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f)
+    return fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record live Reddit search results as a FakeReddit fixture')
+    parser.add_argument('queries', nargs='+')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from reddit_sentiment import ReviewSentimentAnalyzer
+    reddit = ReviewSentimentAnalyzer().reddit
+    if not reddit:
+        sys.exit("Reddit API not available; check the credentials in .env.")
+    record_fixture(reddit, args.queries, args.output, limit=args.limit)
+
+
+if __name__ == '__main__':
+    main()
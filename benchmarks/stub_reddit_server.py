@@ -0,0 +1,175 @@
+"""
+Local stub of Reddit's JSON search endpoint, backed by the FakeReddit corpus.
+
+Serves GET /r/<subreddit>/search.json?q=...&limit=...&after=... with optional
+per-request latency, for exercising HttpSearchBackend / AsyncRedditFetcher
+without network access. Connections are kept alive (HTTP/1.1).
+
+Rate limiting works like Reddit's: `ratelimit` requests per `window` seconds,
+reported in X-Ratelimit-* headers, and a 429 once the window is used up.
+`error_rate` additionally answers that share of requests with `error_status`
+(429 by default, with Retry-After: `retry_after`).
+
+Usage:
+    python benchmarks/stub_reddit_server.py --port 8765 --latency 0.2 --error-rate 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_reddit import FakeReddit
+
+
+def _listing(posts, after):
+    return {'kind': 'Listing', 'data': {'after': after, 'children': [
+        {'kind': 't3', 'data': {
+            'id': post.id, 'title': post.title, 'selftext': post.selftext, 'score': post.score,
+            'created_utc': post.created_utc, 'permalink': post.permalink,
+            'subreddit': post.subreddit.display_name, 'num_comments': post.num_comments,
+        }} for post in posts
+    ]}}
+
+
+class StubRedditHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive
+    disable_nagle_algorithm = True # Headers and body are separate writes; don't stall the body on a delayed ACK
+    fake = None
+    latency = 0.0
+    ratelimit = 600 # Requests allowed per window, reported via X-Ratelimit-* headers
+    window = 600 # Seconds
+    error_rate = 0.0
+    error_status = 429
+    retry_after = 1
+    rng = None
+    requests_served = 0
+    errors_served = 0
+    connections = 0
+    window_start = None
+    window_used = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            type(self).connections += 1
+
+    def _count_request(self):
+        """Returns (error status or None, requests used in this window, seconds until it resets)."""
+        cls = type(self)
+        with self.lock:
+            cls.requests_served += 1
+            now = time.monotonic()
+            if cls.window_start is None or now - cls.window_start >= cls.window:
+                cls.window_start, cls.window_used = now, 0
+            reset = cls.window - (now - cls.window_start)
+            if cls.window_used >= cls.ratelimit:
+                status = 429
+            elif cls.error_rate and cls.rng.random() < cls.error_rate:
+                status = cls.error_status
+            else:
+                status = None
+            if status is None:
+                cls.window_used += 1
+            else:
+                cls.errors_served += 1
+            return status, cls.window_used, reset
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        parts = parsed.path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'r' or parts[2] != 'search.json':
+            self.send_error(404)
+            return
+        params = urllib.parse.parse_qs(parsed.query)
+        query = params.get('q', [''])[0]
+        limit = int(params.get('limit', ['25'])[0])
+        after = params.get('after', [None])[0]
+
+        status, used, reset = self._count_request()
+        if self.latency:
+            time.sleep(self.latency)
+        if status is not None:
+            retry_after = self.retry_after if used < self.ratelimit else reset
+            self._send_json(status, {'message': 'Too Many Requests' if status == 429 else 'Server Error', 'error': status},
+                            used, reset, {'Retry-After': str(int(retry_after + 0.999))} if status == 429 else None)
+            return
+
+        posts = self.fake.corpus(query)
+        start = 0
+        if after:
+            ids = [p.id for p in posts]
+            start = ids.index(after) + 1 if after in ids else len(posts)
+        page = posts[start:start + limit]
+        next_after = page[-1].id if page and start + limit < len(posts) else None
+        self._send_json(200, _listing(page, next_after), used, reset)
+
+    def _send_json(self, status, payload, used, reset, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Ratelimit-Used', str(used))
+        self.send_header('X-Ratelimit-Remaining', str(max(0, self.ratelimit - used)))
+        self.send_header('X-Ratelimit-Reset', str(int(reset + 0.999)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return # The client hung up mid-response (e.g. its deadline passed)
+        super().handle_error(request, client_address)
+
+
+def start_stub_server(fake=None, latency=0.0, port=0, **handler_options):
+    """Start the stub on a background thread; returns (server, base_url)."""
+    handler = type('Handler', (StubRedditHandler,), {
+        'fake': fake or FakeReddit(), 'latency': latency, 'requests_served': 0, 'errors_served': 0, 'connections': 0,
+        'window_start': None, 'window_used': 0, 'rng': random.Random(handler_options.pop('seed', 0)), **handler_options
+    })
+    server = StubServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.handler = handler # Counters: requests_served, errors_served, connections
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+    parser.add_argument('--posts', type=int, default=100, help='Posts per query in the fake corpus')
+    parser.add_argument('--ratelimit', type=int, default=600, help='Requests allowed per --window seconds')
+    parser.add_argument('--window', type=float, default=600)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=429)
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After seconds on injected 429s')
+    args = parser.parse_args()
+    server, base_url = start_stub_server(
+        FakeReddit(posts_per_query=args.posts), args.latency, args.port, ratelimit=args.ratelimit, window=args.window,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after
+    )
+    print(f"Stub Reddit serving at {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-import praw
 import pandas as pd
 import numpy as np
 from nltk.sentiment import SentimentIntensityAnalyzer
@@ -6,6 +5,9 @@ from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 import nltk
+from models.batch_scorer import BatchSentimentScorer
+from utils.reddit_http import resumable_listing, thread_reddit
+from utils.text import clean_batch
 
 # Download required NLTK data - CORRECTED EXCEPTION HANDLING
 try:
@@ -20,18 +22,16 @@ load_dotenv()
 class BookReviewAnalyzer:
     def __init__(self):
         try:
-            self.reddit = praw.Reddit(
-                client_id=os.getenv('REDDIT_CLIENT_ID'),
-                client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-                user_agent=os.getenv('REDDIT_USER_AGENT')
-            )
-            self.reddit.user.me() # Check if authentication works
+            # Pooled, rate-limited session shared with the web app's analyzer (utils/reddit_http.py)
+            self.reddit = thread_reddit()
+            self.reddit.auth.scopes() # Check if authentication works (user.me() raises in read-only mode)
         except Exception as e:
             print(f"Error initializing Reddit API: {e}")
             print("Please ensure your .env file has correct Reddit credentials.")
             self.reddit = None # Set to None if initialization fails
 
         self.sia = SentimentIntensityAnalyzer()
+        self.batch_scorer = BatchSentimentScorer(self.sia)
 
     def get_reddit_reviews(self, query, limit=100):
         """Fetch Reddit posts about a specific book or author."""
@@ -43,9 +43,13 @@ class BookReviewAnalyzer:
         # Search in book-related subreddits
         subreddits_to_search = 'books+suggestmeabook+literature+bookclub'
         print(f"Searching Reddit for '{query}' in subreddits: {subreddits_to_search}...")
+        subreddit = self.reddit.subreddit(subreddits_to_search)
         try:
-            for post in self.reddit.subreddit(subreddits_to_search).search(
-                query, limit=limit, sort='relevance', time_filter='all' # Search all time for relevance
+            # Search all time for relevance; 429s / 5xx are retried from the last post received
+            for post in resumable_listing(
+                lambda remaining, params: subreddit.search(query, limit=remaining, sort='relevance',
+                                                           time_filter='all', params=params),
+                limit
             ):
                 # Basic check if the query term is likely related to the post content
                 if query.lower() in post.title.lower() or query.lower() in post.selftext.lower():
@@ -81,9 +85,9 @@ class BookReviewAnalyzer:
             return "No relevant Reddit posts found.", pd.DataFrame()
 
         # Calculate sentiment for each post
-        # Combine title and text for a more comprehensive sentiment analysis
-        posts_df['full_text'] = posts_df['title'] + " " + posts_df['text']
-        posts_df['sentiment'] = posts_df['full_text'].apply(self.analyze_sentiment)
+        # Combine title and text for a more comprehensive sentiment analysis (cleaned once, here)
+        posts_df['full_text'] = clean_batch(posts_df['title'] + " " + posts_df['text'])
+        posts_df['sentiment'] = self.batch_scorer.score_vader(posts_df['full_text'])
 
         # Calculate average sentiment
         avg_sentiment = posts_df['sentiment'].mean()
@@ -0,0 +1,364 @@
+import heapq
+import math
+
+import numpy as np
+
+from models.result_assembly import CATEGORY_NAMES, categorize
+
+# plot_sentiment_distribution's bins: 20 over the VADER compound range
+HISTOGRAM_BINS = 20
+HISTOGRAM_RANGE = (-1.0, 1.0)
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Every aggregate below keeps constant-size state however many values it has
+# seen, folds values in batch by batch with add(), combines with another
+# instance of the same kind (built on another shard / worker) with merge(),
+# and round-trips through to_dict() / from_dict() as plain JSON.
+
+
+def _floats(values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return values[~np.isnan(values)]
+
+
+class RunningStats:
+    """Count, mean, variance (Welford / Chan et al. pairwise update), min and max."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # Sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        values = _floats(values)
+        if len(values):
+            batch_mean = float(values.mean())
+            self._combine(len(values), batch_mean, float(((values - batch_mean) ** 2).sum()),
+                          float(values.min()), float(values.max()))
+        return self
+
+    def _combine(self, count, mean, m2, low, high):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def variance(self, ddof=1):
+        """Variance (sample by default, like pandas); None with too few values."""
+        return self.m2 / (self.count - ddof) if self.count > ddof else None
+
+    def std(self, ddof=1):
+        variance = self.variance(ddof)
+        return math.sqrt(variance) if variance is not None else None
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        if data['count']:
+            stats._combine(data['count'], data['mean'], data['m2'], data['min'], data['max'])
+        return stats
+
+
+class Histogram:
+    """
+    Fixed-bin counts over [low, high], binned like numpy / seaborn (each bin
+    half-open except the last). Values outside the range are counted apart.
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS, value_range=HISTOGRAM_RANGE):
+        self.edges = np.linspace(value_range[0], value_range[1], bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, values):
+        values = _floats(values)
+        inside = (values >= self.edges[0]) & (values <= self.edges[-1])
+        self.underflow += int((values < self.edges[0]).sum())
+        self.overflow += int((values > self.edges[-1]).sum())
+        index = np.searchsorted(self.edges, values[inside], side='right') - 1
+        self.counts += np.bincount(np.minimum(index, len(self.counts) - 1), minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bins.")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def to_dict(self):
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist(),
+                'underflow': self.underflow, 'overflow': self.overflow}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(len(data['counts']), (data['edges'][0], data['edges'][-1]))
+        histogram.counts = np.array(data['counts'], dtype=np.int64)
+        histogram.underflow, histogram.overflow = data['underflow'], data['overflow']
+        return histogram
+
+
+class TDigest:
+    """
+    Quantile sketch (Dunning's merging t-digest with the arcsine scale
+    function). Values are buffered and periodically sorted into at most about
+    `compression` / 2 centroids, small near the tails and larger in the
+    middle, so extreme quantiles stay accurate. Exact until the first
+    compression (buffer_size values).
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 10 * compression
+        self.means = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self._buffer = [] # (values, weights) pairs not yet compressed
+        self._buffered = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if not len(values):
+            return self
+        self._buffer.append((values, weights))
+        self._buffered += len(values)
+        self.count += weights.sum()
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if self._buffered >= self.buffer_size:
+            self._compress()
+        return self
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + [values for values, _ in self._buffer])
+        weights = np.concatenate([self.weights] + [weights for _, weights in self._buffer])
+        self._buffer, self._buffered = [], 0
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        # Centroids whose left edge falls in the same unit of the scale function k(q) are merged
+        left = (np.cumsum(weights) - weights) / weights.sum()
+        k = np.floor(self.compression / (2 * math.pi) * np.arcsin(2 * left - 1))
+        starts = np.flatnonzero(np.concatenate(([True], k[1:] != k[:-1])))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def merge(self, other):
+        other._compress()
+        if other.count:
+            self.add(other.means, other.weights)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Estimated value(s) at quantile(s) q in [0, 1]; NaN when empty."""
+        self._compress()
+        q = np.asarray(q, dtype=np.float64)
+        if not self.count:
+            return np.full(q.shape, np.nan) if q.ndim else float('nan')
+        # Interpolate between centroid centres, pinned to the exact min / max at the ends
+        centres = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0.0], centres, [self.count]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        result = np.interp(q * self.count, positions, values)
+        return result if q.ndim else float(result)
+
+    def cdf(self, x):
+        """Estimated share of values <= x."""
+        self._compress()
+        if not self.count:
+            return float('nan')
+        centres = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0.0], centres, [self.count]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return float(np.interp(x, values, positions) / self.count)
+
+    def to_dict(self):
+        self._compress()
+        return {'compression': self.compression, 'means': self.means.tolist(), 'weights': self.weights.tolist(),
+                'count': self.count, 'min': self.min if self.count else None, 'max': self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data['compression'])
+        digest.means = np.array(data['means'], dtype=np.float64)
+        digest.weights = np.array(data['weights'], dtype=np.float64)
+        digest.count = data['count']
+        if data['count']:
+            digest.min, digest.max = data['min'], data['max']
+        return digest
+
+
+class TopK:
+    """
+    The k items with the highest `key` (default: Reddit score) on a min-heap.
+    Ties keep the item added first, matching analyze_sentiment's stable sort.
+    """
+
+    def __init__(self, k=10, key='score'):
+        self.k = k
+        self.key = key
+        self._heap = [] # (key value, -sequence, item); the smallest is evicted first
+        self._added = 0
+
+    def add(self, items):
+        if self.k <= 0:
+            return self
+        items = list(items)
+        scores = np.array([item.get(self.key) or 0 for item in items], dtype=np.float64)
+        candidates = range(len(items))
+        if len(self._heap) == self.k: # Only items that beat the current minimum can get in
+            candidates = np.flatnonzero(scores > self._heap[0][0]).tolist()
+        for i in candidates:
+            entry = (scores[i], -(self._added + i), items[i])
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, entry)
+            elif entry[:2] > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, entry)
+        self._added += len(items)
+        return self
+
+    def merge(self, other):
+        return self.add(other.items())
+
+    def items(self):
+        """The kept items, highest key first."""
+        return [entry[2] for entry in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def to_dict(self):
+        return {'k': self.k, 'key': self.key, 'items': self.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['k'], data['key']).add(data['items'])
+
+
+class SentimentAggregate:
+    """
+    Constant-memory summary of a stream of scored post dicts, for volumes too
+    large to hold (comments, the whole review corpus): VADER mean / variance,
+    the category distribution, the 20-bin histogram, a t-digest for
+    quantiles, the TextBlob mean, and the `top_k` highest-scored posts per
+    category. summary() has analyze_sentiment's shape, with only the top
+    posts, plus a `sentiment_stats` block.
+    """
+
+    def __init__(self, top_k=10, compression=100):
+        self.post_count = 0
+        self.stats = RunningStats()
+        self.textblob = RunningStats()
+        self.histogram = Histogram()
+        self.digest = TDigest(compression)
+        self.categories = np.zeros(len(CATEGORY_NAMES), dtype=np.int64)
+        self.top = {name: TopK(top_k) for name in CATEGORY_NAMES}
+        self.best = TopK(1) # Highest-scored post overall
+
+    def add_posts(self, posts):
+        """Fold in a batch of post dicts (each gets its `sentiment_category` set)."""
+        posts = list(posts)
+        if not posts:
+            return self
+        sentiment = np.array([post.get('sentiment') for post in posts], dtype=np.float64)
+        self.post_count += len(posts)
+        self.stats.add(sentiment)
+        self.textblob.add(np.array([post.get('sentiment_textblob') for post in posts], dtype=np.float64))
+        self.histogram.add(sentiment)
+        self.digest.add(sentiment)
+        codes = categorize(sentiment)
+        self.categories += np.bincount(codes, minlength=len(CATEGORY_NAMES))
+        for code, name in enumerate(CATEGORY_NAMES):
+            members = [post for post, post_code in zip(posts, codes.tolist()) if post_code == code]
+            for post in members:
+                post['sentiment_category'] = name
+            self.top[name].add(members)
+        self.best.add(posts)
+        return self
+
+    def merge(self, other):
+        self.post_count += other.post_count
+        self.stats.merge(other.stats)
+        self.textblob.merge(other.textblob)
+        self.histogram.merge(other.histogram)
+        self.digest.merge(other.digest)
+        self.categories += other.categories
+        for name in CATEGORY_NAMES:
+            self.top[name].merge(other.top[name])
+        self.best.merge(other.best)
+        return self
+
+    def top_post(self):
+        """The highest-scored post seen (the first of equals), or None."""
+        best = self.best.items()
+        return best[0] if best else None
+
+    def distribution(self):
+        """{category: count}, most common first, as analyze_sentiment reports it."""
+        order = sorted(np.flatnonzero(self.categories).tolist(), key=lambda code: -self.categories[code])
+        return {CATEGORY_NAMES[code]: int(self.categories[code]) for code in order}
+
+    def summary(self, quantiles=SUMMARY_QUANTILES):
+        return {
+            'average_sentiment': self.stats.mean if self.stats.count else None,
+            'post_count': self.post_count,
+            'sentiment_distribution': self.distribution(),
+            'positive_posts': self.top['positive'].items(),
+            'neutral_posts': self.top['neutral'].items(),
+            'negative_posts': self.top['negative'].items(),
+            'sentiment_stats': {
+                'std': self.stats.std(),
+                'min': self.stats.min if self.stats.count else None,
+                'max': self.stats.max if self.stats.count else None,
+                'quantiles': {str(q): value if value == value else None # NaN (no values) -> null
+                              for q, value in zip(quantiles, self.digest.quantile(quantiles).tolist())},
+                'histogram': {'edges': self.histogram.edges.tolist(), 'counts': self.histogram.counts.tolist()},
+                'average_textblob': self.textblob.mean if self.textblob.count else None,
+            },
+        }
+
+    def to_dict(self):
+        return {
+            'post_count': self.post_count,
+            'stats': self.stats.to_dict(),
+            'textblob': self.textblob.to_dict(),
+            'histogram': self.histogram.to_dict(),
+            'digest': self.digest.to_dict(),
+            'categories': self.categories.tolist(),
+            'top': {name: top.to_dict() for name, top in self.top.items()},
+            'best': self.best.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.post_count = data['post_count']
+        aggregate.stats = RunningStats.from_dict(data['stats'])
+        aggregate.textblob = RunningStats.from_dict(data['textblob'])
+        aggregate.histogram = Histogram.from_dict(data['histogram'])
+        aggregate.digest = TDigest.from_dict(data['digest'])
+        aggregate.categories = np.array(data['categories'], dtype=np.int64)
+        aggregate.top = {name: TopK.from_dict(top) for name, top in data['top'].items()}
+        aggregate.best = TopK.from_dict(data['best'])
+        return aggregate
@@ -0,0 +1,160 @@
+import re
+
+import numpy as np
+
+# NLTK and TextBlob are imported by BatchSentimentScorer on first use: importing them
+# costs seconds, and this module is imported at web-worker startup.
+
+# Alphanumeric pieces used for the lexicon pre-check
+_WORD_RE = re.compile(r'[a-z0-9]+')
+# Anything outside this set might be (part of) an emoticon, so it always goes through the full scorer
+_SYMBOL_RE = re.compile(r'[^a-z0-9\s.,!?\'"-]')
+
+
+def _lexicon_pieces(keys):
+    """Every alphanumeric piece of every lexicon entry (covers multi-word and hyphenated entries)."""
+    pieces = set()
+    for key in keys:
+        pieces.update(_WORD_RE.findall(key.lower()))
+    return frozenset(pieces)
+
+
+def _as_text_list(texts):
+    if not isinstance(texts, list) and hasattr(texts, 'tolist'): # pandas Series / NumPy array
+        texts = texts.tolist()
+    return [t if isinstance(t, str) else "" for t in texts]
+
+
+def quality_scores(text_lengths, reddit_scores, sentiments):
+    """
+    Column-wise version of AdvancedReviewAnalyzer.calculate_quality_score.
+    All arguments are array-likes of equal length; returns a float64 array.
+    """
+    text_lengths = np.asarray(text_lengths, dtype=np.float64)
+    reddit_scores = np.asarray(reddit_scores, dtype=np.float64)
+    sentiments = np.asarray(sentiments, dtype=np.float64)
+    score = np.where(text_lengths > 150, 0.4, 0.0)
+    score += np.where(reddit_scores > 5, 0.3, 0.0)
+    score += np.abs(sentiments) * 0.3
+    return np.minimum(score, 1.0)
+
+
+class BatchSentimentScorer:
+    """
+    Scores many texts in one call and returns NumPy arrays.
+
+    Identical texts are scored once, and texts that share no token with a
+    scorer's lexicon get an exact 0.0 without running the scorer (neither
+    VADER nor TextBlob can produce a non-zero score without a lexicon hit).
+    Texts are expected to be cleaned already; they are scored as given.
+
+    `sia` can be any object with a `lexicon` dict and a VADER-compatible
+    `polarity_scores()` (e.g. models.fast_vader.FastVader). VADER runs over the
+    whole batch at once (FastVader.compound_batch: one tokenize pass, then
+    vectorized lexicon lookups and per-text sums) when `sia` has
+    `compound_batch` or is NLTK's analyzer, whose lexicon FastVader reuses;
+    other analyzers are called per text.
+    """
+
+    def __init__(self, sia=None):
+        # Lexicons are loaded on first use, so a scorer only pays for the models it runs
+        self._sia = sia
+        self._textblob = None
+        self._compound_batch = None
+        self._vader_pieces = None
+        self._textblob_pieces = None
+
+    @property
+    def sia(self):
+        if self._sia is None:
+            from utils.nltk_data import ensure_nltk_data
+            ensure_nltk_data('vader_lexicon')
+            from nltk.sentiment import SentimentIntensityAnalyzer
+            self._sia = SentimentIntensityAnalyzer()
+        return self._sia
+
+    @property
+    def textblob(self):
+        if self._textblob is None:
+            from textblob.en.sentiments import PatternAnalyzer
+            self._textblob = PatternAnalyzer()
+        return self._textblob
+
+    def _get_compound_batch(self):
+        """compound_batch of `sia` (or of a FastVader on its lexicon), or None if it can only score per text."""
+        if self._compound_batch is None:
+            from nltk.sentiment import SentimentIntensityAnalyzer
+            from models.fast_vader import FastVader
+            if hasattr(self.sia, 'compound_batch'):
+                self._compound_batch = self.sia.compound_batch
+            elif type(self.sia) is SentimentIntensityAnalyzer: # Subclasses may score differently
+                self._compound_batch = FastVader(self.sia.lexicon).compound_batch
+            else:
+                self._compound_batch = False
+        return self._compound_batch or None
+
+    def _get_vader_pieces(self):
+        if self._vader_pieces is None:
+            self._vader_pieces = _lexicon_pieces(self.sia.lexicon.keys())
+        return self._vader_pieces
+
+    def _get_textblob_pieces(self):
+        if self._textblob_pieces is None:
+            from textblob.en import sentiment as pattern_sentiment
+            pattern_sentiment.load()
+            self._textblob_pieces = _lexicon_pieces(pattern_sentiment.keys())
+        return self._textblob_pieces
+
+    def score_batch(self, texts, with_textblob=True, with_vader=True):
+        """
+        Score a list or Series of texts.
+
+        Returns (compound, polarity): VADER compound scores and TextBlob
+        polarity scores as float64 arrays. `compound` is None when
+        `with_vader` is False and `polarity` is None when `with_textblob` is False.
+        """
+        texts = _as_text_list(texts)
+        if not texts:
+            empty = np.zeros(0, dtype=np.float64)
+            return (empty if with_vader else None), (empty.copy() if with_textblob else None)
+
+        # Deduplicate: score each distinct text once and scatter back
+        unique_index = {}
+        inverse = np.empty(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            inverse[i] = unique_index.setdefault(text, len(unique_index))
+        unique_texts = list(unique_index)
+
+        compound_batch = self._get_compound_batch() if with_vader else None
+        per_text_vader = with_vader and compound_batch is None
+        vader_pieces = self._get_vader_pieces() if per_text_vader else None
+        textblob_pieces = self._get_textblob_pieces() if with_textblob else None
+        polarity_scores = self.sia.polarity_scores if per_text_vader else None
+        analyze = self.textblob.analyze if with_textblob else None
+
+        if compound_batch is not None:
+            compound = compound_batch(unique_texts)
+        else:
+            compound = np.zeros(len(unique_texts), dtype=np.float64) if with_vader else None
+        polarity = np.zeros(len(unique_texts), dtype=np.float64) if with_textblob else None
+        if per_text_vader or with_textblob:
+            for i, text in enumerate(unique_texts):
+                if not text:
+                    continue
+                lowered = text.lower()
+                pieces = set(_WORD_RE.findall(lowered))
+                has_symbols = _SYMBOL_RE.search(lowered) is not None
+                if per_text_vader and (has_symbols or not pieces.isdisjoint(vader_pieces)):
+                    compound[i] = polarity_scores(text)['compound']
+                if with_textblob and (has_symbols or not pieces.isdisjoint(textblob_pieces)):
+                    polarity[i] = analyze(text).polarity
+
+        return (compound[inverse] if with_vader else None), (polarity[inverse] if with_textblob else None)
+
+    def score_vader(self, texts):
+        """VADER compound scores only."""
+        return self.score_batch(texts, with_textblob=False)[0]
+
+    def score_textblob(self, texts):
+        """TextBlob polarity scores only (VADER is never loaded)."""
+        return self.score_batch(texts, with_vader=False)[1]
@@ -0,0 +1,394 @@
+import itertools
+import math
+import re
+import string
+
+import numpy as np
+
+# NLTK's VADER constants, shared rather than copied so both backends always agree
+from nltk.sentiment.vader import VaderConstants
+
+_PUNCTUATION = string.punctuation
+_REMOVE_PUNCTUATION = re.compile(f"[{re.escape(_PUNCTUATION)}]")
+_PUNC_SET = frozenset(VaderConstants.PUNC_LIST)
+_BOOSTERS = VaderConstants.BOOSTER_DICT
+_NEGATE = frozenset(VaderConstants.NEGATE)
+_IDIOMS = VaderConstants.SPECIAL_CASE_IDIOMS
+B_DECR = VaderConstants.B_DECR
+C_INCR = VaderConstants.C_INCR
+N_SCALAR = VaderConstants.N_SCALAR
+
+
+def _words_only(text):
+    """The text's words with all punctuation removed (NLTK's words_plus_punc candidates)."""
+    return {w for w in _REMOVE_PUNCTUATION.sub("", text).split() if len(w) > 1}
+
+
+def _strip_token(token, stripped_right, stripped_left, words_only):
+    # Word followed by punctuation (checked first: it wins in NLTK's dict), then preceded by it
+    if token[len(stripped_right):] in _PUNC_SET and stripped_right in words_only:
+        return stripped_right
+    if token[:len(token) - len(stripped_left)] in _PUNC_SET and stripped_left in words_only:
+        return stripped_left
+    return token
+
+
+def _contains(sorted_keys, keys):
+    """Membership of `keys` in the sorted array `sorted_keys`."""
+    if not len(sorted_keys):
+        return np.zeros(len(keys), dtype=bool)
+    found = np.searchsorted(sorted_keys, keys)
+    return sorted_keys[np.minimum(found, len(sorted_keys) - 1)] == keys
+
+
+def _load_lexicon():
+    from utils.nltk_data import ensure_nltk_data
+    import nltk.data
+    ensure_nltk_data('vader_lexicon')
+    lexicon = {}
+    raw = nltk.data.load("sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt")
+    for line in raw.split("\n"):
+        word, measure = line.strip().split("\t")[0:2]
+        lexicon[word] = float(measure)
+    return lexicon
+
+
+class FastVader:
+    """
+    Compound-score-only VADER that gives exactly the same compound score as
+    nltk's SentimentIntensityAnalyzer.polarity_scores, quirks included (a
+    repeated token is scored at its first position, only the first "but"
+    counts, ...).
+
+    It is faster because:
+    - the punctuation-stripping tokenizer strips each token's leading/trailing
+      punctuation run directly instead of building NLTK's
+      PUNC_LIST x words lookup dict for every text,
+    - every token is lowercased once,
+    - each distinct token is scored once (NLTK scores repeats again, with the same result),
+    - negation words are precompiled into one set and the lexicon is a plain dict.
+
+    It exposes `lexicon` and `polarity_scores()` (with only 'compound'), so it can
+    stand in for the NLTK analyzer in BatchSentimentScorer, and `compound_batch()`,
+    which BatchSentimentScorer uses to score a whole batch column-wise.
+    """
+
+    def __init__(self, lexicon=None):
+        self.lexicon = lexicon if lexicon is not None else _load_lexicon()
+
+    def tokenize(self, text):
+        """VADER's words_and_emoticons: whitespace tokens longer than one char, minus surrounding punctuation."""
+        words_only = None
+        tokens = []
+        for token in text.split():
+            if len(token) <= 1:
+                continue
+            stripped_right = token.rstrip(_PUNCTUATION)
+            stripped_left = token.lstrip(_PUNCTUATION)
+            if stripped_right != token or stripped_left != token:
+                if words_only is None:
+                    words_only = _words_only(text)
+                token = _strip_token(token, stripped_right, stripped_left, words_only)
+            tokens.append(token)
+        return tokens
+
+    def _tokenize_chunk(self, texts):
+        """
+        tokenize() for many texts at once. Returns (token ids, tokens per text,
+        {token: id}). Raw tokens are factorized, so the punctuation stripping
+        runs once per distinct token; whether a stripped word also occurs in
+        the text (NLTK's condition for stripping it) is a lookup of
+        (text, word id) pairs.
+        """
+        import pandas as pd
+        splits = [text.split() for text in texts]
+        raw_lengths = np.fromiter(map(len, splits), dtype=np.int64, count=len(texts))
+        codes, uniques = pd.factorize(np.fromiter(itertools.chain.from_iterable(splits), dtype=object,
+                                                  count=int(raw_lengths.sum())))
+        uniques = uniques.tolist()
+        vocab = {token: i for i, token in enumerate(uniques)}
+
+        def ids_of(tokens):
+            return np.fromiter((vocab.setdefault(token, len(vocab)) for token in tokens), dtype=np.int64,
+                               count=len(uniques))
+
+        keep = np.array([len(token) > 1 for token in uniques], dtype=bool)
+        rights = [token.rstrip(_PUNCTUATION) for token in uniques]
+        lefts = [token.lstrip(_PUNCTUATION) for token in uniques]
+        # Punctuation-free forms of the raw tokens: the words a stripped token must match
+        words = [_REMOVE_PUNCTUATION.sub("", token) for token in uniques]
+        right_ok = np.array([token[len(right):] in _PUNC_SET for token, right in zip(uniques, rights)], dtype=bool)
+        left_ok = np.array([token[:len(token) - len(left)] in _PUNC_SET for token, left in zip(uniques, lefts)],
+                           dtype=bool)
+        right_ids, left_ids, word_ids = ids_of(rights), ids_of(lefts), ids_of(words)
+        is_word = np.array([len(word) > 1 for word in words], dtype=bool)
+
+        codes = codes.astype(np.int64)
+        text_index = np.repeat(np.arange(len(texts)), raw_lengths)
+        size = len(vocab)
+        text_words = np.sort((text_index * size + word_ids[codes])[is_word[codes]])
+        keep = keep[codes]
+        candidates = np.flatnonzero(keep & (right_ok | left_ok)[codes])
+        candidate_codes, candidate_texts = codes[candidates], text_index[candidates] * size
+        right_ok = right_ok[candidate_codes] & _contains(text_words, candidate_texts + right_ids[candidate_codes])
+        left_ok = left_ok[candidate_codes] & _contains(text_words, candidate_texts + left_ids[candidate_codes])
+        codes[candidates] = np.where(right_ok, right_ids[candidate_codes],
+                                     np.where(left_ok, left_ids[candidate_codes], candidate_codes))
+        lengths = np.bincount(text_index[keep], minlength=len(texts))
+        return codes[keep], lengths, vocab
+
+    def _negated(self, lowered_word):
+        return lowered_word in _NEGATE or "n't" in lowered_word
+
+    def _valence(self, i, words, lowered, is_cap_diff):
+        lexicon = self.lexicon
+        low = lowered[i]
+        if (i < len(words) - 1 and low == "kind" and lowered[i + 1] == "of") or low in _BOOSTERS:
+            return 0
+        valence = lexicon.get(low)
+        if valence is None:
+            return 0
+        if words[i].isupper() and is_cap_diff:
+            valence = valence + C_INCR if valence > 0 else valence - C_INCR
+
+        for start_i in range(3):
+            if i > start_i and lowered[i - (start_i + 1)] not in lexicon:
+                j = i - (start_i + 1)
+                # Booster / dampener words before the item (scalar_inc_dec)
+                s = 0.0
+                if lowered[j] in _BOOSTERS:
+                    s = _BOOSTERS[lowered[j]]
+                    if valence < 0:
+                        s *= -1
+                    if words[j].isupper() and is_cap_diff:
+                        s = s + C_INCR if valence > 0 else s - C_INCR
+                if start_i == 1 and s != 0:
+                    s = s * 0.95
+                if start_i == 2 and s != 0:
+                    s = s * 0.9
+                valence = valence + s
+
+                # _never_check
+                if start_i == 0:
+                    if self._negated(lowered[i - 1]):
+                        valence = valence * N_SCALAR
+                elif start_i == 1:
+                    if words[i - 2] == "never" and (words[i - 1] == "so" or words[i - 1] == "this"):
+                        valence = valence * 1.5
+                    elif self._negated(lowered[j]):
+                        valence = valence * N_SCALAR
+                else:
+                    if (words[i - 3] == "never" and (words[i - 2] == "so" or words[i - 2] == "this")
+                            or (words[i - 1] == "so" or words[i - 1] == "this")):
+                        valence = valence * 1.25
+                    elif self._negated(lowered[j]):
+                        valence = valence * N_SCALAR
+                    valence = self._idioms(valence, words, i)
+
+        # _least_check
+        if i > 1 and lowered[i - 1] not in lexicon and lowered[i - 1] == "least":
+            if lowered[i - 2] != "at" and lowered[i - 2] != "very":
+                valence = valence * N_SCALAR
+        elif i > 0 and lowered[i - 1] not in lexicon and lowered[i - 1] == "least":
+            valence = valence * N_SCALAR
+        return valence
+
+    def _idioms(self, valence, words, i):
+        onezero = f"{words[i - 1]} {words[i]}"
+        twoonezero = f"{words[i - 2]} {words[i - 1]} {words[i]}"
+        twoone = f"{words[i - 2]} {words[i - 1]}"
+        threetwoone = f"{words[i - 3]} {words[i - 2]} {words[i - 1]}"
+        threetwo = f"{words[i - 3]} {words[i - 2]}"
+        for seq in (onezero, twoonezero, twoone, threetwoone, threetwo):
+            if seq in _IDIOMS:
+                valence = _IDIOMS[seq]
+                break
+        if len(words) - 1 > i:
+            zeroone = f"{words[i]} {words[i + 1]}"
+            if zeroone in _IDIOMS:
+                valence = _IDIOMS[zeroone]
+        if len(words) - 1 > i + 1:
+            zeroonetwo = f"{words[i]} {words[i + 1]} {words[i + 2]}"
+            if zeroonetwo in _IDIOMS:
+                valence = _IDIOMS[zeroonetwo]
+        if threetwo in _BOOSTERS or twoone in _BOOSTERS:
+            valence = valence + B_DECR
+        return valence
+
+    def compound(self, text):
+        """VADER compound score, rounded to 4 places like NLTK's."""
+        if not isinstance(text, str):
+            text = str(text.encode("utf-8"))
+        words = self.tokenize(text)
+        if not words:
+            return 0.0
+        lowered = [word.lower() for word in words]
+        allcaps = sum(1 for word in words if word.isupper())
+        is_cap_diff = 0 < len(words) - allcaps < len(words)
+
+        # Each distinct token is scored at its first position (as NLTK does)
+        by_token = {}
+        sentiments = []
+        for i, word in enumerate(words):
+            valence = by_token.get(word)
+            if valence is None:
+                valence = by_token[word] = self._valence(i, words, lowered, is_cap_diff)
+            sentiments.append(valence)
+
+        if "but" in lowered: # Only the first "but" counts
+            bi = lowered.index("but")
+            for sidx, sentiment in enumerate(sentiments):
+                if sidx < bi:
+                    sentiments[sidx] = sentiment * 0.5
+                elif sidx > bi:
+                    sentiments[sidx] = sentiment * 1.5
+
+        sum_s = float(sum(sentiments))
+        if sum_s == 0:
+            return round(sum_s / math.sqrt(sum_s * sum_s + 15), 4)
+        # Emphasis from exclamation points (up to 4) and question marks (2 or more)
+        amplifier = min(text.count("!"), 4) * 0.292
+        qm_count = text.count("?")
+        if qm_count > 1:
+            amplifier += qm_count * 0.18 if qm_count <= 3 else 0.96
+        sum_s = sum_s + amplifier if sum_s > 0 else sum_s - amplifier
+        return round(sum_s / math.sqrt(sum_s * sum_s + 15), 4)
+
+    def compound_batch(self, texts, chunk_size=5000):
+        """
+        compound() for a list of texts as a float64 array, computed column-wise:
+        each text is tokenized once, every token of a chunk becomes an id into
+        the chunk's vocabulary, and the lexicon lookup, caps / booster /
+        negation / "least" / "but" rules and the per-text sums run as NumPy
+        operations over the flattened tokens (a token's neighbours are found
+        by shifting those arrays). Texts that could contain an idiom or a
+        multi-word booster (rare) are scored one by one with compound().
+        """
+        compound = np.zeros(len(texts), dtype=np.float64)
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            compound[start:start + len(chunk)] = self._compound_chunk(chunk)
+        return compound
+
+    def _vocabulary_columns(self, vocab):
+        """Per-word flags and values for the chunk vocabulary (index = token id)."""
+        lexicon = self.lexicon
+        lowered = [word.lower() for word in vocab]
+        columns = {
+            'in_lexicon': [low in lexicon for low in lowered],
+            'valence': [lexicon.get(low, 0.0) for low in lowered],
+            'is_booster': [low in _BOOSTERS for low in lowered],
+            'booster': [_BOOSTERS.get(low, 0.0) for low in lowered],
+            'negated': [self._negated(low) for low in lowered],
+            'upper': [word.isupper() for word in vocab],
+            'never': [word == "never" for word in vocab], # Case-sensitive, as in _valence
+            'so_this': [word == "so" or word == "this" for word in vocab],
+        }
+        for name in ('kind', 'of', 'but', 'least'):
+            columns[name] = [low == name for low in lowered]
+        columns['at_very'] = [low == "at" or low == "very" for low in lowered]
+        return {name: np.array(values) for name, values in columns.items()}
+
+    def _compound_chunk(self, texts):
+        ids, lengths, vocab = self._tokenize_chunk(texts)
+        total = len(ids)
+        if not total:
+            return np.zeros(len(texts))
+        column = {name: values[ids] for name, values in self._vocabulary_columns(list(vocab)).items()}
+        text_index = np.repeat(np.arange(len(texts)), lengths)
+        pos = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) # Position within its text
+
+        def before(values, k, fill):
+            """values[i - k] for each token, `fill` where that would cross into the previous text."""
+            shifted = np.full(total, fill, dtype=values.dtype)
+            shifted[k:] = values[:-k]
+            shifted[pos < k] = fill
+            return shifted
+
+        # is_cap_diff: some but not all of the text's tokens are upper case
+        upper_count = np.bincount(text_index, weights=column['upper'], minlength=len(texts))
+        cap = column['upper'] & ((upper_count > 0) & (upper_count < lengths))[text_index]
+
+        next_is_of = np.zeros(total, dtype=bool)
+        next_is_of[:-1] = column['of'][1:]
+        next_is_of &= pos < lengths[text_index] - 1
+        scored = column['in_lexicon'] & ~column['is_booster'] & ~(column['kind'] & next_is_of)
+
+        valence = column['valence'].astype(np.float64)
+        valence = np.where(cap, np.where(valence > 0, valence + C_INCR, valence - C_INCR), valence)
+        for start_i in range(3):
+            k = start_i + 1
+            applies = (pos > start_i) & ~before(column['in_lexicon'], k, True)
+            # Booster / dampener words before the item (scalar_inc_dec)
+            is_booster = before(column['is_booster'], k, False)
+            s = np.where(is_booster, before(column['booster'], k, 0.0), 0.0)
+            s = np.where(is_booster & (valence < 0), s * -1, s)
+            s = np.where(is_booster & before(cap, k, False), np.where(valence > 0, s + C_INCR, s - C_INCR), s)
+            if start_i == 1:
+                s = np.where(s != 0, s * 0.95, s)
+            elif start_i == 2:
+                s = np.where(s != 0, s * 0.9, s)
+            valence = np.where(applies, valence + s, valence)
+
+            # _never_check
+            negated = applies & before(column['negated'], k, False)
+            if start_i == 0:
+                valence = np.where(negated, valence * N_SCALAR, valence)
+                continue
+            if start_i == 1:
+                never, factor = before(column['never'], 2, False) & before(column['so_this'], 1, False), 1.5
+            else:
+                never = ((before(column['never'], 3, False) & before(column['so_this'], 2, False))
+                         | before(column['so_this'], 1, False))
+                factor = 1.25
+            never &= applies
+            valence = np.where(never, valence * factor, np.where(negated, valence * N_SCALAR, valence))
+
+        # _least_check
+        least = before(column['least'], 1, False) & ~before(column['in_lexicon'], 1, True)
+        least &= ((pos > 1) & ~before(column['at_very'], 2, False)) | (pos == 1)
+        valence = np.where(least, valence * N_SCALAR, valence)
+        valence = np.where(scored, valence, 0.0)
+
+        # Each distinct token is scored at its first position in the text (as NLTK does)
+        _, first, inverse = np.unique(text_index * len(vocab) + ids, return_index=True, return_inverse=True)
+        valence = valence[first][inverse.ravel()]
+
+        # Only the first "but" counts: halve what comes before it, boost what comes after
+        first_but = np.full(len(texts), total, dtype=np.int64)
+        np.minimum.at(first_but, text_index[column['but']], pos[column['but']])
+        but_pos = first_but[text_index]
+        has_but = but_pos < total
+        valence = np.where(has_but & (pos < but_pos), valence * 0.5,
+                           np.where(has_but & (pos > but_pos), valence * 1.5, valence))
+
+        # bincount adds each text's tokens in order, like compound()'s sum()
+        sums = np.bincount(text_index, weights=valence, minlength=len(texts))
+        exclamations = np.fromiter((text.count("!") for text in texts), dtype=np.float64, count=len(texts))
+        questions = np.fromiter((text.count("?") for text in texts), dtype=np.float64, count=len(texts))
+        amplifier = np.minimum(exclamations, 4) * 0.292
+        amplifier = np.where(questions > 1, amplifier + np.where(questions <= 3, questions * 0.18, 0.96), amplifier)
+        emphasized = np.where(sums > 0, sums + amplifier, sums - amplifier)
+        normalized = np.where(sums == 0, 0.0, emphasized / np.sqrt(emphasized * emphasized + 15))
+        compound = np.array([round(value, 4) for value in normalized.tolist()])
+
+        # Idioms and multi-word boosters depend on whole phrases: score texts that might contain one exactly
+        for phrase_ids in self._phrase_ids(vocab):
+            present = np.ones(len(texts), dtype=bool)
+            for word_id in phrase_ids:
+                present &= np.bincount(text_index, weights=ids == word_id, minlength=len(texts)) > 0
+            for i in np.flatnonzero(present).tolist():
+                compound[i] = self.compound(texts[i])
+        return compound
+
+    @staticmethod
+    def _phrase_ids(vocab):
+        """Token ids of each idiom / multi-word booster whose words all occur in the chunk."""
+        for phrase in list(_IDIOMS) + [key for key in _BOOSTERS if " " in key]:
+            words = phrase.split()
+            if all(word in vocab for word in words):
+                yield [vocab[word] for word in words]
+
+    def polarity_scores(self, text):
+        """Drop-in for SentimentIntensityAnalyzer.polarity_scores, returning only the compound score."""
+        return {'compound': self.compound(text)}
@@ -0,0 +1,154 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from models.batch_scorer import BatchSentimentScorer, _as_text_list
+
+# Shared pools keyed by worker count, reused across requests and analyzer instances
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Per-worker-process scorer, created once by _init_worker
+_worker_scorer = None
+
+# Batches scored in-process vs. on a pool, chunks shipped to pools, and pool failures (guarded by _pools_lock)
+_counters = {'local_batches': 0, 'pool_batches': 0, 'pool_chunks': 0, 'pool_failures': 0}
+
+
+def _count(**increments):
+    with _pools_lock:
+        for name, n in increments.items():
+            _counters[name] += n
+
+
+def _init_worker(backend='vader'):
+    """Create the worker's scorer once per process; its lexicons load on first use."""
+    global _worker_scorer
+    sia = None
+    if backend == 'vader_fast':
+        from models.fast_vader import FastVader
+        sia = FastVader()
+    _worker_scorer = BatchSentimentScorer(sia)
+
+
+def _score_chunk(texts, with_textblob, with_vader=True):
+    return _worker_scorer.score_batch(texts, with_textblob=with_textblob, with_vader=with_vader)
+
+
+def get_pool(workers, backend='vader'):
+    """Return the shared process pool for this worker count and VADER backend, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get((workers, backend))
+        if pool is None:
+            # spawn avoids forking a threaded gunicorn/Flask worker
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(backend,)
+            )
+            _pools[(workers, backend)] = pool
+        return pool
+
+
+def _discard_pool(workers, backend='vader'):
+    with _pools_lock:
+        pool = _pools.pop((workers, backend), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def pool_stats():
+    """Counters for /metrics: batches scored locally or on a pool, chunks shipped, failures, live pools."""
+    with _pools_lock:
+        return dict(_counters, pools=len(_pools), pool_workers=sum(workers for workers, _ in _pools))
+
+
+@atexit.register
+def shutdown_pools():
+    """Shut down every shared pool (also runs at interpreter exit)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ParallelBatchScorer:
+    """
+    Drop-in replacement for BatchSentimentScorer that splits large batches into
+    chunks and scores them on a shared ProcessPoolExecutor. Batches no larger
+    than one chunk are scored in-process, where the pool overhead isn't worth it.
+    """
+
+    def __init__(self, sia=None, workers=None, chunk_size=500, backend='vader'):
+        self.local = BatchSentimentScorer(sia)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.backend = backend # Which VADER implementation the workers use ('vader' or 'vader_fast')
+
+    @property
+    def sia(self):
+        return self.local.sia
+
+    @property
+    def batch_size(self):
+        """Texts per call that give every pool worker a chunk (callers that batch can aim for this)."""
+        return self.chunk_size * self.workers if self.workers >= 2 else self.chunk_size
+
+    def score_batch(self, texts, with_textblob=True, with_vader=True):
+        """Same contract as BatchSentimentScorer.score_batch."""
+        texts = _as_text_list(texts)
+        if len(texts) <= self.chunk_size or self.workers < 2:
+            _count(local_batches=1)
+            return self.local.score_batch(texts, with_textblob=with_textblob, with_vader=with_vader)
+
+        # Deduplicate before shipping texts to the workers
+        unique_index = {}
+        inverse = np.empty(len(texts), dtype=np.int64)
+        for i, text in enumerate(texts):
+            inverse[i] = unique_index.setdefault(text, len(unique_index))
+        unique_texts = list(unique_index)
+        chunks = [unique_texts[i:i + self.chunk_size] for i in range(0, len(unique_texts), self.chunk_size)]
+
+        _count(pool_batches=1, pool_chunks=len(chunks))
+        try:
+            pool = get_pool(self.workers, self.backend)
+            results = list(pool.map(_score_chunk, chunks, [with_textblob] * len(chunks), [with_vader] * len(chunks)))
+        except BrokenProcessPool as e:
+            print(f"WARNING: Scoring pool failed ({e}), scoring in-process.")
+            _count(pool_failures=1)
+            _discard_pool(self.workers, self.backend)
+            return self.local.score_batch(texts, with_textblob=with_textblob, with_vader=with_vader)
+
+        compound = np.concatenate([r[0] for r in results])[inverse] if with_vader else None
+        polarity = np.concatenate([r[1] for r in results])[inverse] if with_textblob else None
+        return compound, polarity
+
+    def score_vader(self, texts):
+        """VADER compound scores only."""
+        return self.score_batch(texts, with_textblob=False)[0]
+
+    def score_textblob(self, texts):
+        """TextBlob polarity scores only."""
+        return self.score_batch(texts, with_vader=False)[1]
+
+
+def make_batch_scorer(sia=None, parallel=None, workers=None, chunk_size=None, backend='vader'):
+    """
+    Build the scorer used by the analyzers. Parallel mode is opt-in, either via
+    arguments or the SCORING_PARALLEL / SCORING_WORKERS / SCORING_CHUNK_SIZE env vars.
+    `backend` tells pool workers which VADER implementation `sia` is.
+    """
+    if parallel is None:
+        parallel = os.getenv('SCORING_PARALLEL', '').lower() in ('1', 'true', 'yes')
+    if not parallel:
+        return BatchSentimentScorer(sia)
+    workers = workers or int(os.getenv('SCORING_WORKERS', 0)) or None
+    chunk_size = chunk_size or int(os.getenv('SCORING_CHUNK_SIZE', 500))
+    return ParallelBatchScorer(sia, workers=workers, chunk_size=chunk_size, backend=backend)
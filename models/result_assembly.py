@@ -0,0 +1,151 @@
+import numpy as np
+
+from models.trend_engine import bucket_starts, to_buckets
+
+# VADER compound cut-offs (inclusive) for positive / negative; anything between is neutral
+POSITIVE_CUTOFF = 0.05
+NEGATIVE_CUTOFF = -0.05
+
+# Category codes, in the order analyze_sentiment reports them
+POSITIVE, NEUTRAL, NEGATIVE = 0, 1, 2
+CATEGORY_NAMES = ('positive', 'neutral', 'negative')
+
+# Column dtypes for posts_frame(); columns not listed are left to pandas
+COMPACT_DTYPES = {
+    'score': np.int64,
+    'created_utc': np.int64, # Epoch seconds (Reddit only reports whole seconds)
+    'sentiment': np.float64,
+    'sentiment_textblob': np.float64,
+    'kind': 'category',
+    'subreddit': 'category',
+    'sentiment_category': 'category',
+}
+
+
+def categorize(sentiment):
+    """int8 category codes (POSITIVE / NEUTRAL / NEGATIVE) for an array of compound scores; NaN is neutral."""
+    sentiment = np.asarray(sentiment, dtype=np.float64)
+    return np.select([sentiment >= POSITIVE_CUTOFF, sentiment <= NEGATIVE_CUTOFF], [POSITIVE, NEGATIVE],
+                     NEUTRAL).astype(np.int8)
+
+
+def _column(posts, key):
+    return [post.get(key) for post in posts]
+
+
+def assemble(posts):
+    """
+    Columnar analyze_sentiment summary of scored post dicts: returns
+    (average sentiment, distribution, {category: posts}) with each category's
+    posts ordered by Reddit score, highest first (ties keep fetch order).
+    The average is None when no post has a sentiment score (NaN isn't valid JSON).
+
+    Sentiment and score are pulled into arrays once, categorized with
+    np.select, ordered with one stable argsort, and each category is sliced
+    out of that order by index, so no DataFrame or per-category copy is
+    built. The post dicts themselves are returned (not copied), each with its
+    `sentiment_category` set.
+    """
+    sentiment = np.array(_column(posts, 'sentiment'), dtype=np.float64) # None -> NaN
+    scores = np.array([post.get('score') or 0 for post in posts], dtype=np.int64)
+    codes = categorize(sentiment)
+
+    valid = sentiment[~np.isnan(sentiment)]
+    average = float(valid.mean()) if len(valid) else None
+
+    counts = np.bincount(codes, minlength=len(CATEGORY_NAMES))
+    # Most common category first, as value_counts() reported it
+    distribution = {CATEGORY_NAMES[code]: int(counts[code])
+                    for code in sorted(np.flatnonzero(counts).tolist(), key=lambda code: -counts[code])}
+
+    for post, code in zip(posts, codes.tolist()):
+        post['sentiment_category'] = CATEGORY_NAMES[code]
+
+    order = np.argsort(-scores, kind='stable')
+    ordered_codes = codes[order]
+    by_category = {
+        name: [posts[i] for i in order[ordered_codes == code].tolist()]
+        for code, name in enumerate(CATEGORY_NAMES)
+    }
+    return average, distribution, by_category
+
+
+def posts_frame(posts):
+    """
+    DataFrame of post dicts built column by column with compact dtypes
+    (categorical kind / subreddit / category, int64 score and epoch seconds).
+    A column with missing values falls back to float64 (ints) or object.
+    """
+    import pandas as pd
+    if not posts:
+        return pd.DataFrame()
+    keys = dict.fromkeys(key for post in posts for key in post) # Column order of first appearance
+    columns = {}
+    for key in keys:
+        values = _column(posts, key)
+        dtype = COMPACT_DTYPES.get(key)
+        if dtype == 'category':
+            columns[key] = pd.Categorical(values)
+        elif dtype is not None:
+            try:
+                columns[key] = np.array(values, dtype=dtype)
+            except (TypeError, ValueError):
+                try:
+                    columns[key] = np.array(values, dtype=np.float64) # None in an int column
+                except (TypeError, ValueError):
+                    columns[key] = values # Not numeric (e.g. legacy formatted dates)
+        else:
+            columns[key] = values
+    return pd.DataFrame(columns)
+
+
+
+def _nullable(values):
+    """List of floats with NaN as None (JSON null)."""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def compare_matrix(titles, posts_per_title, period='M'):
+    """
+    Columnar comparison of several titles' scored post dicts. Every list is
+    aligned with `titles`: average sentiment (None without posts), post count,
+    {category: counts}, and the average sentiment in each `period` ('D', 'W'
+    or 'M', see models/trend_engine.py) over the union of periods any title
+    has posts in (None where a title has none), labelled by their first day.
+
+    All titles' posts are flattened once and aggregated with bincount over
+    (title, category) and (title, period) cells, so the cost is one pass over
+    the posts whatever the number of titles.
+    """
+    n = len(titles)
+    sizes = [len(posts) for posts in posts_per_title]
+    flat = [post for posts in posts_per_title for post in posts]
+    owner = np.repeat(np.arange(n), sizes)
+    sentiment = np.array(_column(flat, 'sentiment'), dtype=np.float64) # None -> NaN
+    valid = ~np.isnan(sentiment)
+
+    sums = np.bincount(owner[valid], weights=sentiment[valid], minlength=n)
+    scored = np.bincount(owner[valid], minlength=n)
+    average = np.divide(sums, scored, out=np.full(n, np.nan), where=scored > 0)
+    counts = np.bincount(owner * len(CATEGORY_NAMES) + categorize(sentiment),
+                         minlength=n * len(CATEGORY_NAMES)).reshape(n, len(CATEGORY_NAMES))
+
+    epochs = np.array([post.get('created_utc') or 0 for post in flat], dtype=np.float64)[valid]
+    periods, cell = np.unique(to_buckets(epochs, period), return_inverse=True) # Raises ValueError for unknown periods
+    cell = owner[valid] * len(periods) + cell.reshape(-1)
+    shape = (n, len(periods))
+    trend_sums = np.bincount(cell, weights=sentiment[valid], minlength=n * len(periods)).reshape(shape)
+    trend_counts = np.bincount(cell, minlength=n * len(periods)).reshape(shape)
+    trend = np.divide(trend_sums, trend_counts, out=np.full(shape, np.nan), where=trend_counts > 0)
+
+    return {
+        'titles': list(titles),
+        'average_sentiment': _nullable(average),
+        'post_count': sizes,
+        'sentiment_distribution': {name: counts[:, code].tolist() for code, name in enumerate(CATEGORY_NAMES)},
+        'trend': {
+            'period': period,
+            'periods': np.datetime_as_string(bucket_starts(periods, period)).tolist(),
+            'average_sentiment': [_nullable(row) for row in trend],
+        },
+    }
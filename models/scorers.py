@@ -0,0 +1,79 @@
+import os
+
+from models.parallel_scorer import make_batch_scorer
+
+# Only `sentiment` feeds analyze_sentiment, so by default that is all that runs
+DEFAULT_SCORERS = 'vader'
+PRIMARY_COLUMN = 'sentiment'
+
+
+class VaderScorer:
+    """NLTK's VADER compound score."""
+    column = PRIMARY_COLUMN
+    backend = 'vader'
+
+    def __init__(self, parallel=None, workers=None, chunk_size=None):
+        self.batch_scorer = make_batch_scorer(self._make_sia(), parallel, workers, chunk_size, backend=self.backend)
+
+    def _make_sia(self):
+        return None # The batch scorer loads NLTK's analyzer on first use
+
+    def score(self, texts):
+        return self.batch_scorer.score_vader(texts)
+
+
+class FastVaderScorer(VaderScorer):
+    """Same compound score as VaderScorer from models/fast_vader.py, several times faster."""
+    backend = 'vader_fast'
+
+    def _make_sia(self):
+        from models.fast_vader import FastVader
+        return FastVader()
+
+
+class TextBlobScorer:
+    """TextBlob (pattern) polarity."""
+    column = 'sentiment_textblob'
+
+    def __init__(self, parallel=None, workers=None, chunk_size=None):
+        self.batch_scorer = make_batch_scorer(None, parallel, workers, chunk_size)
+
+    def score(self, texts):
+        return self.batch_scorer.score_textblob(texts)
+
+
+# name -> scorer class. A scorer class has a `column` (the post field it fills),
+# takes (parallel, workers, chunk_size), and has score(texts) -> float64 array.
+# Classes are only instantiated when selected, so unused scorers load nothing.
+SCORERS = {
+    'vader': VaderScorer,
+    'vader_fast': FastVaderScorer,
+    'textblob': TextBlobScorer,
+}
+
+
+def register_scorer(name, scorer_class):
+    SCORERS[name] = scorer_class
+
+
+def parse_scorers(spec=None):
+    """
+    Scorer names from a comma-separated spec (or list), defaulting to the
+    SENTIMENT_SCORERS env var, then 'vader'. Exactly one selected scorer must
+    fill the `sentiment` column. Raises ValueError for an invalid selection.
+    """
+    if spec is None:
+        spec = os.getenv('SENTIMENT_SCORERS', DEFAULT_SCORERS)
+    names = spec.split(',') if isinstance(spec, str) else list(spec)
+    names = tuple(dict.fromkeys(name.strip().lower() for name in names if name and name.strip()))
+
+    unknown = [name for name in names if name not in SCORERS]
+    if unknown:
+        raise ValueError(f"Unknown scorer(s) {', '.join(unknown)}; available: {', '.join(sorted(SCORERS))}")
+    primary = [name for name in names if SCORERS[name].column == PRIMARY_COLUMN]
+    if len(primary) != 1:
+        raise ValueError(f"Select exactly one of {', '.join(n for n in sorted(SCORERS) if SCORERS[n].column == PRIMARY_COLUMN)}")
+    columns = [SCORERS[name].column for name in names]
+    if len(set(columns)) != len(columns):
+        raise ValueError("Selected scorers fill the same column")
+    return names
@@ -3,8 +3,11 @@ import numpy as np
 from nltk.sentiment import SentimentIntensityAnalyzer
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
-import re
 import nltk
+from models.batch_scorer import quality_scores
+from models.parallel_scorer import make_batch_scorer
+from models.trend_engine import TrendEngine, describe_trend, epoch_seconds
+from utils.text import simplify_text
 
 try:
     nltk.data.find('tokenizers/punkt')
@@ -25,8 +28,11 @@ except LookupError:
 
 
 class AdvancedReviewAnalyzer:
-    def __init__(self):
+    def __init__(self, parallel=None, workers=None, chunk_size=None):
         self.sia = SentimentIntensityAnalyzer()
+        # parallel=True scores large batches on a shared process pool
+        self.batch_scorer = make_batch_scorer(self.sia, parallel, workers, chunk_size)
+        self.trend_engine = TrendEngine() # Per-book trend state for analyze_trend(book=...)
         try:
             self.stop_words = set(stopwords.words('english'))
         except LookupError: 
@@ -38,19 +44,8 @@ class AdvancedReviewAnalyzer:
         self.quality_threshold = 0.3 # Lowered threshold potentially
 
     def preprocess_text(self, text):
-        """Preprocess text for analysis (basic cleaning)."""
-        if not isinstance(text, str):
-            return ""
-        text = text.lower()
-        
-        text = re.sub(r'[^a-z0-9\s.!?]', '', text) # Allow ., !, ?
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        # Tokenization and stopword removal- less crucial for VADER
-        # tokens = word_tokenize(text)
-        # tokens = [word for word in tokens if word not in self.stop_words]
-        # return ' '.join(tokens)
-        return text
+        """Preprocess text for analysis (basic cleaning, shared simplify_text from utils/text.py)."""
+        return simplify_text(text)
 
     def calculate_quality_score(self, review):
         """Calculate a basic quality score for a review post/comment."""
@@ -95,8 +90,26 @@ class AdvancedReviewAnalyzer:
              reviews_df['quality_score'] = 0.0 # Assign default score
              return reviews_df
 
-        # Apply calculation row-wise
-        reviews_df['quality_score'] = reviews_df.apply(self.calculate_quality_score, axis=1)
+        # Same rules as calculate_quality_score, computed column-wise
+        text = reviews_df['text']
+        if 'full_text' in reviews_df.columns:
+            text = text.mask(text.isna() | (text == ''), reviews_df['full_text'])
+        text = text.where(text.map(lambda t: isinstance(t, str)), '')
+
+        if 'score' in reviews_df.columns:
+            reddit_score = pd.to_numeric(reviews_df['score'], errors='coerce').fillna(0)
+        else:
+            reddit_score = np.zeros(len(reviews_df))
+
+        if 'sentiment' in reviews_df.columns:
+            sentiment = pd.to_numeric(reviews_df['sentiment'], errors='coerce').to_numpy(dtype=float, copy=True)
+        else:
+            sentiment = np.full(len(reviews_df), np.nan)
+        missing = np.isnan(sentiment)
+        if missing.any(): # Score only the rows without a precomputed sentiment
+            sentiment[missing] = self.batch_scorer.score_vader(text[missing])
+
+        reviews_df['quality_score'] = quality_scores(text.str.len(), reddit_score, sentiment)
         filtered_df = reviews_df[reviews_df['quality_score'] >= self.quality_threshold].copy()
         print(f"Filtered reviews: Kept {len(filtered_df)} out of {len(reviews_df)} based on quality score >= {self.quality_threshold}")
         return filtered_df
@@ -110,8 +123,14 @@ class AdvancedReviewAnalyzer:
         return vader_sentiment['compound']
 
     # analyze_trend might be less relevant for single book analysis unless tracking over long periods
-    def analyze_trend(self, reviews_df, window_size=7):
-        """Analyze sentiment trend over time for the collected reviews."""
+    def analyze_trend(self, reviews_df, window_size=7, book=None, granularity='D'):
+        """
+        Analyze sentiment trend over time for the collected reviews (reviews_df is not modified).
+
+        With `book` set, the posts are folded into self.trend_engine (ids it has
+        already seen are skipped) and the trend covers every post seen for that
+        book so far. `granularity` is 'D', 'W' or 'M'.
+        """
         if reviews_df.empty or 'created_utc' not in reviews_df.columns or 'sentiment' not in reviews_df.columns:
              print("Insufficient data for trend analysis.")
              return {
@@ -121,31 +140,23 @@ class AdvancedReviewAnalyzer:
                 'current_sentiment': None # Use None instead of 0 for clarity
             }
 
-        reviews_df['date'] = pd.to_datetime(reviews_df['created_utc'], errors='coerce')
-        reviews_df.dropna(subset=['date', 'sentiment'], inplace=True)
-        reviews_df.set_index('date', inplace=True)
-        reviews_df.sort_index(inplace=True) # Ensure chronological order
-
-        # Resample sentiment by day
-        daily_sentiment = reviews_df['sentiment'].resample('D').mean()
-        
+        engine = self.trend_engine if book is not None else TrendEngine()
+        key = book if book is not None else ''
+        ids = reviews_df['id'].tolist() if book is not None and 'id' in reviews_df.columns else None
+        engine.add(key, epoch_seconds(reviews_df['created_utc']),
+                   pd.to_numeric(reviews_df['sentiment'], errors='coerce'), ids=ids)
 
-        # Calculate moving average
-        moving_avg = daily_sentiment.rolling(window=window_size, min_periods=max(1, window_size // 2)).mean() # Require at least half window
+        starts, means, moving = engine.series(key, granularity, window_size)
+        index = pd.DatetimeIndex(starts.astype('datetime64[ns]'), name='date')
+        daily_sentiment = pd.Series(means, index=index, name='sentiment')
+        moving_avg = pd.Series(moving, index=index, name='sentiment')
 
         # Describe trend based on recent moving average
-        trend_description = 'Neutral / Fluctuating'
-        last_sentiment = moving_avg.iloc[-1] if not moving_avg.empty and pd.notna(moving_avg.iloc[-1]) else None # Check for NaN
-
-        if last_sentiment is not None:
-            if last_sentiment >= 0.15: # Adjusted threshold
-                trend_description = 'Trending Positive'
-            elif last_sentiment <= -0.10: # Adjusted threshold
-                trend_description = 'Trending Negative'
+        last_sentiment = float(moving[-1]) if len(moving) and not np.isnan(moving[-1]) else None
 
         return {
-            'trend_description': trend_description,
+            'trend_description': describe_trend(last_sentiment),
             'daily_sentiment': daily_sentiment,
             'moving_avg': moving_avg,
             'current_sentiment': last_sentiment
-        }
\ No newline at end of file
+        }
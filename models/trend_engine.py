@@ -0,0 +1,218 @@
+import threading
+
+import numpy as np
+
+GRANULARITIES = ('D', 'W', 'M') # Day, week (starting Monday), calendar month
+SECONDS_PER_DAY = 86400
+
+
+def epoch_seconds(values):
+    """
+    Float epoch seconds for a column of timestamps. Numeric values are taken
+    as epoch seconds already; anything else (legacy formatted strings,
+    datetimes) is parsed. Unparseable values become NaN.
+    """
+    import pandas as pd
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    parsed = pd.to_datetime(series, errors='coerce')
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_convert('UTC').dt.tz_localize(None)
+    return ((parsed - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def to_buckets(epochs, granularity='D'):
+    """Integer bucket numbers (days / weeks / months since 1970-01-01 UTC) for epoch seconds."""
+    days = np.floor_divide(np.asarray(epochs, dtype=np.float64), SECONDS_PER_DAY).astype(np.int64)
+    if granularity == 'D':
+        return days
+    if granularity == 'W':
+        return (days + 3) // 7 # 1970-01-01 was a Thursday; shift so weeks start on Monday
+    if granularity == 'M':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Unknown granularity {granularity!r}, expected one of {GRANULARITIES}")
+
+
+def bucket_starts(buckets, granularity='D'):
+    """First day of each bucket, as datetime64[D]."""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if granularity == 'M':
+        return buckets.astype('datetime64[M]').astype('datetime64[D]')
+    if granularity == 'W':
+        buckets = buckets * 7 - 3
+    return buckets.astype('datetime64[D]')
+
+
+def describe_trend(moving_average):
+    if moving_average is None:
+        return 'Neutral / Fluctuating'
+    if moving_average >= 0.15:
+        return 'Trending Positive'
+    if moving_average <= -0.10:
+        return 'Trending Negative'
+    return 'Neutral / Fluctuating'
+
+
+class TrendEngine:
+    """
+    Incremental per-book sentiment aggregates.
+
+    For every book and granularity (day / week / month) it keeps one
+    [count, sum, sum of squares] cell per bucket. New posts are folded in with
+    add(); moving-average and trend queries only touch the buckets in the
+    window, so they cost O(window) however many posts have been seen.
+    Moving averages match the old resample + rolling computation: the mean of
+    the per-bucket means over the window, ignoring empty buckets, and None when
+    fewer than `min_periods` (default window // 2, at least 1) buckets have posts.
+    """
+
+    def __init__(self):
+        self._cells = {} # (book, granularity) -> {bucket: [count, sum, sumsq]}
+        self._last = {} # (book, granularity) -> latest bucket
+        self._seen = {} # book -> post ids already folded in
+        self._lock = threading.Lock()
+
+    def add(self, book, epochs, sentiments, ids=None):
+        """
+        Fold posts into `book`'s aggregates. Rows with a missing timestamp or
+        sentiment are skipped, and so are ids that were already added.
+        Returns the number of posts added.
+        """
+        epochs = np.asarray(epochs, dtype=np.float64)
+        sentiments = np.asarray(sentiments, dtype=np.float64)
+        keep = ~(np.isnan(epochs) | np.isnan(sentiments))
+        with self._lock:
+            if ids is not None:
+                seen = self._seen.setdefault(book, set())
+                for i, post_id in enumerate(ids):
+                    if keep[i]:
+                        if post_id in seen:
+                            keep[i] = False
+                        else:
+                            seen.add(post_id)
+            epochs, sentiments = epochs[keep], sentiments[keep]
+            if not len(epochs):
+                return 0
+
+            for granularity in GRANULARITIES:
+                buckets, inverse = np.unique(to_buckets(epochs, granularity), return_inverse=True)
+                counts = np.bincount(inverse, minlength=len(buckets))
+                sums = np.bincount(inverse, weights=sentiments, minlength=len(buckets))
+                squares = np.bincount(inverse, weights=sentiments * sentiments, minlength=len(buckets))
+
+                key = (book, granularity)
+                cells = self._cells.setdefault(key, {})
+                for bucket, count, total, square in zip(buckets.tolist(), counts.tolist(), sums.tolist(), squares.tolist()):
+                    cell = cells.get(bucket)
+                    if cell is None:
+                        cells[bucket] = [count, total, square]
+                    else:
+                        cell[0] += count
+                        cell[1] += total
+                        cell[2] += square
+                latest = int(buckets[-1])
+                self._last[key] = max(self._last.get(key, latest), latest)
+        return int(keep.sum())
+
+    def books(self):
+        return sorted({book for book, _ in self._cells})
+
+    def clear(self, book):
+        with self._lock:
+            for granularity in GRANULARITIES:
+                self._cells.pop((book, granularity), None)
+                self._last.pop((book, granularity), None)
+            self._seen.pop(book, None)
+
+    def last_bucket(self, book, granularity='D'):
+        return self._last.get((book, granularity))
+
+    def window_stats(self, book, window=7, granularity='D', end=None):
+        """
+        Aggregates over the `window` buckets ending at bucket `end` (default: the latest).
+        Returns post count, pooled mean and standard deviation, and the number
+        of buckets with posts; None if the book has no posts.
+        """
+        key = (book, granularity)
+        if end is None:
+            end = self._last.get(key)
+        if end is None:
+            return None
+        cells = self._cells.get(key, {})
+        count = total = square = 0.0
+        active = 0
+        bucket_means = 0.0
+        for bucket in range(end - window + 1, end + 1):
+            cell = cells.get(bucket)
+            if cell is not None:
+                count += cell[0]
+                total += cell[1]
+                square += cell[2]
+                bucket_means += cell[1] / cell[0]
+                active += 1
+        mean = total / count if count else None
+        variance = max(square / count - mean * mean, 0.0) if count else None
+        return {
+            'post_count': int(count),
+            'mean': mean,
+            'std': variance ** 0.5 if variance is not None else None,
+            'active_buckets': active,
+            'bucket_mean': bucket_means / active if active else None,
+        }
+
+    def moving_average(self, book, window=7, granularity='D', end=None, min_periods=None):
+        """Mean of the per-bucket means over the window ending at `end`, or None."""
+        stats = self.window_stats(book, window, granularity, end)
+        min_periods = min_periods if min_periods is not None else max(1, window // 2)
+        if stats is None or stats['active_buckets'] < min_periods:
+            return None
+        return stats['bucket_mean']
+
+    def moving_averages(self, book, windows=(7, 30), granularity='D'):
+        """Current moving average for several window sizes at once: {window: value}."""
+        return {window: self.moving_average(book, window, granularity) for window in windows}
+
+    def trend(self, book, window=7, granularity='D'):
+        """Current moving average, the one a window earlier, and the trend description."""
+        last = self._last.get((book, granularity))
+        current = self.moving_average(book, window, granularity)
+        previous = self.moving_average(book, window, granularity, end=last - window) if last is not None else None
+        stats = self.window_stats(book, window, granularity)
+        return {
+            'trend_description': describe_trend(current),
+            'current_sentiment': current,
+            'previous_sentiment': previous,
+            'change': current - previous if current is not None and previous is not None else None,
+            'post_count': stats['post_count'] if stats else 0,
+            'std': stats['std'] if stats else None,
+        }
+
+    def series(self, book, granularity='D', window=7, min_periods=None):
+        """
+        Every bucket from the book's first to its latest: (bucket start dates,
+        per-bucket means, moving averages) as NumPy arrays, NaN for empty buckets
+        and for moving averages without enough data.
+        """
+        key = (book, granularity)
+        cells = self._cells.get(key)
+        if not cells:
+            empty = np.zeros(0, dtype=np.float64)
+            return np.zeros(0, dtype='datetime64[D]'), empty, empty.copy()
+        first = min(cells)
+        buckets = np.arange(first, self._last[key] + 1, dtype=np.int64)
+        means = np.full(len(buckets), np.nan)
+        for bucket, (count, total, _) in cells.items():
+            means[bucket - first] = total / count
+
+        # Rolling mean of the non-empty buckets via cumulative sums
+        valid = ~np.isnan(means)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(valid, means, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(valid)))
+        lower = np.maximum(np.arange(1, len(buckets) + 1) - window, 0)
+        window_sums = sums[1:] - sums[lower]
+        window_counts = counts[1:] - counts[lower]
+        min_periods = min_periods if min_periods is not None else max(1, window // 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            moving = np.where(window_counts >= min_periods, window_sums / window_counts, np.nan)
+        return bucket_starts(buckets, granularity), means, moving
@@ -1,60 +1,189 @@
-import praw
-from datetime import datetime
-import pandas as pd
+import itertools
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
-from textblob import TextBlob
-import re
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-
-
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-    print("NLTK 'vader_lexicon' not found. Downloading...")
-    nltk.download('vader_lexicon')
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    print("NLTK 'wordnet' not found. Downloading...")
-    nltk.download('wordnet')
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    print("NLTK 'punkt' not found. Downloading...")
-    nltk.download('punkt')
+from models.aggregates import SentimentAggregate
+from models.result_assembly import NEGATIVE_CUTOFF, POSITIVE_CUTOFF, assemble, compare_matrix, posts_frame
+from models.scorers import DEFAULT_SCORERS, SCORERS, parse_scorers
+from utils.async_reddit import AsyncPrawBackend, AsyncRedditFetcher, HttpSearchBackend
+from utils.comments import CommentHarvester, CommentItem
+from utils.dedup import Deduplicator
+from utils.metrics import STAGE_SECONDS, stage, timed_iter
+from utils.nltk_data import ensure_nltk_data
+from utils.prefetch import Prefetcher
+from utils.reddit_http import RedditUnavailable, is_transient, resumable_listing, thread_reddit
+from utils.review_corpus import CorpusIngester, ReviewCorpus
+from utils.score_store import PostScoreStore, content_hash
+from utils.text import clean_text
+
+# praw, pandas, NLTK and TextBlob are imported where they are first needed:
+# together they take a few seconds to import, which used to delay worker startup.
 
 load_dotenv()
 
+# Broader subreddits for books
+SUBREDDITS = 'books+suggestmeabook+literature+bookclub+sci-fi+fantasy+printsf'
+# Most posts iter_reddit_reviews scores per call when no scorer runs on a process pool
+STREAM_BATCH_SIZE = 25
+
+
+def post_text(post):
+    """The text a post is scored on: title and body for submissions, the body alone for comments."""
+    # (isinstance rather than getattr: unknown attributes make PRAW refetch the submission)
+    return post.selftext if isinstance(post, CommentItem) else f"{post.title} {post.selftext}"
+
+
+def crosspost_parent(post):
+    """Fullname of the post this one crossposts, if Reddit sent it (read without triggering a PRAW fetch)."""
+    return vars(post).get('crosspost_parent')
+
+
+def post_fullname(post):
+    """Reddit fullname of a post ('t3_<id>') or harvested comment (whose id is already 't1_<id>')."""
+    return post.id if isinstance(post, CommentItem) else f"t3_{post.id}"
+
+
+def sentiment_category(score):
+    """Map a VADER compound score to positive / neutral / negative."""
+    return 'positive' if score >= POSITIVE_CUTOFF else ('negative' if score <= NEGATIVE_CUTOFF else 'neutral')
+
+
 class ReviewSentimentAnalyzer:
-    def __init__(self):
+    def __init__(self, score_store=None, parallel=None, workers=None, chunk_size=None, include_comments=None,
+                 use_corpus=None, scorers=None, dedup=None):
+        # The Reddit client, VADER and the scorers are built lazily on first use
+        # (see the properties below), so constructing the analyzer is cheap and offline.
+        self._init_lock = threading.RLock()
+        self._reddit = None # A client set explicitly (e.g. a fake), or None after a failed initialization
+        self._reddit_ready = False
+        self._reddit_checked = False # Credentials accepted by Reddit (checked once per process)
+        self._reddit_check_after = 0.0 # After a transient failure, when to check again (monotonic seconds)
+        self._thread = threading.local() # Each thread's own PRAW client
+        self._sia = None
+        self._scorers = {} # name -> scorer instance, see get_scorer
+        self._scorer_options = (parallel, workers, chunk_size)
+
+        # Scorers run on new posts by default (SENTIMENT_SCORERS, e.g. "vader_fast,textblob")
         try:
-            self.reddit = praw.Reddit(
-                client_id=os.getenv('REDDIT_CLIENT_ID'),
-                client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-                user_agent=os.getenv('REDDIT_USER_AGENT')
-            )
-            self.reddit.user.me() # Check connection
+            self.scorer_names = parse_scorers(scorers)
+        except ValueError as e:
+            print(f"WARNING: {e}; using '{DEFAULT_SCORERS}'.")
+            self.scorer_names = parse_scorers(DEFAULT_SCORERS)
+
+        # Persistent per-post score memo so posts seen by earlier queries aren't re-scored
+        if score_store is None:
+            try:
+                score_store = PostScoreStore()
+            except Exception as e:
+                print(f"WARNING: Post score store unavailable, scoring every post: {e}")
+        self.score_store = score_store
+        self._async_fetcher = None # Built on first use by fetch_posts_many
+
+        # Optional comment harvesting (bounded by COMMENTS_* settings, see utils/comments.py)
+        if include_comments is None:
+            include_comments = os.getenv('INCLUDE_COMMENTS', '').lower() in ('1', 'true', 'yes')
+        self.comment_harvester = CommentHarvester() if include_comments else None
+
+        # Crossposts and copy-pasted posts are dropped before scoring unless DEDUP_POSTS=0
+        if dedup is None:
+            dedup = os.getenv('DEDUP_POSTS', '1').lower() not in ('0', 'false', 'no')
+        self.deduplicator = Deduplicator() if dedup else None
+
+        # Optional local corpus: warm queries are answered from its FTS index instead of Reddit
+        if use_corpus is None:
+            use_corpus = os.getenv('USE_REVIEW_CORPUS', '').lower() in ('1', 'true', 'yes')
+        self.corpus = None
+        if use_corpus:
+            try:
+                self.corpus = ReviewCorpus()
+            except Exception as e:
+                print(f"WARNING: Review corpus unavailable, always searching Reddit: {e}")
+
+    def _check_reddit(self):
+        """
+        Check the credentials once per process (under _init_lock) by fetching
+        the OAuth token every thread's client then shares (utils/reddit_http.py).
+        Bad credentials or configuration switch Reddit off; after a transient
+        failure (429, 5xx, network) clients are handed out unchecked, and the
+        check is retried once REDDIT_CHECK_RETRY seconds (default 30) have passed.
+        """
+        try:
+            # (auth.scopes() rather than user.me(), which raises in PRAW's read-only mode)
+            thread_reddit().auth.scopes()
             print("Reddit API initialized successfully.")
+            self._reddit_checked = True
         except Exception as e:
+            if is_transient(e):
+                print(f"WARNING: Could not reach Reddit to check credentials, will retry: {e}")
+                self._reddit_check_after = time.monotonic() + float(os.getenv('REDDIT_CHECK_RETRY', 30))
+                return
             print(f"ERROR: Failed to initialize Reddit API: {e}")
             print("Ensure correct Reddit credentials are in .env file.")
-            self.reddit = None
-        # Initialize VADER
-        self.sia = SentimentIntensityAnalyzer()
-        # TextBlob is implicitly used in get_sentiment_score_textblob
+            self._reddit, self._reddit_ready = None, True
+
+    def _reddit_check_due(self):
+        return not (self._reddit_checked or self._reddit_ready) and time.monotonic() >= self._reddit_check_after
+
+    @property
+    def reddit(self):
+        """
+        This thread's PRAW client (PRAW clients aren't thread-safe). The first
+        use in the process checks the credentials; other threads' clients are
+        built without an API call. None once the credentials have been rejected.
+        """
+        if self._reddit_check_due():
+            with self._init_lock:
+                if self._reddit_check_due():
+                    self._check_reddit()
+        if self._reddit_ready:
+            return self._reddit
+        reddit = getattr(self._thread, 'reddit', None)
+        if reddit is None:
+            try:
+                reddit = self._thread.reddit = thread_reddit()
+            except Exception as e:
+                print(f"ERROR: Failed to create a Reddit client: {e}")
+                return None
+        return reddit
+
+    @reddit.setter
+    def reddit(self, client):
+        self._reddit = client
+        self._reddit_ready = True
+
+    @property
+    def sia(self):
+        """VADER analyzer, created on first use."""
+        if self._sia is None:
+            with self._init_lock:
+                if self._sia is None:
+                    ensure_nltk_data('vader_lexicon')
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    self._sia = SentimentIntensityAnalyzer()
+        return self._sia
+
+    def get_scorer(self, name):
+        """Scorer registered under `name` (models/scorers.py), built on first use;
+        parallel=True scores large batches on a shared process pool."""
+        scorer = self._scorers.get(name)
+        if scorer is None:
+            with self._init_lock:
+                scorer = self._scorers.get(name)
+                if scorer is None:
+                    scorer = self._scorers[name] = SCORERS[name](*self._scorer_options)
+        return scorer
+
+    def warm_up(self):
+        """Load everything lazily constructed (default scorers' lexicons, Reddit client) ahead of the first request."""
+        for name in self.scorer_names:
+            self.get_scorer(name).score(["warm up"])
+        self.reddit
 
     def clean_text(self, text):
-        if not isinstance(text, str):
-            return ""
-        # Keep basic cleaning
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text) # Remove markdown links but keep text
-        # Keep basic punctuation that might affect sentiment (like !, ?)
-        text = re.sub(r'[^a-zA-Z0-9\s.,!?\'\"-]', '', text)
-        text = re.sub(r'<.*?>', '', text) # Remove HTML tags if any
-        return text.strip()
+        """Shared cleaner from utils/text.py (precompiled patterns)."""
+        return clean_text(text)
 
     def get_sentiment_score_vader(self, text):
         """Get sentiment score using VADER."""
@@ -68,61 +197,407 @@ class ReviewSentimentAnalyzer:
         cleaned_text = self.clean_text(text)
         if not cleaned_text:
             return 0.0
+        from textblob import TextBlob
         analysis = TextBlob(cleaned_text)
         return analysis.sentiment.polarity
 
 
-    def get_reddit_reviews(self, query, limit=100):
-        """Fetches and analyzes Reddit posts for a given book/author query."""
-        if not self.reddit:
-            print("Reddit API not available.")
-            return pd.DataFrame()
-
+    def score_posts(self, submissions, scorers=None):
+        """
+        Cleans and scores a batch of PRAW submissions, returning one dict per post
+        (posts that are too short are dropped). Scores come from the post score
+        store when possible; everything else is scored in one batch by each of
+        `scorers` (default: self.scorer_names). Columns of scorers that didn't
+        run are None.
+        """
+        names = self.scorer_names if scorers is None else parse_scorers(scorers)
+        columns = [SCORERS[name].column for name in names]
         posts = []
-        # Broader subreddits for books
-        subreddit_list = 'books+suggestmeabook+literature+bookclub+sci-fi+fantasy+printsf'
-        print(f"Searching Reddit for '{query}' in subreddits: {subreddit_list}...")
+        pending = [] # (index in posts, post id, content hash, cleaned text) for posts that need scoring
+        new_scores = [] # Scores computed for this batch, written to the store in one transaction
+        clean_seconds = 0.0 # Cleaning is interleaved with store lookups, so it is timed piecewise
+
+        for post in submissions:
+            kind = 'comment' if isinstance(post, CommentItem) else 'post'
+            # Combine title and text for analysis (comments are scored on their body only)
+            full_text = post_text(post)
+            text_hash = content_hash(full_text)
+
+            found = False
+            if self.score_store is not None:
+                found, sentiment_score, sentiment_score_tb = self.score_store.get(post.id, text_hash)
+
+            cleaned_full_text = None
+            if not found:
+                # Filter out very short/empty posts after cleaning
+                start = time.perf_counter()
+                cleaned_full_text = self.clean_text(full_text)
+                clean_seconds += time.perf_counter() - start
+                if len(cleaned_full_text) < 30: # Skip very short posts
+                    new_scores.append((post.id, text_hash, None, None))
+                    continue
+                sentiment_score = sentiment_score_tb = None
+            elif sentiment_score is None: # Known to be too short to score
+                continue
+
+            posts.append({
+                'id': post.id,
+                'kind': kind,
+                'title': post.title,
+                'text': post.selftext,
+                'score': post.score,
+                'sentiment': sentiment_score,
+                'sentiment_textblob': sentiment_score_tb, # Optionally store TextBlob score
+                'created_utc': int(post.created_utc), # Epoch seconds; format at display time
+                'url': f'https://reddit.com{post.permalink}',
+                'subreddit': post.subreddit.display_name
+            })
+            # New posts, or stored ones missing a selected score, are scored below in one batch
+            if any(posts[-1][column] is None for column in columns):
+                if cleaned_full_text is None:
+                    start = time.perf_counter()
+                    cleaned_full_text = self.clean_text(full_text)
+                    clean_seconds += time.perf_counter() - start
+                pending.append((len(posts) - 1, post.id, text_hash, cleaned_full_text))
+
+        STAGE_SECONDS.observe(clean_seconds, stage='clean')
+
+        # Run each selected scorer once over every post still missing its column.
+        # (The store keeps one `sentiment` value whichever VADER backend produced it: they agree exactly.)
+        if pending:
+            texts = [item[3] for item in pending]
+            for name, column in zip(names, columns):
+                missing = [k for k, item in enumerate(pending) if posts[item[0]][column] is None]
+                if missing:
+                    scorer = self.get_scorer(name)
+                    with stage(name):
+                        values = scorer.score([texts[k] for k in missing]).tolist()
+                    for k, value in zip(missing, values):
+                        posts[pending[k][0]][column] = value
+            new_scores.extend(
+                (post_id, text_hash, posts[index]['sentiment'], posts[index]['sentiment_textblob'])
+                for index, post_id, text_hash, _ in pending
+            )
+        if self.score_store is not None:
+            self.score_store.put_many(new_scores)
+        return posts
+
+    def scoring_batch_size(self, scorers=None):
+        """
+        Posts per score_posts call in iter_reddit_reviews: STREAM_BATCH_SIZE, or
+        enough to give every pool worker a chunk when a selected scorer runs in
+        parallel (smaller batches would always be scored in-process).
+        """
+        names = self.scorer_names if scorers is None else parse_scorers(scorers)
+        sizes = [getattr(self.get_scorer(name).batch_scorer, 'batch_size', 0) for name in names]
+        return max([STREAM_BATCH_SIZE] + sizes)
+
+    def iter_reddit_reviews(self, query, limit=100, batch_size=None, prefetch=200, use_corpus=True, scorers=None):
+        """
+        Streams scored posts for a query as they arrive.
+
+        Submissions are fetched on a background thread into a bounded queue
+        (`prefetch` items, at least one batch) while this generator scores
+        whatever has arrived so far, up to `batch_size` posts at a time
+        (default: scoring_batch_size()). Fetch errors are re-raised here;
+        if Reddit stays unavailable after retries, that is RedditUnavailable.
+        When comment harvesting is enabled, each submission's comments are
+        fetched on the same background thread and scored alongside the posts.
+
+        Exact and near-duplicate posts (crossposts, copy-pasted requests) are
+        dropped before scoring; see utils/dedup.py.
+
+        With the review corpus enabled, warm queries are served from the local
+        index; otherwise everything fetched is added to it as it is scored.
+        Pass use_corpus=False to force a Reddit fetch (e.g. to refresh the corpus).
+        `scorers` picks the scorers for this call (see score_posts); corpus
+        posts stored without one of their columns are scored for it here.
+        """
+        if use_corpus and self.corpus_is_warm(query):
+            print(f"Answering '{query}' from the local review corpus.")
+            yield from self._score_corpus_posts(self.corpus.search(query, limit=limit), scorers)
+            return
+
+        print(f"Searching Reddit for '{query}' in subreddits: {SUBREDDITS}...")
+
+        # Use relevance sort, search within title and body is implicit. Transient failures
+        # (429s, 5xx, resets) are retried from the last post received, within REDDIT_DEADLINE.
+        subreddit = self.reddit.subreddit(SUBREDDITS)
+        search = resumable_listing(
+            lambda remaining, params: subreddit.search(query, limit=remaining, sort='relevance', time_filter='all',
+                                                       params=params),
+            limit
+        )
+        if self.comment_harvester is not None:
+            search = self.comment_harvester.expand(search)
+        search = timed_iter(search, 'reddit_fetch') # Time spent in PRAW on the prefetch thread
+        dedup = self.deduplicator.session() if self.deduplicator is not None else None
+        if batch_size is None:
+            batch_size = self.scoring_batch_size(scorers)
+        with Prefetcher(search, maxsize=max(prefetch, batch_size)) as fetcher:
+            while True:
+                submissions = fetcher.get_batch(batch_size)
+                if not submissions:
+                    break
+                if dedup is not None:
+                    with stage('dedup'):
+                        submissions = dedup.filter(submissions, post_text, lambda post: post.score,
+                                                   crosspost_parent, post_fullname)
+                posts = self.score_posts(submissions, scorers)
+                if self.corpus is not None:
+                    self.corpus.add_posts(posts)
+                yield from posts
+        if dedup is not None:
+            self._report_dedup(query, dedup.close())
+        if self.corpus is not None:
+            self.corpus.mark_ingested(query)
+
+    def _score_corpus_posts(self, posts, scorers=None):
+        """
+        Fill in the columns of `scorers` (default: self.scorer_names) that corpus
+        posts were stored without, e.g. TextBlob when it wasn't selected at
+        ingest, and write the new scores back to the corpus.
+        """
+        names = self.scorer_names if scorers is None else parse_scorers(scorers)
+        texts = {} # post id -> cleaned text, cleaned once however many scorers need it
+        rescored = {}
+        for name in names:
+            column = SCORERS[name].column
+            missing = [post for post in posts if post[column] is None]
+            if not missing:
+                continue
+            for post in missing:
+                if post['id'] not in texts:
+                    # Same text as post_text(): comments are scored on their body alone
+                    raw = post['text'] if post['kind'] == 'comment' else f"{post['title']} {post['text']}"
+                    texts[post['id']] = self.clean_text(raw)
+            with stage(name):
+                values = self.get_scorer(name).score([texts[post['id']] for post in missing]).tolist()
+            for post, value in zip(missing, values):
+                post[column] = value
+                rescored[post['id']] = post
+        if rescored:
+            self.corpus.add_posts(list(rescored.values()))
+        return posts
+
+    def _report_dedup(self, query, report):
+        dropped = report['exact'] + report['crosspost'] + report['near']
+        if dropped:
+            print(f"Dropped {dropped} of {report['seen']} posts for '{query}' as duplicates "
+                  f"({report['exact']} exact, {report['crosspost']} crossposts, {report['near']} near), "
+                  f"skipping {report['dropped_chars']} characters of scoring.")
+
+    def corpus_is_warm(self, query):
+        """True if the local review corpus can answer `query` without Reddit."""
+        return self.corpus is not None and self.corpus.is_warm(query)
+
+    def start_corpus_ingester(self, interval=None):
+        """Start a background thread that re-fetches stale corpus queries from Reddit."""
+        if self.corpus is None:
+            return None
+        refresh = lambda query: sum(1 for _ in self.iter_reddit_reviews(query, use_corpus=False))
+        return CorpusIngester(self.corpus, refresh, interval=interval).start()
+
+    def fetch_posts(self, query, limit=100, scorers=None, raise_unavailable=False):
+        """
+        Fetches and scores Reddit posts for a query as a list of post dicts (empty on failure).
+        With raise_unavailable=True, RedditUnavailable propagates so callers can tell
+        "Reddit is rate limiting / down" from "nothing matched".
+        """
+        if not self.corpus_is_warm(query) and not self.reddit: # Warm queries don't need Reddit
+            print("Reddit API not available.")
+            return []
 
         try:
-            # Use relevance sort, search within title and body is implicit
-            for post in self.reddit.subreddit(subreddit_list).search(
-                query, limit=limit, sort='relevance', time_filter='all'
-            ):
-                 # Combine title and text for analysis
-                 full_text = f"{post.title} {post.selftext}"
-                 # Filter out very short/empty posts after cleaning
-                 cleaned_full_text = self.clean_text(full_text)
-                 if len(cleaned_full_text) < 30: # Skip very short posts
-                     continue
-
-                 # Calculate sentiment using VADER
-                 sentiment_score = self.get_sentiment_score_vader(cleaned_full_text)
-                 sentiment_score_tb = self.get_sentiment_score_textblob(cleaned_full_text)
-
-
-                 posts.append({
-                     'title': post.title,
-                     'text': post.selftext,
-                     'score': post.score,
-                     'sentiment': sentiment_score,
-                     'sentiment_textblob': sentiment_score_tb, # Optionally store TextBlob score
-                     'created_utc': datetime.fromtimestamp(post.created_utc).strftime('%Y-%m-%d %H:%M:%S'),
-                     'url': f'https://reddit.com{post.permalink}',
-                     'subreddit': post.subreddit.display_name
-                 })
+            posts = list(self.iter_reddit_reviews(query, limit=limit, scorers=scorers))
             print(f"Found and processed {len(posts)} relevant posts.")
+        except RedditUnavailable as e:
+            print(f"Error fetching Reddit posts for '{query}': {str(e)}")
+            if raise_unavailable:
+                raise
+            return []
         except Exception as e:
             print(f"Error fetching or processing Reddit posts for '{query}': {str(e)}")
+            return []
+        return posts
+
+    def get_reddit_reviews(self, query, limit=100, scorers=None):
+        """Fetches and analyzes Reddit posts for a given book/author query, as a compact-dtype DataFrame."""
+        posts = self.fetch_posts(query, limit=limit, scorers=scorers)
+        with stage('dataframe'):
+            return posts_frame(posts)
+
+
+    @property
+    def async_fetcher(self):
+        """Concurrent search client; REDDIT_ASYNC_BACKEND picks 'http' (default) or 'asyncpraw'."""
+        if self._async_fetcher is None:
+            backend_name = os.getenv('REDDIT_ASYNC_BACKEND', 'http').lower()
+            backend = AsyncPrawBackend() if backend_name == 'asyncpraw' else HttpSearchBackend()
+            self._async_fetcher = AsyncRedditFetcher(
+                backend, max_concurrency=int(os.getenv('REDDIT_MAX_CONCURRENCY', 4))
+            )
+        return self._async_fetcher
+
+    @async_fetcher.setter
+    def async_fetcher(self, fetcher):
+        self._async_fetcher = fetcher
+
+    def fetch_posts_many(self, queries, limit=100, subreddits=None, scorers=None, failed=None):
+        """
+        Searches several queries (and optionally several subreddit groups) concurrently.
+        Returns {query: [post dicts]}. A post matching more than one query is cleaned
+        and scored once, and the same dict appears in each of those queries' lists.
+        Duplicates are dropped per query, so each list matches searching that query alone.
+
+        Each search's posts are deduplicated and scored here as soon as it
+        completes, while the remaining searches run on a background thread, so
+        scoring overlaps the network wait. A query with a failed search keeps
+        whatever its other searches found and, if `failed` is a dict, is added
+        to it as {query: error message}. If every search fails (Reddit is down
+        or rate limiting), RedditUnavailable is raised.
+        """
+        subreddits = subreddits or [SUBREDDITS]
+        errors = [] # (query, error) per failed search, filled on the fetch thread before `done` is queued
+        print(f"Searching Reddit concurrently for {len(queries)} queries in {len(subreddits)} subreddit group(s)...")
+        arrived = queue.Queue() # (query, posts) as searches complete, then (done, the final result or the error)
+        done = object()
+
+        def fetch():
+            try:
+                with stage('reddit_fetch'):
+                    found = self.async_fetcher.search_many(queries, subreddits, limit=limit,
+                                                           on_result=lambda query, posts: arrived.put((query, posts)),
+                                                           on_error=lambda query, _, e: errors.append((query, e)))
+                arrived.put((done, found))
+            except Exception as e:
+                arrived.put((done, e))
+        threading.Thread(target=fetch, daemon=True).start()
+
+        # Duplicates are dropped within each query's results, so each list is what searching that
+        # query alone keeps; posts are shared by id across searches, so each is still scored once.
+        # Posts arrive in search-completion order, so of near duplicates the first to arrive is kept.
+        unique = list(dict.fromkeys(queries))
+        sessions = {query: self.deduplicator.session() for query in unique} if self.deduplicator is not None else {}
+        seen = {query: set() for query in unique} # ids that have been through each query's dedup
+        kept = {query: set() for query in unique}
+        attempted = set() # ids passed to score_posts (too-short posts don't come back from it)
+        scored = {}
+        while True:
+            query, posts = arrived.get()
+            if query is done:
+                found = posts
+                break
+            new = [post for post in posts if post.id not in seen[query]]
+            seen[query].update(post.id for post in new)
+            if query in sessions and new:
+                with stage('dedup'):
+                    new = sessions[query].filter(new, post_text, lambda post: post.score, crosspost_parent, post_fullname)
+            kept[query].update(post.id for post in new)
+            unscored = [post for post in new if post.id not in attempted]
+            attempted.update(post.id for post in unscored)
+            if unscored:
+                scored.update((row['id'], row) for row in self.score_posts(unscored, scorers))
+        for query, session in sessions.items():
+            self._report_dedup(query, session.close())
+        if isinstance(found, Exception):
+            raise found
+        if errors and len(errors) == len(set(queries)) * len(subreddits): # Every search failed
+            error = errors[0][1]
+            if isinstance(error, RedditUnavailable):
+                raise error
+            raise RedditUnavailable(f"Reddit is rate limiting or not responding ({error}); try again shortly.") from error
+        if failed is not None:
+            for query, error in errors:
+                failed.setdefault(query, str(error))
+        print(f"Found and processed {len(scored)} unique relevant posts.")
+        return {
+            query: [scored[post.id] for post in found.get(query, []) if post.id in kept[query] and post.id in scored]
+            for query in queries
+        }
+
+    def get_reddit_reviews_many(self, queries, limit=100, subreddits=None):
+        """fetch_posts_many as {query: DataFrame}, with empty frames if the fetch fails."""
+        try:
+            posts = self.fetch_posts_many(queries, limit=limit, subreddits=subreddits)
+        except Exception as e:
+            print(f"Error fetching or processing Reddit posts for {queries}: {str(e)}")
+            return {query: posts_frame([]) for query in queries}
+        with stage('dataframe'):
+            return {query: posts_frame(query_posts) for query, query_posts in posts.items()}
 
-            return pd.DataFrame()
-        return pd.DataFrame(posts)
+    def compare_titles(self, titles, limit=100, scorers=None, period='M'):
+        """
+        Sentiment for several titles side by side. The titles are searched
+        concurrently (fetch_posts_many), so posts matching several titles are
+        scored once. Returns per-title lists aligned with `titles`: average
+        sentiment, post count, distribution and a per-`period` trend (see
+        models/result_assembly.compare_matrix), plus `errors`: None for each
+        title whose searches all succeeded, else the error (its numbers then
+        cover only what was found). If Reddit is unavailable for every title,
+        the result is unsuccessful with `reddit_unavailable` set.
+        """
+        titles = list(dict.fromkeys(titles))
+        failed = {}
+        try:
+            posts = self.fetch_posts_many(titles, limit=limit, scorers=scorers, failed=failed)
+        except RedditUnavailable as e:
+            print(f"Reddit unavailable while comparing {titles}: {str(e)}")
+            return {'success': False, 'error': str(e), 'reddit_unavailable': True}
+        except Exception as e:
+            print(f"Error fetching or processing Reddit posts for {titles}: {str(e)}")
+            return {'success': False, 'error': f'Error fetching Reddit posts: {str(e)}'}
 
+        matched = [post['id'] for title in titles for post in posts[title]]
+        with stage('sort'):
+            matrix = compare_matrix(titles, [posts[title] for title in titles], period=period)
+        return {
+            'success': True,
+            **matrix,
+            'unique_posts': len(set(matched)),
+            'shared_posts': len(matched) - len(set(matched)), # Matches served by a post already scored for another title
+            'errors': [failed.get(title) for title in titles],
+        }
 
-    def analyze_sentiment(self, query):
+    def analyze_sentiment(self, query, scorers=None):
         """Analyzes overall sentiment and categorizes all posts.""" # Updated docstring
-        posts_df = self.get_reddit_reviews(query)
+        # Summarized straight from the post dicts: no DataFrame is needed for the result
+        try:
+            posts = self.fetch_posts(query, scorers=scorers, raise_unavailable=True)
+        except RedditUnavailable as e:
+            return {'success': False, 'error': str(e), 'reddit_unavailable': True}
+        return self.summarize_posts(query, posts)
+
+    def aggregate_sentiment(self, query, limit=100, top_k=10, scorers=None, batch_size=1000):
+        """
+        analyze_sentiment for result sets too large to hold: posts are folded
+        into a SentimentAggregate (models/aggregates.py) `batch_size` at a
+        time as they stream in, so memory stays flat however large `limit` is.
+        Returns the aggregate; its summary() has analyze_sentiment's shape
+        with the `top_k` highest-scored posts per category, and aggregates
+        built for other shards of the same query can be merge()d into it.
+        RedditUnavailable is raised if the search gets nothing before its
+        deadline; a search cut short later keeps the posts it received
+        (see utils/reddit_http.resumable_listing).
+        """
+        aggregate = SentimentAggregate(top_k=top_k)
+        posts = self.iter_reddit_reviews(query, limit=limit, scorers=scorers)
+        while True:
+            batch = list(itertools.islice(posts, batch_size))
+            if not batch:
+                break
+            aggregate.add_posts(batch)
+        print(f"Found and processed {aggregate.post_count} relevant posts.")
+        return aggregate
 
-        if posts_df.empty:
+    def summarize_posts(self, query, posts):
+        """
+        Builds the analyze_sentiment result (averages, distribution, categorized posts)
+        from scored post dicts (or a DataFrame of them); see models/result_assembly.py.
+        """
+        if hasattr(posts, 'to_dict'):
+            posts = posts.to_dict('records')
+        if not posts:
             if not self.reddit:
                  return {
                      'success': False,
@@ -142,30 +617,54 @@ class ReviewSentimentAnalyzer:
                     'negative_posts': []
                  }
 
-        avg_sentiment = posts_df['sentiment'].mean()
-
-        # Categorize sentiment
-        posts_df['sentiment_category'] = posts_df['sentiment'].apply(
-            lambda x: 'positive' if x >= 0.05 else ('negative' if x <= -0.05 else 'neutral')
-        )
-        sentiment_counts = posts_df['sentiment_category'].value_counts().to_dict()
-
-    
-        # Sort posts within each category, e.g., by score descending for relevance
-        posts_df = posts_df.sort_values(by='score', ascending=False)
-
-        positive_posts = posts_df[posts_df['sentiment_category'] == 'positive'].to_dict('records')
-        neutral_posts = posts_df[posts_df['sentiment_category'] == 'neutral'].to_dict('records')
-        negative_posts = posts_df[posts_df['sentiment_category'] == 'negative'].to_dict('records')
-
+        # Categorize, then sort posts within each category by score descending for relevance
+        with stage('sort'):
+            avg_sentiment, sentiment_counts, by_category = assemble(posts)
 
         return {
             'success': True,
-            'average_sentiment': float(avg_sentiment),
-            'post_count': len(posts_df),
+            'average_sentiment': avg_sentiment,
+            'post_count': len(posts),
             'sentiment_distribution': sentiment_counts,
             # Return categorized lists
-            'positive_posts': positive_posts,
-            'neutral_posts': neutral_posts,
-            'negative_posts': negative_posts
-        }
\ No newline at end of file
+            'positive_posts': by_category['positive'],
+            'neutral_posts': by_category['neutral'],
+            'negative_posts': by_category['negative']
+        }
+
+    def stream_sentiment(self, query, summary_every=10, limit=100, scorers=None):
+        """
+        Incremental version of analyze_sentiment. Yields event dicts:
+        {'type': 'post', 'post': ...} for every scored post as soon as it is ready,
+        {'type': 'summary', ...} running aggregates every `summary_every` posts,
+        and finally {'type': 'done', 'result': <analyze_sentiment result>}
+        or {'type': 'error', 'error': ...}.
+        """
+        if not self.corpus_is_warm(query) and not self.reddit: # Warm queries don't need Reddit
+            yield {'type': 'error', 'error': 'Reddit API initialization failed. Check credentials.'}
+            return
+
+        posts = []
+        total = 0.0
+        counts = {'positive': 0, 'neutral': 0, 'negative': 0}
+        try:
+            for post in self.iter_reddit_reviews(query, limit=limit, scorers=scorers):
+                post['sentiment_category'] = sentiment_category(post['sentiment'])
+                posts.append(post)
+                total += post['sentiment']
+                counts[post['sentiment_category']] += 1
+                yield {'type': 'post', 'post': post}
+                if len(posts) % summary_every == 0:
+                    yield {
+                        'type': 'summary',
+                        'average_sentiment': total / len(posts),
+                        'post_count': len(posts),
+                        'sentiment_distribution': dict(counts)
+                    }
+            print(f"Found and processed {len(posts)} relevant posts.")
+        except Exception as e:
+            print(f"Error fetching or processing Reddit posts for '{query}': {str(e)}")
+            yield {'type': 'error', 'error': f'Error fetching Reddit posts: {str(e)}'}
+            return
+
+        yield {'type': 'done', 'result': self.summarize_posts(query, posts)}
@@ -0,0 +1,209 @@
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.reddit_http import (REDDIT_EVENTS, Deadline, DeadlineExceeded, RedditHttpClient, call_with_retries,
+                               default_deadline, is_transient)
+
+
+class JsonSubreddit:
+    def __init__(self, name):
+        self.display_name = name
+
+
+class JsonSubmission:
+    """Minimal PRAW-Submission look-alike built from a Reddit listing JSON child."""
+
+    def __init__(self, data):
+        self.id = data.get('id', '')
+        self.title = data.get('title', '') or ''
+        self.selftext = data.get('selftext', '') or ''
+        self.score = data.get('score', 0) or 0
+        self.created_utc = data.get('created_utc', 0) or 0
+        self.permalink = data.get('permalink', '')
+        self.num_comments = data.get('num_comments', 0) or 0
+        self.subreddit = JsonSubreddit(data.get('subreddit', ''))
+        self.crosspost_parent = data.get('crosspost_parent') # Set on crossposts only
+
+
+class HttpSearchBackend:
+    """
+    Async search backend that talks to Reddit's JSON API with the standard library
+    (requests run on worker threads via asyncio.to_thread, so no extra dependency).
+
+    With client credentials it uses app-only OAuth against oauth.reddit.com;
+    `base_url` can point at a local stub server instead. Requests go through
+    utils/reddit_http.py: pooled keep-alive connections, the shared rate-limit
+    scheduler, and retries with jittered backoff, all within `deadline` seconds
+    per search (default REDDIT_DEADLINE).
+    """
+
+    def __init__(self, client_id=None, client_secret=None, user_agent=None, base_url=None, timeout=10, client=None,
+                 deadline=None):
+        self.client_id = client_id or os.getenv('REDDIT_CLIENT_ID')
+        self.client_secret = client_secret or os.getenv('REDDIT_CLIENT_SECRET')
+        self.user_agent = user_agent or os.getenv('REDDIT_USER_AGENT') or 'book-review-analyzer'
+        self.base_url = (base_url or ('https://oauth.reddit.com' if self.client_id else 'https://www.reddit.com')).rstrip('/')
+        self.timeout = timeout
+        self.client = client or RedditHttpClient()
+        self.deadline = deadline
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+
+    def _access_token(self, deadline):
+        if not self.client_id or not self.base_url.startswith('https://oauth.reddit.com'):
+            return None
+        with self._token_lock: # One token request when several searches start together
+            if self._token and time.time() < self._token_expires - 60:
+                return self._token
+            credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+            _, _, body = self.client.request(
+                'POST', 'https://www.reddit.com/api/v1/access_token',
+                headers={'Authorization': f'Basic {credentials}', 'User-Agent': self.user_agent,
+                         'Content-Type': 'application/x-www-form-urlencoded'},
+                body=b'grant_type=client_credentials', timeout=self.timeout, deadline=deadline, scheduled=False
+            )
+            payload = json.loads(body)
+            self._token = payload['access_token']
+            self._token_expires = time.time() + payload.get('expires_in', 3600)
+            return self._token
+
+    def _get(self, path, params, deadline=None):
+        def attempt():
+            headers = {'User-Agent': self.user_agent}
+            token = self._access_token(deadline)
+            if token:
+                headers['Authorization'] = f'Bearer {token}'
+            url = f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+            return json.loads(self.client.request('GET', url, headers=headers, timeout=self.timeout, deadline=deadline)[2])
+        return call_with_retries(attempt, deadline, self.client.attempts)
+
+    async def search(self, query, subreddit, limit=100, sort='relevance', time_filter='all'):
+        """
+        Return up to `limit` JsonSubmission objects, following `after` pagination.
+        If later pages fail or the deadline passes, the pages already fetched are returned.
+        """
+        deadline = Deadline(self.deadline) if self.deadline is not None else default_deadline()
+        submissions = []
+        after = None
+        while len(submissions) < limit:
+            params = {
+                'q': query, 'restrict_sr': 1, 'sort': sort, 't': time_filter,
+                'limit': min(100, limit - len(submissions)), 'raw_json': 1
+            }
+            if after:
+                params['after'] = after
+            try:
+                payload = await asyncio.to_thread(self._get, f'/r/{subreddit}/search.json', params, deadline)
+            except Exception as e:
+                if not submissions or not (is_transient(e) or isinstance(e, DeadlineExceeded)):
+                    raise
+                REDDIT_EVENTS.inc(event='partial')
+                print(f"WARNING: Returning {len(submissions)} posts from r/{subreddit} for '{query}' after: {e}")
+                break
+            data = payload.get('data', {})
+            children = data.get('children', [])
+            submissions.extend(JsonSubmission(child.get('data', {})) for child in children)
+            after = data.get('after')
+            if not children or not after:
+                break
+        return submissions[:limit]
+
+    def wait_time(self):
+        """Seconds until the shared scheduler lets the next request go."""
+        return self.client.bucket.wait_time()
+
+
+class AsyncPrawBackend:
+    """Async search backend on top of asyncpraw (optional dependency, imported on first use)."""
+
+    def __init__(self, client_id=None, client_secret=None, user_agent=None):
+        self._credentials = {
+            'client_id': client_id or os.getenv('REDDIT_CLIENT_ID'),
+            'client_secret': client_secret or os.getenv('REDDIT_CLIENT_SECRET'),
+            'user_agent': user_agent or os.getenv('REDDIT_USER_AGENT'),
+        }
+
+    async def search(self, query, subreddit, limit=100, sort='relevance', time_filter='all'):
+        try:
+            import asyncpraw
+        except ImportError as e:
+            raise RuntimeError("asyncpraw is not installed; use HttpSearchBackend or `pip install asyncpraw`.") from e
+        # asyncpraw sessions are bound to the running event loop, so open one per call
+        async with asyncpraw.Reddit(**self._credentials) as reddit:
+            sub = await reddit.subreddit(subreddit)
+            return [post async for post in sub.search(query, limit=limit, sort=sort, time_filter=time_filter)]
+
+    def wait_time(self):
+        return 0.0 # asyncpraw sleeps on Reddit's rate-limit headers itself
+
+
+class AsyncRedditFetcher:
+    """
+    Concurrent fan-out of Reddit searches over several queries and subreddit groups.
+
+    At most `max_concurrency` searches are in flight; before each one the backend's
+    rate-limit scheduler is consulted and the fetcher sleeps until it has room.
+    Results are merged by post id per query, and a post that matches several
+    queries is represented by the same object in each list.
+    """
+
+    def __init__(self, backend=None, max_concurrency=4):
+        self.backend = backend or HttpSearchBackend()
+        self.max_concurrency = max_concurrency
+
+    async def _search_one(self, semaphore, query, subreddit, limit):
+        async with semaphore:
+            delay = self.backend.wait_time()
+            if delay:
+                if delay >= 1:
+                    print(f"Reddit rate limit reached, waiting {delay:.1f}s...")
+                await asyncio.sleep(delay) # Wait here rather than on a worker thread
+            return await self.backend.search(query, subreddit, limit=limit)
+
+    async def search_many_async(self, queries, subreddits, limit=100, on_result=None, on_error=None):
+        """
+        {query: [posts]} for every query across every subreddit group. If given,
+        on_result(query, posts) is called on the event loop's thread as each
+        search completes (posts already merged by id), so callers can start on
+        results while other searches are still in flight; keep it quick.
+        A failed search adds no posts; on_error(query, subreddit, error) is
+        called for it the same way, so callers can tell "failed" from "found nothing".
+        """
+        queries = list(dict.fromkeys(queries)) # Don't search the same query twice
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        by_id = {}
+        merged = {query: {} for query in queries}
+
+        async def search(query, subreddit):
+            try:
+                result = await self._search_one(semaphore, query, subreddit, limit)
+            except Exception as e:
+                print(f"Error searching r/{subreddit} for '{query}': {e}")
+                if on_error is not None:
+                    on_error(query, subreddit, e)
+                return
+            posts = [by_id.setdefault(post.id, post) for post in result]
+            for post in posts:
+                merged[query].setdefault(post.id, post)
+            if on_result is not None:
+                on_result(query, posts)
+
+        await asyncio.gather(*(search(query, subreddit) for query in queries for subreddit in subreddits))
+        return {query: list(posts.values()) for query, posts in merged.items()}
+
+    def search_many(self, queries, subreddits, limit=100, on_result=None, on_error=None):
+        """Blocking wrapper around search_many_async, for use from sync code (Flask views, CLI)."""
+        async def run():
+            # Blocking requests run on the loop's default executor, which only has
+            # min(32, CPUs + 4) threads: too few for max_concurrency on small hosts
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(self.max_concurrency))
+            return await self.search_many_async(queries, subreddits, limit=limit, on_result=on_result,
+                                                on_error=on_error)
+        return asyncio.run(run())
@@ -0,0 +1,85 @@
+import os
+import time
+from collections import deque
+
+SKIPPED_BODIES = {'[deleted]', '[removed]', ''}
+
+
+class CommentItem:
+    """
+    A Reddit comment wrapped so it flows through the same scoring path as a
+    submission: `selftext` is the comment body, `title` is the parent post's title
+    (for display only; comments are scored on their body alone).
+    """
+    kind = 'comment'
+
+    def __init__(self, comment, submission):
+        self.id = f"t1_{comment.id}" # Comment ids are prefixed so they never clash with post ids
+        self.title = submission.title
+        self.selftext = comment.body
+        self.score = comment.score
+        self.created_utc = comment.created_utc
+        self.permalink = comment.permalink
+        self.subreddit = submission.subreddit
+
+
+class CommentHarvester:
+    """
+    Bounded comment expansion for PRAW submissions.
+
+    Each submission's comment tree is requested with `comment_limit` set, so
+    Reddit never sends more than `per_submission` comments, and `replace_more`
+    is called with limit=0 so "load more comments" stubs are dropped instead of
+    triggering extra requests. The tree is walked breadth-first up to
+    `max_depth` (0 = top-level comments only), and harvesting stops once
+    `max_comments` comments have been yielded or `time_budget` seconds have
+    passed. Comments are yielded one at a time and never collected.
+    """
+
+    def __init__(self, max_depth=None, max_comments=None, per_submission=None, time_budget=None):
+        self.max_depth = max_depth if max_depth is not None else int(os.getenv('COMMENTS_MAX_DEPTH', 2))
+        self.max_comments = max_comments if max_comments is not None else int(os.getenv('COMMENTS_MAX_COUNT', 500))
+        self.per_submission = per_submission if per_submission is not None else int(os.getenv('COMMENTS_PER_POST', 50))
+        self.time_budget = time_budget if time_budget is not None else float(os.getenv('COMMENTS_TIME_BUDGET', 10))
+
+    def _iter_tree(self, submission, deadline, remaining):
+        # Must be set before `comments` is first read: that read fetches the tree (PRAW refuses changes after)
+        submission.comment_sort = 'top'
+        submission.comment_limit = self.per_submission
+        forest = submission.comments
+        forest.replace_more(limit=0)
+
+        queue = deque((comment, 0) for comment in forest)
+        yielded = 0
+        while queue and yielded < min(self.per_submission, remaining):
+            if time.monotonic() > deadline:
+                return
+            comment, depth = queue.popleft()
+            if depth < self.max_depth:
+                queue.extend((reply, depth + 1) for reply in comment.replies)
+            if getattr(comment, 'stickied', False) or comment.body in SKIPPED_BODIES:
+                continue
+            yielded += 1
+            yield CommentItem(comment, submission)
+
+    def expand(self, submissions):
+        """
+        Yield each submission followed by its harvested comments. Submissions
+        without a comment tree (e.g. from the JSON search backend) pass through as-is.
+        """
+        deadline = time.monotonic() + self.time_budget
+        harvested = 0
+        for submission in submissions:
+            yield submission
+            if harvested >= self.max_comments or time.monotonic() > deadline:
+                continue # Budget spent: keep streaming submissions, skip their comments
+            # num_comments comes with the listing; `comments` is only looked up on the class, because
+            # reading it on a PRAW submission fetches the whole tree with the default sort and limit
+            if not getattr(submission, 'num_comments', 0) or getattr(type(submission), 'comments', None) is None:
+                continue
+            try:
+                for comment in self._iter_tree(submission, deadline, self.max_comments - harvested):
+                    harvested += 1
+                    yield comment
+            except Exception as e:
+                print(f"Error fetching comments for post {submission.id}: {e}")
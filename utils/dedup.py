@@ -0,0 +1,189 @@
+import hashlib
+import os
+import re
+import threading
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+_PERMUTATIONS = 64
+_rng = np.random.default_rng(20240601)
+# Multiply-shift hash family (odd multipliers), one per MinHash permutation
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, size=_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, size=_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash(tokens, shingle_size=2):
+    """
+    64-value MinHash signature of a token list's word shingles. Uses Python's
+    hash(), so signatures are only comparable within one process (which is all
+    the per-query dedup needs).
+    """
+    if len(tokens) >= shingle_size:
+        features = {tuple(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)}
+    else:
+        features = set(tokens)
+    hashes = np.fromiter((hash(f) for f in features), dtype=np.int64, count=len(features)).view(np.uint64)
+    with np.errstate(over='ignore'): # uint64 wrap-around is the point
+        permuted = (hashes[:, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(32)
+    return permuted.min(axis=0)
+
+
+class _Cluster:
+    __slots__ = ('best', 'best_score', 'emitted')
+
+    def __init__(self, item, score):
+        self.best = item
+        self.best_score = score
+        self.emitted = False
+
+
+class DedupSession:
+    """
+    Duplicate state for one query's results, fed batch by batch with filter().
+
+    An item joins an existing cluster when its normalized text hashes the same
+    (exact duplicate), it crossposts a member, shares a member's crosspost
+    parent or is crossposted by a member (whatever the texts), or the MinHash
+    estimate of its word-bigram Jaccard similarity with a cluster member is at
+    least `threshold` (near duplicate). Within a batch the highest-scored
+    member of each cluster is kept. A cluster already returned by an earlier
+    batch keeps that item: it may already have been streamed, so later members
+    are dropped.
+
+    Near-duplicate candidates come from banded LSH (16 bands of 4 signature
+    values): each lookup only touches the few items sharing a band, so the
+    whole pass stays linear in the number of items.
+    """
+
+    bands = 16
+    rows = _PERMUTATIONS // 16
+
+    def __init__(self, owner, threshold=0.7, min_tokens=8):
+        self.owner = owner
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self._exact = {} # content hash -> cluster
+        self._crossposts = {} # fullname of a member, or of the post a member crossposts -> cluster
+        self._buckets = {} # (band, band bytes) -> [signature row]
+        self._signatures = np.empty((256, _PERMUTATIONS), dtype=np.uint64) # grown by doubling
+        self._row_clusters = [] # signature row -> cluster
+        self.report = {'seen': 0, 'exact': 0, 'crosspost': 0, 'near': 0, 'dropped_chars': 0}
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _near(self, band_keys, signature):
+        """Cluster of the most similar indexed text at or above the threshold, or None."""
+        rows = set()
+        for key in band_keys:
+            rows.update(self._buckets.get(key, ()))
+        if not rows:
+            return None
+        rows = np.fromiter(rows, dtype=np.intp, count=len(rows))
+        # Compare against every candidate at once: common shingles can make a few buckets large
+        agreement = np.count_nonzero(self._signatures[rows] == signature, axis=1)
+        best = int(agreement.argmax())
+        if agreement[best] < self.threshold * _PERMUTATIONS:
+            return None
+        return self._row_clusters[rows[best]]
+
+    def _index(self, band_keys, signature, cluster):
+        row = len(self._row_clusters)
+        if row == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[row] = signature
+        self._row_clusters.append(cluster)
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(row)
+
+    def filter(self, items, text_of, score_of, crosspost_of=None, id_of=None):
+        """
+        Return `items` minus duplicates, in their original order. crosspost_of(item)
+        is the fullname (e.g. 't3_abc') of the post an item crossposts, or None;
+        id_of(item) is the item's own fullname, so crossposts are matched to their
+        original whichever arrives first.
+        """
+        touched = []
+        for item in items:
+            text = text_of(item)
+            tokens = _TOKEN_RE.findall(text.lower()) if isinstance(text, str) else []
+            digest = hashlib.sha1(" ".join(tokens).encode('utf-8')).digest()
+            parent = crosspost_of(item) if crosspost_of is not None else None
+            fullname = id_of(item) if id_of is not None else None
+            score = score_of(item) or 0
+            self.report['seen'] += 1
+
+            cluster, kind = self._exact.get(digest), 'exact'
+            for key in (parent, fullname): # Its original (or a sibling crosspost) seen, or a crosspost of it
+                if cluster is None and key is not None:
+                    cluster, kind = self._crossposts.get(key), 'crosspost'
+            signature = band_keys = None
+            if digest not in self._exact and len(tokens) >= self.min_tokens:
+                # New text: needed for the near-duplicate lookup and/or for indexing below
+                signature = minhash(tokens)
+                band_keys = self._band_keys(signature)
+                if cluster is None:
+                    cluster, kind = self._near(band_keys, signature), 'near'
+
+            if cluster is None:
+                cluster = _Cluster(item, score)
+                touched.append(cluster)
+            else:
+                self.report[kind] += 1
+                if not cluster.emitted and score > cluster.best_score:
+                    dropped, cluster.best, cluster.best_score = cluster.best, item, score
+                else:
+                    dropped = item
+                dropped_text = text_of(dropped)
+                self.report['dropped_chars'] += len(dropped_text) if isinstance(dropped_text, str) else 0
+
+            # Index every distinct member text, so later copies of any of them land in this cluster
+            self._exact.setdefault(digest, cluster)
+            for key in (parent, fullname):
+                if key is not None:
+                    self._crossposts.setdefault(key, cluster)
+            if signature is not None:
+                self._index(band_keys, signature, cluster)
+
+        kept = set()
+        for cluster in touched:
+            cluster.emitted = True
+            kept.add(id(cluster.best))
+        return [item for item in items if id(item) in kept]
+
+    def close(self):
+        """Add this session's counts to the owner's totals and return the session report."""
+        self.owner._record(self.report)
+        return self.report
+
+
+class Deduplicator:
+    """
+    Factory for per-query DedupSessions plus process-wide counters of the
+    scoring work saved. DEDUP_THRESHOLD (default 0.7) is the estimated
+    word-bigram Jaccard similarity at which two texts count as near duplicates,
+    and texts shorter than DEDUP_MIN_TOKENS (default 8) words are only matched exactly.
+    """
+
+    def __init__(self, threshold=None, min_tokens=None):
+        self.threshold = threshold if threshold is not None else float(os.getenv('DEDUP_THRESHOLD', 0.7))
+        self.min_tokens = min_tokens if min_tokens is not None else int(os.getenv('DEDUP_MIN_TOKENS', 8))
+        self._lock = threading.Lock()
+        self.totals = {'seen': 0, 'exact': 0, 'crosspost': 0, 'near': 0, 'dropped_chars': 0}
+
+    def session(self):
+        return DedupSession(self, self.threshold, self.min_tokens)
+
+    def _record(self, report):
+        with self._lock:
+            for key, value in report.items():
+                self.totals[key] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.totals)
+        stats['dropped'] = stats['exact'] + stats['crosspost'] + stats['near']
+        return stats
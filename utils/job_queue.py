@@ -0,0 +1,330 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from utils.response import dumps
+
+# Job states; queued and running jobs are "pending" and absorb identical submissions
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+PENDING = (QUEUED, RUNNING)
+
+
+class JobStore:
+    """
+    SQLite-backed job table shared by every gunicorn worker using the same file.
+
+    A submission whose dedup key matches a queued or running job returns that
+    job instead of adding a new one. Workers claim the oldest queued job in an
+    IMMEDIATE transaction, so a job is only ever run by one of them. Finished
+    jobs (and their results) are kept for `result_ttl` seconds. A running job
+    whose worker stops updating it for `stale_after` seconds (e.g. the process
+    was killed) is queued again once, then failed; live workers update their
+    jobs with heartbeat() well within that.
+    """
+
+    def __init__(self, path=None, result_ttl=None, stale_after=None, max_attempts=2):
+        self.path = path or os.getenv('JOB_DB', 'jobs.sqlite3')
+        self.result_ttl = result_ttl if result_ttl is not None else float(os.getenv('JOB_RESULT_TTL', 3600))
+        self.stale_after = stale_after if stale_after is not None else float(os.getenv('JOB_STALE_AFTER', 120))
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode, so transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            '''CREATE TABLE IF NOT EXISTS jobs (
+                   id TEXT PRIMARY KEY,
+                   kind TEXT NOT NULL,
+                   dedup_key TEXT NOT NULL,
+                   params TEXT NOT NULL,
+                   status TEXT NOT NULL,
+                   progress TEXT,
+                   result BLOB,
+                   error TEXT,
+                   attempts INTEGER NOT NULL DEFAULT 0,
+                   created_at REAL NOT NULL,
+                   updated_at REAL NOT NULL,
+                   finished_at REAL
+               )'''
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (dedup_key, status)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)')
+
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE') # Take the write lock up front: check-then-write stays atomic
+        return conn
+
+    def _run(self, write):
+        conn = self._transaction()
+        try:
+            result = write(conn)
+            conn.execute('COMMIT')
+            return result
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def submit(self, kind, params, dedup_key):
+        """Add a job unless an identical one is pending. Returns (job id, True if it was added)."""
+        def write(conn):
+            row = conn.execute(
+                'SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1',
+                (dedup_key, *PENDING)
+            ).fetchone()
+            if row is not None:
+                return row[0], False
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            conn.execute(
+                '''INSERT INTO jobs (id, kind, dedup_key, params, status, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (job_id, kind, dedup_key, json.dumps(params), QUEUED, now, now)
+            )
+            return job_id, True
+        return self._run(write)
+
+    def claim(self):
+        """Mark the oldest queued job running and return (id, kind, params), or None if there is none."""
+        def write(conn):
+            row = conn.execute(
+                'SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1', (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                         (RUNNING, time.time(), row[0]))
+            return row[0], row[1], json.loads(row[2])
+        return self._run(write)
+
+    def heartbeat(self, job_ids):
+        """Mark running jobs as alive, so purge() doesn't take them for abandoned."""
+        if not job_ids:
+            return
+        job_ids = list(job_ids)
+        self._connect().execute(
+            f"UPDATE jobs SET updated_at = ? WHERE status = ? AND id IN ({', '.join('?' * len(job_ids))})",
+            (time.time(), RUNNING, *job_ids)
+        )
+
+    def progress(self, job_id, progress):
+        """Record a running job's progress (a JSON-serializable dict); also counts as a heartbeat."""
+        self._connect().execute('UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ? AND status = ?',
+                                (dumps(progress).decode('utf-8'), time.time(), job_id, RUNNING))
+
+    def finish(self, job_id, result):
+        now = time.time()
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, updated_at = ?, finished_at = ? WHERE id = ?',
+            (DONE, dumps(result), now, now, job_id)
+        )
+
+    def fail(self, job_id, error):
+        now = time.time()
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ?',
+            (FAILED, error, now, now, job_id)
+        )
+
+    def get(self, job_id):
+        """The job as a dict (params, progress and result decoded), or None if unknown or expired."""
+        row = self._connect().execute(
+            '''SELECT id, kind, params, status, progress, result, error, attempts, created_at, updated_at, finished_at
+               FROM jobs WHERE id = ?''', (job_id,)
+        ).fetchone()
+        if row is None or (row[10] is not None and time.time() - row[10] > self.result_ttl):
+            return None
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'params': json.loads(row[2]),
+            'status': row[3],
+            'progress': json.loads(row[4]) if row[4] else None,
+            'result': json.loads(row[5]) if row[5] is not None else None,
+            'error': row[6],
+            'attempts': row[7],
+            'created_at': row[8],
+            'updated_at': row[9],
+            'finished_at': row[10],
+        }
+
+    def purge(self):
+        """Delete expired finished jobs and requeue (or fail) abandoned running ones. Returns rows deleted."""
+        now = time.time()
+
+        def write(conn):
+            conn.execute(
+                '''UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ? AND attempts < ?''',
+                (QUEUED, now, RUNNING, now - self.stale_after, self.max_attempts)
+            )
+            conn.execute(
+                '''UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ?
+                   WHERE status = ? AND updated_at < ?''',
+                (FAILED, 'The worker running this job stopped.', now, now, RUNNING, now - self.stale_after)
+            )
+            return conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                                (now - self.result_ttl,)).rowcount
+        return self._run(write)
+
+    def stats(self):
+        """Job counts by status."""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        counts.update(self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return counts
+
+
+class JobQueue:
+    """
+    Runs jobs from a JobStore on `workers` background threads in this process
+    (started by start(), or by the first submit). `handlers` maps a job kind to
+    handler(params, report) -> result, where report(dict) records progress.
+    A handler's exception fails the job with its message.
+
+    Every process with a JobQueue on the same store works the same queue:
+    threads are woken at once by submissions made here and otherwise poll
+    every `poll_interval` seconds, so jobs left queued by a previous run are
+    picked up once the queue starts. A heartbeat thread marks this process's
+    running jobs alive every `heartbeat_interval` seconds (default a quarter
+    of the store's stale_after), however long a handler goes without reporting.
+    """
+
+    def __init__(self, store, handlers, workers=None, poll_interval=0.5, purge_interval=60.0, heartbeat_interval=None):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers if workers is not None else int(os.getenv('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.heartbeat_interval = heartbeat_interval or min(30.0, store.stale_after / 4)
+        self._wake = threading.Condition()
+        self._threads = []
+        self._heartbeat = None
+        self._stopped = threading.Event() # Wakes the heartbeat thread on stop()
+        self._running = set() # Ids of the jobs this process's workers are running
+        self._lock = threading.Lock()
+        self._last_purge = float('-inf')
+        self._stopping = False
+
+        self.submitted = 0 # New jobs added by this process
+        self.deduplicated = 0 # Submissions answered with an identical pending job
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the worker and heartbeat threads (if not running), first requeueing abandoned jobs."""
+        with self._lock:
+            if self._threads:
+                return self
+            self._stopping = False
+            self._stopped.clear()
+            self._last_purge = float('-inf') # Purge before the first claim: reclaims jobs a dead worker left running
+            self._threads = [threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                             for i in range(self.workers)]
+            self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+            for thread in self._threads + [self._heartbeat]:
+                thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Let the worker threads finish their current job and exit."""
+        self._stopping = True
+        self._stopped.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads + ([self._heartbeat] if self._heartbeat is not None else []):
+            thread.join(timeout)
+        self._threads = []
+        self._heartbeat = None
+
+    def submit(self, kind, params, dedup_key=None):
+        """Queue a job (or join an identical pending one). Returns (job id, True if it was added)."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'.")
+        if dedup_key is None:
+            dedup_key = f"{kind}:{json.dumps(params, sort_keys=True)}"
+        job_id, created = self.store.submit(kind, params, dedup_key)
+        with self._lock:
+            if created:
+                self.submitted += 1
+            else:
+                self.deduplicated += 1
+        if created:
+            self.start()
+            with self._wake:
+                self._wake.notify()
+        return job_id, created
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        try:
+            self.store.purge()
+        except sqlite3.Error as e:
+            print(f"WARNING: Purging expired jobs failed: {e}")
+
+    def _work(self):
+        while not self._stopping:
+            self._maybe_purge()
+            try:
+                job = self.store.claim()
+            except sqlite3.Error as e:
+                print(f"WARNING: Claiming a job failed: {e}")
+                job = None
+            if job is None:
+                with self._wake:
+                    self._wake.wait(self.poll_interval)
+                continue
+            self._run(*job)
+
+    def _beat(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            with self._lock:
+                running = list(self._running)
+            try:
+                self.store.heartbeat(running)
+            except sqlite3.Error as e:
+                print(f"WARNING: Job heartbeat failed: {e}")
+
+    def _run(self, job_id, kind, params):
+        with self._lock:
+            self._running.add(job_id)
+        try:
+            result = self.handlers[kind](params, lambda progress: self.store.progress(job_id, progress))
+            self.store.finish(job_id, result)
+            with self._lock:
+                self.completed += 1
+        except Exception as e:
+            print(f"Error running {kind} job {job_id}: {str(e)}")
+            try:
+                self.store.fail(job_id, str(e))
+            except sqlite3.Error as store_error:
+                print(f"WARNING: Could not record the failure of job {job_id}: {store_error}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {'workers': len(self._threads), 'submitted': self.submitted, 'deduplicated': self.deduplicated,
+                    'completed': self.completed, 'failed': self.failed}
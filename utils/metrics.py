@@ -0,0 +1,211 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Seconds; spans a cached lookup up to a slow cold Reddit search
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+_metrics = [] # Every metric created below, in creation order, for render()
+_collectors = [] # Callables producing scrape-time samples, see register_collector
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {} # label values tuple -> per-kind state
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(line for key, state in items for line in self._lines(key, state))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonic counter: inc(amount=1, **labels)."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _lines(self, key, value):
+        yield f'{self.name}{_labels(self.labelnames, key)} {_number(value)}'
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observed values (seconds by default)."""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0] # counts, sum, count
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _lines(self, key, state):
+        counts, total, count = state
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            yield f'{self.name}_bucket{_labels(self.labelnames, key, {"le": _number(bound)})} {cumulative}'
+        yield f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}'
+        yield f'{self.name}_count{_labels(self.labelnames, key)} {count}'
+
+
+class Summary(_Metric):
+    """
+    Quantiles over the most recent `window` observations per label set, plus
+    the all-time sum and count. Quantiles are computed at scrape time.
+    """
+    kind = 'summary'
+
+    def __init__(self, name, help, labelnames=(), quantiles=DEFAULT_QUANTILES, window=1024):
+        super().__init__(name, help, labelnames)
+        self.quantiles = quantiles
+        self.window = window
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [deque(maxlen=self.window), 0.0, 0] # recent, sum, count
+            state[0].append(value)
+            state[1] += value
+            state[2] += 1
+
+    def percentiles(self, **labels):
+        """{quantile: value} over the recent window for one label set (empty if nothing observed)."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            recent = sorted(state[0]) if state else []
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in self.quantiles} if recent else {}
+
+    def _lines(self, key, state):
+        recent, total, count = state
+        ordered = sorted(recent)
+        for q in self.quantiles:
+            value = ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float('nan')
+            yield f'{self.name}{_labels(self.labelnames, key, {"quantile": q})} {_number(value)}'
+        yield f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}'
+        yield f'{self.name}_count{_labels(self.labelnames, key)} {count}'
+
+
+def register_collector(collect):
+    """
+    Add a callable run at every scrape for values other components already
+    track (cache and pool counters). It returns an iterable of
+    (name, type, help, [(labels dict, value), ...]).
+    """
+    _collectors.append(collect)
+    return collect
+
+
+def render():
+    """All metrics and collector output in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            families = list(collect())
+        except Exception as e:
+            print(f"WARNING: Metrics collector {getattr(collect, '__name__', collect)} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(labels.keys(), labels.values())} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Pipeline stages: reddit_fetch, dedup, clean, one per scorer (vader, vader_fast, textblob),
+# dataframe, sort and serialize
+STAGE_SECONDS = Histogram('book_review_stage_seconds', 'Seconds spent in each pipeline stage', ('stage',))
+REQUEST_SECONDS = Summary('book_review_request_seconds', 'HTTP request latency by endpoint', ('endpoint',))
+REQUESTS = Counter('book_review_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'status'))
+
+
+def stage(name):
+    """Context manager timing one pass through a pipeline stage."""
+    return STAGE_SECONDS.time(stage=name)
+
+
+def timed_iter(iterable, name):
+    """
+    Yield from `iterable`, recording the total time spent inside it (e.g. a
+    PRAW listing making its network calls) as one `name` stage observation
+    when it is exhausted or closed.
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        STAGE_SECONDS.observe(elapsed, stage=name)
@@ -0,0 +1,32 @@
+import threading
+
+# Resource name -> path probed with nltk.data.find
+NLTK_RESOURCES = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+    'punkt': 'tokenizers/punkt',
+    'wordnet': 'corpora/wordnet',
+    'stopwords': 'corpora/stopwords',
+}
+
+_checked = set()
+_lock = threading.Lock()
+
+
+def ensure_nltk_data(*names):
+    """
+    Make sure the given NLTK resources are installed, downloading any that are
+    missing. Each resource is probed at most once per process, and only when
+    something actually needs it (not at import time).
+    """
+    with _lock:
+        missing = [name for name in names if name not in _checked]
+        if not missing:
+            return
+        import nltk
+        for name in missing:
+            try:
+                nltk.data.find(NLTK_RESOURCES[name])
+            except LookupError:
+                print(f"NLTK '{name}' not found. Downloading...")
+                nltk.download(name)
+            _checked.add(name)
@@ -0,0 +1,102 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class Prefetcher:
+    """
+    Runs an iterator (e.g. a PRAW search listing) on a background thread and
+    hands its items over through a bounded queue, so network fetching keeps
+    going while the consumer is busy scoring.
+
+    Exceptions raised by the source are re-raised in the consumer. Closing the
+    prefetcher (or leaving a `with` block) stops the producer thread.
+    """
+
+    def __init__(self, source, maxsize=200):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._finished = False
+        self._error = None # A source failure held back until the items before it are consumed
+        self._thread = threading.Thread(target=self._produce, args=(source,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, source):
+        try:
+            for item in source:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._put(_Failure(e))
+            return
+        self._put(_DONE)
+
+    def _unwrap(self, item):
+        if item is _DONE:
+            self._finished = True
+            return None
+        if isinstance(item, _Failure):
+            self._finished = True
+            raise item.error
+        return item
+
+    def get_batch(self, max_items):
+        """
+        Block until at least one item is available, then return it together with
+        whatever else is already queued (up to max_items). Returns [] when done.
+        If the source fails partway through a batch, the items received before the
+        failure are returned and the error is raised by the next call.
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self._finished:
+            return []
+        batch = []
+        item = self._unwrap(self._queue.get())
+        if item is None:
+            return batch
+        batch.append(item)
+        while len(batch) < max_items:
+            try:
+                item = self._unwrap(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            except Exception as e:
+                self._error = e
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def __iter__(self):
+        while True:
+            batch = self.get_batch(1)
+            if not batch:
+                return
+            yield batch[0]
+
+    def close(self):
+        self._stop.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
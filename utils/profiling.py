@@ -0,0 +1,78 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+
+try: # Optional: a sampling profiler with a readable call tree
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+# Python allows one active profiler, so only one request is profiled at a time
+_active = threading.Lock()
+
+
+def profiling_enabled():
+    """Per-request profiling is off unless PROFILING_ENABLED=1 (it slows the profiled request down)."""
+    return os.getenv('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+
+def requested_mode(values, headers):
+    """
+    Profiler asked for by ?profile=<mode> or an X-Profile: <mode> header:
+    'cprofile' (also '1' / 'true') or 'pyinstrument'. None if not asked for
+    or profiling is disabled.
+    """
+    if not profiling_enabled():
+        return None
+    mode = (values.get('profile') or headers.get('X-Profile') or '').strip().lower()
+    if not mode or mode in ('0', 'false', 'no'):
+        return None
+    return 'pyinstrument' if mode == 'pyinstrument' else 'cprofile'
+
+
+class RequestProfiler:
+    """Profiles one request with cProfile or pyinstrument (falling back to cProfile when it isn't installed)."""
+
+    def __init__(self, mode='cprofile', top=None):
+        if mode == 'pyinstrument' and PyinstrumentProfiler is None:
+            print("WARNING: pyinstrument is not installed, profiling with cProfile.")
+            mode = 'cprofile'
+        self.mode = mode
+        self.top = top if top is not None else int(os.getenv('PROFILE_TOP', 40))
+        self._profiler = None
+
+    @classmethod
+    def start(cls, mode='cprofile'):
+        """Start profiling the current thread; None if another request is already being profiled."""
+        if not _active.acquire(blocking=False):
+            return None
+        profiler = cls(mode)
+        try:
+            if profiler.mode == 'pyinstrument':
+                profiler._profiler = PyinstrumentProfiler()
+                profiler._profiler.start()
+            else:
+                profiler._profiler = cProfile.Profile()
+                profiler._profiler.enable()
+        except Exception:
+            _active.release()
+            raise
+        return profiler
+
+    def stop(self):
+        """Stop profiling and return the text report."""
+        if self._profiler is None:
+            return ''
+        try:
+            if self.mode == 'pyinstrument':
+                self._profiler.stop()
+                return self._profiler.output_text(unicode=True, color=False)
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+            return out.getvalue()
+        finally:
+            self._profiler = None
+            _active.release()
@@ -0,0 +1,525 @@
+import copy
+import gzip
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+from utils.metrics import Counter
+
+# Statuses worth retrying: rate limited, or Reddit / its CDN briefly unavailable
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504, 520, 522})
+ACCESS_TOKEN_PATH = '/api/v1/access_token'
+# A shared OAuth token is fetched afresh once it has less than this many seconds left
+TOKEN_REFRESH_MARGIN = 60
+
+REDDIT_EVENTS = Counter('book_review_reddit_events_total',
+                        'Reddit request retries, 429 responses, deadline expiries and searches cut short with partial results',
+                        ('event',))
+RATE_LIMIT_WAIT = Counter('book_review_reddit_rate_limit_wait_seconds_total',
+                          'Seconds spent waiting on the Reddit request scheduler')
+
+
+class DeadlineExceeded(Exception):
+    """The time budget for a Reddit fetch ran out."""
+
+
+class RedditUnavailable(Exception):
+    """Reddit kept failing (rate limited, erroring or too slow) and nothing was fetched."""
+
+
+class RedditHTTPError(Exception):
+    def __init__(self, status, retry_after=None, message=None):
+        super().__init__(message or f"Reddit returned HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """A point in (monotonic) time after which a fetch gives up; seconds=None never expires."""
+
+    def __init__(self, seconds=None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        return float('inf') if self.expires_at is None else self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, default):
+        """Socket timeout for the next request: `default`, capped by the time left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Reddit fetch deadline exceeded")
+        return min(default, remaining)
+
+
+def default_deadline():
+    """Deadline for one search, from REDDIT_DEADLINE seconds (default 30; 0 disables)."""
+    seconds = float(os.getenv('REDDIT_DEADLINE', 30))
+    return Deadline(seconds if seconds > 0 else None)
+
+
+# Per thread: the deadline of the running fetch (for the requests PRAW makes on our session)
+# and the thread's PRAW client (see thread_reddit)
+_local = threading.local()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+class TokenBucket:
+    """
+    Request scheduler shared by every Reddit call in the process.
+
+    Tokens refill at `rate` per second up to `capacity` (REDDIT_RATE, default
+    1.5/s, and REDDIT_BURST, default 10, which keeps under Reddit's 100
+    requests a minute). Once responses carry X-Ratelimit-Remaining / -Reset,
+    the rate follows them: what is left of the window is spread evenly over
+    the time until it resets, and when nothing is left callers wait for the
+    reset. A 429 pauses everyone for its Retry-After.
+    """
+
+    def __init__(self, rate=None, capacity=None):
+        self.rate = rate if rate is not None else float(os.getenv('REDDIT_RATE', 1.5))
+        self.capacity = capacity if capacity is not None else float(os.getenv('REDDIT_BURST', 10))
+        self.max_capacity = self.capacity
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _delay(self, now):
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def wait_time(self):
+        """Seconds until a request could be sent."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self._delay(now)
+
+    def acquire(self, deadline=None):
+        """Take a token, waiting for one; raises DeadlineExceeded if that would outlast `deadline`."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._delay(now)
+                if delay <= 0:
+                    self.tokens -= 1
+                    break
+            if deadline is not None and delay >= deadline.remaining():
+                REDDIT_EVENTS.inc(event='deadline_exceeded')
+                raise DeadlineExceeded(f"Reddit rate limit would delay this request by {delay:.1f}s, past its deadline")
+            time.sleep(min(delay, 1.0)) # Re-check: headers from other requests may change the schedule
+            waited += min(delay, 1.0)
+        if waited:
+            RATE_LIMIT_WAIT.inc(waited)
+
+    def update(self, headers):
+        """Follow Reddit's X-Ratelimit-Remaining / X-Ratelimit-Reset response headers."""
+        remaining, reset = headers.get('X-Ratelimit-Remaining'), headers.get('X-Ratelimit-Reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset = float(remaining), max(float(reset), 1.0)
+        except ValueError:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining < 1:
+                self.tokens = 0.0
+                self.paused_until = max(self.paused_until, now + reset)
+            else:
+                self.rate = remaining / reset
+                self.capacity = max(1.0, min(self.max_capacity, remaining))
+                self.tokens = min(self.tokens, self.capacity)
+
+    def pause(self, seconds):
+        """Hold every request for `seconds` (a 429's Retry-After)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, now + seconds)
+
+
+class ConnectionPool:
+    """
+    Keep-alive http.client connections, kept per host and shared by threads.
+    A connection is checked out for one request and returned once the response
+    has been read; at most `max_idle` (REDDIT_POOL_SIZE, default 10) idle
+    connections are kept per host. A request that fails on a reused connection
+    (the server closed it while idle) is retried once on a new one.
+    """
+
+    def __init__(self, max_idle=None):
+        self.max_idle = max_idle if max_idle is not None else int(os.getenv('REDDIT_POOL_SIZE', 10))
+        self._idle = {} # (scheme, host, port) -> [connection, ...]
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def _checkout(self, key, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.opened += 1
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=timeout), False
+
+    def _checkin(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def request(self, method, url, headers=None, body=None, timeout=10):
+        """Send one request; returns (status, headers, body bytes), gzip bodies decoded."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        headers = {'Accept-Encoding': 'gzip', **(headers or {})}
+        for attempt in range(2):
+            connection, reused = self._checkout(key, timeout)
+            try:
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.BadStatusLine):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(key, connection)
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+            return response.status, response.headers, data
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def stats(self):
+        with self._lock:
+            return {'opened': self.opened, 'reused': self.reused,
+                    'idle': sum(len(connections) for connections in self._idle.values())}
+
+
+_shared_lock = threading.Lock()
+_shared_bucket = None
+_shared_pool = None
+_shared_session = None
+
+
+def shared_bucket():
+    """The process-wide TokenBucket every Reddit client schedules on."""
+    global _shared_bucket
+    with _shared_lock:
+        if _shared_bucket is None:
+            _shared_bucket = TokenBucket()
+        return _shared_bucket
+
+
+def shared_pool():
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool()
+        return _shared_pool
+
+
+def _header(headers, name):
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None # An HTTP date; the backoff is used instead
+
+
+def is_transient(error):
+    """True for errors worth retrying: 429 / 5xx responses and network failures (PRAW's or ours)."""
+    error = getattr(error, 'original_exception', None) or error # prawcore wraps network errors
+    if isinstance(error, (DeadlineExceeded, RedditUnavailable)):
+        return False
+    if isinstance(error, RedditHTTPError):
+        return error.status in RETRY_STATUSES
+    status = getattr(getattr(error, 'response', None), 'status_code', None) # prawcore / requests errors
+    if status is not None:
+        return status in RETRY_STATUSES
+    return isinstance(error, OSError) # Connection resets and timeouts (requests' errors are OSErrors too)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait before retrying, if it said."""
+    if isinstance(error, RedditHTTPError):
+        return error.retry_after
+    return _header(getattr(getattr(error, 'response', None), 'headers', None), 'Retry-After')
+
+
+def backoff_delay(attempt, error=None, base=None, cap=None):
+    """
+    Full-jitter exponential backoff (uniform in [0, min(cap, base * 2**attempt)]),
+    but never shorter than the error's Retry-After.
+    """
+    base = base if base is not None else float(os.getenv('REDDIT_BACKOFF_BASE', 0.5))
+    cap = cap if cap is not None else float(os.getenv('REDDIT_BACKOFF_CAP', 8))
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    hint = retry_after(error) if error is not None else None
+    return max(delay, hint or 0.0)
+
+
+def call_with_retries(fn, deadline=None, attempts=None):
+    """
+    fn(), retried with jittered backoff on transient errors up to `attempts`
+    times in all (REDDIT_RETRIES, default 4). Gives up with DeadlineExceeded
+    when the next wait would run past `deadline`.
+    """
+    attempts = attempts if attempts is not None else int(os.getenv('REDDIT_RETRIES', 4))
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt + 1 >= attempts or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            if deadline is not None and delay >= deadline.remaining():
+                REDDIT_EVENTS.inc(event='deadline_exceeded')
+                raise DeadlineExceeded(f"Reddit fetch deadline exceeded after {attempt + 1} attempt(s): {e}") from e
+            REDDIT_EVENTS.inc(event='retry')
+            time.sleep(delay)
+
+
+class RedditHttpClient:
+    """
+    Reddit HTTP calls on the shared connection pool and request scheduler.
+    request() makes one attempt; get() retries transient failures within a deadline.
+    """
+
+    def __init__(self, pool=None, bucket=None, attempts=None):
+        self.pool = pool or shared_pool()
+        self.bucket = bucket or shared_bucket()
+        self.attempts = attempts
+
+    def request(self, method, url, headers=None, body=None, timeout=10, deadline=None, scheduled=True):
+        """One request; raises RedditHTTPError for non-2xx responses. scheduled=False skips the rate limiter."""
+        if scheduled:
+            self.bucket.acquire(deadline)
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        status, response_headers, data = self.pool.request(method, url, headers=headers, body=body, timeout=timeout)
+        if scheduled:
+            self.bucket.update(response_headers)
+        if status == 429:
+            REDDIT_EVENTS.inc(event='rate_limited')
+            wait = _header(response_headers, 'Retry-After') # (An exhausted window already paused the bucket above)
+            wait = 1.0 if wait is None else wait
+            self.bucket.pause(wait)
+            raise RedditHTTPError(status, retry_after=wait)
+        if status >= 400:
+            raise RedditHTTPError(status, retry_after=_header(response_headers, 'Retry-After'))
+        return status, response_headers, data
+
+    def get(self, url, headers=None, timeout=10, deadline=None):
+        return call_with_retries(lambda: self.request('GET', url, headers=headers, timeout=timeout, deadline=deadline)[2],
+                                 deadline, self.attempts)
+
+
+def scheduled_session():
+    """
+    A requests.Session for PRAW on the shared scheduler: every request waits for
+    a token (bounded by the calling thread's deadline_scope), has its timeout
+    capped by that deadline, and feeds the rate-limit headers and 429s back in.
+    Connections are pooled per host (REDDIT_POOL_SIZE) and kept alive.
+
+    OAuth access tokens are shared too: a PRAW client asking for a token with
+    credentials another client already got one for is handed that token with
+    its remaining lifetime, so each thread's client doesn't cost a token request.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class ScheduledSession(requests.Session):
+        def __init__(self):
+            super().__init__()
+            self._tokens = {} # (url, form data, auth) -> (response, payload, monotonic time fetched)
+            self._tokens_lock = threading.Lock()
+
+        def request(self, method, url, *args, **kwargs):
+            if method.upper() == 'POST' and urllib.parse.urlsplit(url).path == ACCESS_TOKEN_PATH:
+                return self._access_token(method, url, *args, **kwargs)
+            return self._scheduled(method, url, *args, **kwargs)
+
+        def _scheduled(self, method, url, *args, **kwargs):
+            bucket = shared_bucket()
+            deadline = current_deadline()
+            bucket.acquire(deadline)
+            if deadline is not None:
+                kwargs['timeout'] = deadline.timeout(kwargs.get('timeout') or 16)
+            response = super().request(method, url, *args, **kwargs)
+            bucket.update(response.headers)
+            if response.status_code == 429:
+                REDDIT_EVENTS.inc(event='rate_limited')
+                wait = _header(response.headers, 'Retry-After')
+                bucket.pause(1.0 if wait is None else wait)
+            return response
+
+        def _access_token(self, method, url, *args, **kwargs):
+            key = (url, repr(kwargs.get('data')), repr(kwargs.get('auth')))
+            with self._tokens_lock: # Threads asking at once wait for one token request
+                cached = self._tokens.get(key)
+                if cached is not None:
+                    response, payload, fetched_at = cached
+                    expires_in = int(payload['expires_in'] - (time.monotonic() - fetched_at))
+                    if expires_in > TOKEN_REFRESH_MARGIN:
+                        shared = copy.copy(response)
+                        shared._content = json.dumps({**payload, 'expires_in': expires_in}).encode('utf-8')
+                        return shared
+                response = self._scheduled(method, url, *args, **kwargs)
+                try:
+                    payload = response.json() if response.status_code == 200 else {}
+                except ValueError:
+                    payload = {}
+                if 'access_token' in payload and 'expires_in' in payload: # Not an error like invalid_grant
+                    self._tokens[key] = (response, payload, time.monotonic())
+                return response
+
+    session = ScheduledSession()
+    pool_size = int(os.getenv('REDDIT_POOL_SIZE', 10))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def shared_session():
+    """The process-wide scheduled_session(), whose connection pool every thread's PRAW client uses."""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = scheduled_session()
+        return _shared_session
+
+
+def thread_reddit():
+    """
+    This thread's praw.Reddit (credentials from .env), created on first use.
+    PRAW clients aren't thread-safe, so each thread gets its own; they all send
+    their requests through shared_session(), so connections, the rate-limit
+    budget and the OAuth token are still shared. Raises if PRAW rejects the
+    configuration; connectivity is not checked here.
+    """
+    reddit = getattr(_local, 'reddit', None)
+    if reddit is None:
+        import praw
+        reddit = _local.reddit = praw.Reddit(
+            client_id=os.getenv('REDDIT_CLIENT_ID'),
+            client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
+            user_agent=os.getenv('REDDIT_USER_AGENT'),
+            requestor_kwargs={'session': shared_session()},
+        )
+    return reddit
+
+
+_END = object()
+
+
+def resumable_listing(search, limit, deadline=None, attempts=None):
+    """
+    Iterate a listing built by search(limit, params), e.g.
+    `lambda limit, params: subreddit.search(query, limit=limit, params=params)`,
+    surviving transient failures: after jittered backoff the listing is
+    re-requested from just after the last item received, so nothing is
+    fetched twice. Runs under `deadline` (default REDDIT_DEADLINE). When the
+    deadline passes or retries run out, the items so far are all there is
+    (with a warning); if there are none, RedditUnavailable is raised.
+    """
+    deadline = deadline or default_deadline()
+    attempts = attempts if attempts is not None else int(os.getenv('REDDIT_RETRIES', 4))
+    received = 0
+    after = None
+    failures = 0
+    while received < limit:
+        items = None
+        try:
+            items = iter(search(limit - received, {'after': after} if after else {}))
+            while received < limit:
+                if deadline.expired():
+                    raise DeadlineExceeded("Reddit fetch deadline exceeded")
+                with deadline_scope(deadline): # Seen by scheduled_session() for the requests PRAW makes here
+                    item = next(items, _END)
+                if item is _END:
+                    return
+                received += 1
+                after = f"t3_{item.id}"
+                failures = 0
+                yield item
+            return
+        except Exception as e:
+            failures += 1
+            error = e
+            if isinstance(e, DeadlineExceeded) or isinstance(getattr(e, 'original_exception', None), DeadlineExceeded):
+                REDDIT_EVENTS.inc(event='deadline_exceeded')
+            elif is_transient(e) and failures < attempts:
+                delay = backoff_delay(failures - 1, e)
+                if delay < deadline.remaining():
+                    REDDIT_EVENTS.inc(event='retry')
+                    print(f"WARNING: Reddit request failed ({e}); retrying in {delay:.1f}s.")
+                    time.sleep(delay)
+                    continue
+                REDDIT_EVENTS.inc(event='deadline_exceeded')
+                error = DeadlineExceeded(f"Reddit fetch deadline exceeded: {e}")
+            elif not is_transient(e):
+                raise
+        finally:
+            if items is not None and hasattr(items, 'close'):
+                items.close()
+        if not received:
+            raise RedditUnavailable(f"Reddit is rate limiting or not responding ({error}); try again shortly.") from error
+        REDDIT_EVENTS.inc(event='partial')
+        print(f"WARNING: Returning {received} posts fetched before Reddit stopped responding: {error}")
+        return
@@ -0,0 +1,91 @@
+import base64
+import gzip
+import json
+
+from flask import Response
+
+from utils.metrics import stage
+
+try: # Optional fast paths; plain json / gzip are used when these aren't installed
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CATEGORIES = ('positive', 'neutral', 'negative')
+DEFAULT_FIELDS = ('id', 'title', 'score', 'sentiment', 'created_utc', 'url', 'subreddit')
+MIN_COMPRESS_BYTES = 1024 # Smaller bodies aren't worth compressing
+
+
+def dumps(payload):
+    """Serialize to UTF-8 JSON bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({'o': offset}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Offset stored in a cursor; malformed or missing cursors start from 0."""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return max(0, int(json.loads(base64.urlsafe_b64decode(padded))['o']))
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+
+def _project(post, fields, snippet):
+    item = {field: post.get(field) for field in fields if field in post}
+    if snippet and post.get('text'):
+        text = post['text']
+        item['snippet'] = text if len(text) <= snippet else text[:snippet].rstrip() + '…'
+    return item
+
+
+def compact_sentiment(sentiment_data, fields=None, snippet=200, page_size=20, category=None, cursor=None):
+    """
+    Compact view of an analyze_sentiment result: only the requested post fields,
+    post bodies replaced by a `snippet` of at most `snippet` characters (0 = none),
+    and each category paginated to `page_size` posts with an opaque next_cursor.
+
+    If `category` is given, only that category's page starting at `cursor` is returned.
+    """
+    fields = tuple(fields) if fields else DEFAULT_FIELDS
+    compact = {key: value for key, value in sentiment_data.items() if not key.endswith('_posts')}
+    categories = (category,) if category in CATEGORIES else CATEGORIES
+    offset = decode_cursor(cursor) if category in CATEGORIES else 0
+
+    for name in categories:
+        posts = sentiment_data.get(f'{name}_posts', [])
+        page = posts[offset:offset + page_size]
+        end = offset + len(page)
+        compact[f'{name}_posts'] = {
+            'items': [_project(post, fields, snippet) for post in page],
+            'total': len(posts),
+            'next_cursor': encode_cursor(end) if end < len(posts) else None
+        }
+    return compact
+
+
+def json_response(payload, status=200, accept_encoding=''):
+    """JSON response serialized with dumps() and compressed with brotli or gzip if the client accepts it."""
+    with stage('serialize'): # Includes compression
+        body = dumps(payload)
+        headers = {'Vary': 'Accept-Encoding'}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').lower().split(',')}
+            if brotli is not None and 'br' in accepted:
+                body = brotli.compress(body, quality=5)
+                headers['Content-Encoding'] = 'br'
+            elif 'gzip' in accepted:
+                body = gzip.compress(body, compresslevel=6)
+                headers['Content-Encoding'] = 'gzip'
+    return Response(body, status=status, mimetype='application/json', headers=headers)
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """In-memory TTL + LRU cache for analysis results, keyed on the normalized query."""
+
+    def __init__(self, ttl=300, max_size=256, stale_ttl=0, single_flight=None):
+        self.ttl = ttl # Seconds an entry is considered fresh
+        self.max_size = max_size # Max number of cached queries before LRU eviction
+        self.stale_ttl = stale_ttl # Extra seconds a stale entry may be served while refreshing
+        # Optional utils/single_flight.SingleFlight: concurrent misses for one key share a single computation
+        self.single_flight = single_flight
+        self._entries = OrderedDict() # key -> (value, stored_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_key(query):
+        """Normalize a search query so 'Dune ' and 'dune' share an entry."""
+        if not isinstance(query, str):
+            return ""
+        return " ".join(query.lower().split())
+
+    def get(self, query):
+        """Return the cached value for a query if it is still fresh, else None."""
+        key = self.normalize_key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, query, value):
+        """Store a value, evicting the least recently used entries if over capacity."""
+        key = self.normalize_key(query)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, query=None):
+        """Drop one query from the cache, or everything if no query is given."""
+        with self._lock:
+            if query is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self.normalize_key(query), None)
+
+    def get_or_compute(self, query, compute, should_cache=None):
+        """
+        Return the cached result for a query, computing it on a miss.
+
+        Entries older than `ttl` but younger than `ttl + stale_ttl` are served
+        immediately while a background thread recomputes them. With a
+        single_flight, concurrent misses for the same key wait for one
+        computation instead of each running their own.
+        """
+        key = self.normalize_key(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[1]
+                if age <= self.ttl:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                if age <= self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._entries.move_to_end(key)
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh, args=(key, query, compute, should_cache), daemon=True
+                        ).start()
+                    return entry[0]
+                del self._entries[key] # Too old to serve at all
+            self.misses += 1
+
+        value = self._compute(key, query, compute)
+        if should_cache is None or should_cache(value):
+            self.set(key, value)
+        return value
+
+    def _compute(self, key, query, compute):
+        if self.single_flight is None:
+            return compute(query)
+        return self.single_flight.do(key, lambda: compute(query))
+
+    def _refresh(self, key, query, compute, should_cache):
+        try:
+            value = self._compute(key, query, compute)
+            if should_cache is None or should_cache(value):
+                self.set(key, value)
+        except Exception as e:
+            print(f"Error refreshing cached result for '{query}': {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """Return cache counters as a plain dict."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
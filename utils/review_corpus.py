@@ -0,0 +1,198 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+_TERM_RE = re.compile(r'\w+')
+
+POST_COLUMNS = ('id', 'kind', 'title', 'text', 'score', 'sentiment', 'sentiment_textblob', 'created_utc', 'url', 'subreddit')
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split()) if isinstance(query, str) else ""
+
+
+def fts_query(query):
+    """Turn free text into an FTS5 query that ANDs every term (each quoted, so no FTS syntax leaks through)."""
+    terms = _TERM_RE.findall(query.lower())
+    return " ".join(f'"{term}"' for term in terms)
+
+
+class ReviewCorpus:
+    """
+    Local, persistent corpus of scored posts and comments with an FTS5 index.
+
+    Posts are stored with their precomputed sentiment columns, so a warm query
+    (one ingested from Reddit within `max_age` seconds) is answered from the
+    local index without any network call or scoring. query_log tracks which
+    queries have been ingested and when, and hands out short leases so several
+    workers don't refresh the same query at once.
+    """
+
+    def __init__(self, path=None, max_age=None):
+        self.path = path or os.getenv('REVIEW_CORPUS_DB', 'review_corpus.sqlite3')
+        self.max_age = max_age if max_age is not None else float(os.getenv('REVIEW_CORPUS_MAX_AGE', 86400))
+        self._local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS posts (
+                rowid INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                kind TEXT, title TEXT, text TEXT, score INTEGER,
+                sentiment REAL, sentiment_textblob REAL,
+                created_utc, url TEXT, subreddit TEXT,
+                ingested_at REAL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                title, text, content='posts', content_rowid='rowid'
+            );
+            CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts(rowid, title, text) VALUES (new.rowid, new.title, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, text) VALUES ('delete', old.rowid, old.title, old.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS posts_au AFTER UPDATE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, text) VALUES ('delete', old.rowid, old.title, old.text);
+                INSERT INTO posts_fts(rowid, title, text) VALUES (new.rowid, new.title, new.text);
+            END;
+            CREATE TABLE IF NOT EXISTS query_log (
+                query TEXT PRIMARY KEY,
+                last_ingested REAL,
+                leased_until REAL DEFAULT 0
+            );
+        ''')
+        conn.commit()
+
+    def add_posts(self, posts):
+        """Insert or update scored post dicts (as produced by ReviewSentimentAnalyzer.score_posts)."""
+        if not posts:
+            return
+        now = time.time()
+        rows = [tuple(post.get(column) for column in POST_COLUMNS) + (now,) for post in posts]
+        conn = self._connect()
+        with conn:
+            conn.executemany(f'''
+                INSERT INTO posts ({", ".join(POST_COLUMNS)}, ingested_at)
+                VALUES ({", ".join("?" * (len(POST_COLUMNS) + 1))})
+                ON CONFLICT(id) DO UPDATE SET
+                    {", ".join(f"{c} = excluded.{c}" for c in POST_COLUMNS[1:])},
+                    ingested_at = excluded.ingested_at
+            ''', rows)
+
+    def mark_ingested(self, query):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                INSERT INTO query_log (query, last_ingested, leased_until) VALUES (?, ?, 0)
+                ON CONFLICT(query) DO UPDATE SET last_ingested = excluded.last_ingested, leased_until = 0
+            ''', (normalize_query(query), time.time()))
+
+    def is_warm(self, query):
+        row = self._connect().execute(
+            'SELECT last_ingested FROM query_log WHERE query = ?', (normalize_query(query),)
+        ).fetchone()
+        return row is not None and row['last_ingested'] is not None and time.time() - row['last_ingested'] <= self.max_age
+
+    def search(self, query, limit=100):
+        """Best-matching stored posts for a query (FTS5 bm25 ranking), as post dicts."""
+        match = fts_query(query)
+        if not match:
+            return []
+        rows = self._connect().execute(f'''
+            SELECT {", ".join("p." + c for c in POST_COLUMNS)}
+            FROM posts_fts JOIN posts p ON p.rowid = posts_fts.rowid
+            WHERE posts_fts MATCH ?
+            ORDER BY bm25(posts_fts)
+            LIMIT ?
+        ''', (match, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stale_queries(self, older_than, limit=5, lease=300):
+        """
+        Claim up to `limit` ingested queries last refreshed more than `older_than`
+        seconds ago. Claimed queries are leased for `lease` seconds so other
+        workers skip them.
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            candidates = [row['query'] for row in conn.execute('''
+                SELECT query FROM query_log
+                WHERE last_ingested < ? AND leased_until < ?
+                ORDER BY last_ingested LIMIT ?
+            ''', (now - older_than, now, limit))]
+            claimed = []
+            for query in candidates:
+                cursor = conn.execute(
+                    'UPDATE query_log SET leased_until = ? WHERE query = ? AND leased_until < ?',
+                    (now + lease, query, now)
+                )
+                if cursor.rowcount:
+                    claimed.append(query)
+        return claimed
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            'posts': conn.execute('SELECT COUNT(*) FROM posts').fetchone()[0],
+            'queries': conn.execute('SELECT COUNT(*) FROM query_log').fetchone()[0],
+        }
+
+
+class CorpusIngester:
+    """
+    Background thread that keeps ingested queries fresh: every `interval`
+    seconds it claims queries older than `refresh_after` and re-fetches them
+    through `fetch(query)`, which is expected to write into the corpus.
+    """
+
+    def __init__(self, corpus, fetch, interval=None, refresh_after=None, batch=5):
+        self.corpus = corpus
+        self.fetch = fetch
+        self.interval = interval if interval is not None else float(os.getenv('REVIEW_CORPUS_INGEST_INTERVAL', 300))
+        self.refresh_after = refresh_after if refresh_after is not None else corpus.max_age / 2
+        self.batch = batch
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Refresh one batch of stale queries; returns the queries refreshed."""
+        refreshed = []
+        for query in self.corpus.stale_queries(self.refresh_after, limit=self.batch):
+            try:
+                self.fetch(query)
+                refreshed.append(query)
+            except Exception as e:
+                print(f"Error refreshing corpus for '{query}': {e}")
+        return refreshed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
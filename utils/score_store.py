@@ -0,0 +1,93 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def content_hash(text):
+    """Stable hash of a post's raw text, used to detect edited posts."""
+    if not isinstance(text, str):
+        text = ""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class PostScoreStore:
+    """
+    SQLite-backed memo of per-post sentiment scores, keyed on Reddit post id.
+
+    A stored row is only reused when the post's content hash still matches, so
+    edited posts are re-scored. Rows with NULL scores mark posts that were too
+    short to score. WAL mode lets several gunicorn workers share the same file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('POST_SCORE_DB', 'post_scores.sqlite3')
+        self._local = threading.local()
+        self._lock = threading.Lock() # Guards the counters; lookups run on several request threads
+        self.hits = 0
+        self.misses = 0
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            '''CREATE TABLE IF NOT EXISTS post_scores (
+                   post_id TEXT PRIMARY KEY,
+                   content_hash TEXT NOT NULL,
+                   sentiment REAL,
+                   sentiment_textblob REAL,
+                   updated_at REAL NOT NULL
+               )'''
+        )
+        conn.commit()
+
+    def get(self, post_id, text_hash):
+        """
+        Return (found, sentiment, sentiment_textblob) for a post.
+        `found` is False when the post is unknown or its content has changed.
+        """
+        row = self._connect().execute(
+            'SELECT content_hash, sentiment, sentiment_textblob FROM post_scores WHERE post_id = ?',
+            (post_id,)
+        ).fetchone()
+        found = row is not None and row[0] == text_hash
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not found:
+            return False, None, None
+        return True, row[1], row[2]
+
+    def put_many(self, rows):
+        """Store (post_id, content_hash, sentiment, sentiment_textblob) tuples in one transaction."""
+        if not rows:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                '''INSERT OR REPLACE INTO post_scores
+                   (post_id, content_hash, sentiment, sentiment_textblob, updated_at)
+                   VALUES (?, ?, ?, ?, ?)''',
+                [(post_id, text_hash, vader, tb, now) for post_id, text_hash, vader, tb in rows]
+            )
+
+    def stats(self):
+        """Return lookup counters for this process."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
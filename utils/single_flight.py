@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try: # POSIX only; elsewhere coalescing stays within one process
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key: one caller (the
+    leader) computes, everyone else asking for that key meanwhile gets the
+    leader's result.
+
+    Within a process, followers wait on the leader's in-flight entry. Across
+    processes (gunicorn workers) the leader holds an flock lease on
+    `<lease_dir>/<key hash>.lock` while computing and then writes the result
+    to `<key hash>.json`; a worker that finds the lease taken waits for it and
+    reads that file instead of computing. Results must be JSON-serializable.
+    A result file also answers requests arriving up to `result_ttl` seconds
+    after it was written, which absorbs bursts that straddle the end of a
+    computation. Waiters give up after `timeout` seconds and compute
+    themselves, so a hung or crashed leader never blocks anyone for good.
+
+    lease_dir=None uses SINGLE_FLIGHT_DIR (default: a directory in the system
+    temp dir); SINGLE_FLIGHT_DIR=off, or a platform without fcntl, keeps
+    coalescing in-process.
+    """
+
+    def __init__(self, lease_dir=None, timeout=None, result_ttl=None, poll_interval=0.05):
+        if lease_dir is None:
+            lease_dir = os.getenv('SINGLE_FLIGHT_DIR', os.path.join(tempfile.gettempdir(), 'book_review_single_flight'))
+        if lease_dir and lease_dir.lower() in ('off', '0', 'false', 'no'):
+            lease_dir = None
+        if lease_dir and fcntl is not None:
+            try:
+                os.makedirs(lease_dir, exist_ok=True)
+            except OSError as e:
+                print(f"WARNING: Single-flight lease directory unavailable, coalescing within this process only: {e}")
+                lease_dir = None
+        self.lease_dir = lease_dir if fcntl is not None else None
+        self.timeout = timeout if timeout is not None else float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 60))
+        self.result_ttl = result_ttl if result_ttl is not None else float(os.getenv('SINGLE_FLIGHT_RESULT_TTL', 5))
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._flights = {} # key -> _Flight
+
+        self.executed = 0 # Computations run by this process
+        self.coalesced_local = 0 # Callers that waited for another thread in this process
+        self.coalesced_remote = 0 # Callers answered by another worker's result file
+        self.timeouts = 0 # Waits that gave up and computed anyway
+
+    def do(self, key, compute):
+        """compute() once for all concurrent callers with this key; returns (or raises) its outcome."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(self.timeout):
+                with self._lock:
+                    self.coalesced_local += 1
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            with self._lock:
+                self.timeouts += 1
+            return self._run(compute)
+
+        try:
+            flight.value = self._lead(key, compute)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _run(self, compute):
+        with self._lock:
+            self.executed += 1
+        return compute()
+
+    def _paths(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.lease_dir, f'{digest}.lock'), os.path.join(self.lease_dir, f'{digest}.json')
+
+    def _lead(self, key, compute):
+        """Compute for this process, sharing the work with other processes through the lease directory."""
+        if self.lease_dir is None:
+            return self._run(compute)
+        lock_path, result_path = self._paths(key)
+        started = time.time()
+        fd = self._acquire(lock_path)
+        try:
+            if fd is not None:
+                found, value = self._read_result(result_path, key, started)
+                if found:
+                    with self._lock:
+                        self.coalesced_remote += 1
+                    return value
+            value = self._run(compute)
+            if fd is not None:
+                self._write_result(result_path, key, value)
+                if self.executed % 256 == 0:
+                    self.prune(older_than=max(3600, 10 * self.timeout))
+            return value
+        finally:
+            if fd is not None:
+                os.close(fd) # Releases the flock
+
+    def _acquire(self, lock_path):
+        """
+        flock the lease file, waiting up to `timeout` for another worker to
+        finish. Returns the locked fd, or None if the wait timed out or the
+        lease file can't be used (the caller then just computes).
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                print(f"WARNING: Single-flight lease {lock_path} unavailable: {e}")
+                return None
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                try: # The file may have been pruned and recreated while we waited; lock the current one
+                    if os.fstat(fd).st_ino == os.stat(lock_path).st_ino:
+                        os.utime(fd) # Keeps prune() away from leases in use
+                        return fd
+                except FileNotFoundError:
+                    pass
+                os.close(fd)
+                continue
+            except BlockingIOError:
+                os.close(fd)
+            if time.monotonic() >= deadline:
+                with self._lock:
+                    self.timeouts += 1
+                return None
+            time.sleep(self.poll_interval)
+
+    def _read_result(self, result_path, key, started):
+        """(True, value) if another worker stored this key's result after we started waiting or within result_ttl."""
+        try:
+            with open(result_path, encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        if record.get('key') != key: # sha1 collision guard
+            return False, None
+        finished = record.get('finished_at', 0)
+        if finished >= started or time.time() - finished <= self.result_ttl:
+            return True, record.get('value')
+        return False, None
+
+    def _write_result(self, result_path, key, value):
+        tmp_path = f'{result_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'finished_at': time.time(), 'value': value}, f)
+            os.replace(tmp_path, result_path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"WARNING: Could not share single-flight result for '{key}': {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def prune(self, older_than=3600):
+        """Delete lease and result files untouched for `older_than` seconds."""
+        if self.lease_dir is None:
+            return 0
+        removed = 0
+        cutoff = time.time() - older_than
+        for name in os.listdir(self.lease_dir):
+            path = os.path.join(self.lease_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'executed': self.executed,
+                'coalesced_local': self.coalesced_local,
+                'coalesced_remote': self.coalesced_remote,
+                'timeouts': self.timeouts,
+            }
@@ -0,0 +1,57 @@
+import re
+
+# Precompiled once at import instead of on every call
+_URL_RE = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+_MARKDOWN_LINK_RE = re.compile(r'\[([^\]]+)\]\([^\)]+\)')
+_DISALLOWED_RE = re.compile(r'[^a-zA-Z0-9\s.,!?\'"-]')
+_SIMPLIFY_DISALLOWED_RE = re.compile(r'[^a-z0-9\s.!?]')
+
+
+def clean_text(text):
+    """
+    Cleaning used before sentiment scoring: drops URLs, keeps markdown link text,
+    and strips everything but letters, digits, whitespace and basic punctuation.
+
+    Equivalent to the old ReviewSentimentAnalyzer.clean_text, minus work that
+    can't change the result: the URL and markdown passes only run when their
+    literal markers are present, and the HTML-tag pass is gone because '<' and
+    '>' are already removed by the character filter.
+    """
+    if not isinstance(text, str):
+        return ""
+    if 'http' in text or 'www' in text:
+        text = _URL_RE.sub('', text)
+    if '](' in text:
+        text = _MARKDOWN_LINK_RE.sub(r'\1', text) # Remove markdown links but keep text
+    # Keep basic punctuation that might affect sentiment (like !, ?)
+    text = _DISALLOWED_RE.sub('', text)
+    return text.strip()
+
+
+def simplify_text(text):
+    """Lowercase, keep only [a-z0-9 .!?] and collapse whitespace (AdvancedReviewAnalyzer.preprocess_text)."""
+    if not isinstance(text, str):
+        return ""
+    text = _SIMPLIFY_DISALLOWED_RE.sub('', text.lower())
+    return ' '.join(text.split())
+
+
+def _is_series(texts):
+    # Duck-typed so pandas isn't imported just to check
+    return hasattr(texts, 'index') and hasattr(texts, 'tolist') and not isinstance(texts, (list, tuple))
+
+
+def clean_batch(texts):
+    """clean_text over a list or Series; returns a list (or a Series with the same index)."""
+    if _is_series(texts):
+        import pandas as pd
+        return pd.Series([clean_text(t) for t in texts.tolist()], index=texts.index, dtype=object)
+    return [clean_text(t) for t in texts]
+
+
+def simplify_batch(texts):
+    """simplify_text over a list or Series; returns a list (or a Series with the same index)."""
+    if _is_series(texts):
+        import pandas as pd
+        return pd.Series([simplify_text(t) for t in texts.tolist()], index=texts.index, dtype=object)
+    return [simplify_text(t) for t in texts]
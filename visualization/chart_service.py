@@ -0,0 +1,190 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from models.trend_engine import TrendEngine, epoch_seconds
+
+CHART_KINDS = ('trend', 'distribution')
+MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+_plotter = None # One SentimentPlotter per worker process (matplotlib is imported there only)
+
+
+def _render_chart(kind, data, fmt, title):
+    """Runs in a worker process: build the figure and return the rendered bytes."""
+    global _plotter
+    import pandas as pd
+    if _plotter is None:
+        from visualization.plotter import SentimentPlotter
+        _plotter = SentimentPlotter()
+    if kind == 'trend':
+        dates, values = data
+        fig = _plotter.plot_sentiment_trend(pd.Series(values, index=pd.DatetimeIndex(dates)), title=title)
+    else:
+        fig = _plotter.plot_sentiment_distribution(pd.Series(data, dtype=float), title=title)
+    return _plotter.render(fig, fmt)
+
+
+def chart_data(sentiment_data, kind):
+    """
+    Plot input from an analyze_sentiment result: the VADER scores for
+    'distribution', or (day, daily mean sentiment) arrays for 'trend'.
+    """
+    posts = [post for category in ('positive', 'neutral', 'negative')
+             for post in sentiment_data.get(f'{category}_posts', [])]
+    sentiments = np.array([post.get('sentiment') for post in posts], dtype=np.float64)
+    if kind == 'distribution':
+        return sentiments
+    engine = TrendEngine()
+    engine.add('', epoch_seconds([post.get('created_utc') for post in posts]), sentiments)
+    starts, means, _ = engine.series('')
+    return starts, means
+
+
+def chart_key(kind, data, fmt, title):
+    """Content hash of everything that affects the rendered chart; doubles as its ETag."""
+    digest = hashlib.sha1(f"{kind}|{fmt}|{title}".encode('utf-8'))
+    for array in (data if kind == 'trend' else (data,)):
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class ChartService:
+    """
+    Renders charts on a process pool and caches the PNG/SVG bytes by content hash.
+
+    Matplotlib is CPU-bound and its rcParams are process-global, so rendering
+    happens in worker processes (spawned on first use; each is recycled after
+    `max_tasks_per_child` charts to keep long-running memory flat). Rendered
+    charts are kept in an LRU cache bounded by `max_bytes`, and concurrent
+    requests for the same chart share a single render.
+    """
+
+    def __init__(self, workers=None, max_bytes=None, max_tasks_per_child=None):
+        self.workers = workers or int(os.getenv('CHART_WORKERS', 2))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('CHART_CACHE_BYTES', 64 * 1024 * 1024))
+        self.max_tasks_per_child = max_tasks_per_child or int(os.getenv('CHART_MAX_TASKS_PER_CHILD', 200))
+        self._cache = OrderedDict() # key -> bytes, least recently used first
+        self._cache_bytes = 0
+        self._pending = {} # key -> Future for renders in progress
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = 0
+        self.renders = 0
+
+    def _get_pool(self):
+        with self._lock: # Two first requests must not each spawn a pool
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    max_tasks_per_child=self.max_tasks_per_child
+                )
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a broken pool (a worker died) so the next render starts a fresh one, and shut it down."""
+        with self._lock:
+            if self._pool is pool: # Not a fresh pool another failed render already replaced it with
+                self._pool = None
+        # Stops its management thread and whatever children are left; wait=False as this may run on that thread
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_cached(self, key):
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _store(self, key, body):
+        with self._lock:
+            self._pending.pop(key, None)
+            if len(body) > self.max_bytes or key in self._cache:
+                return
+            self._cache[key] = body
+            self._cache_bytes += len(body)
+            while self._cache_bytes > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+
+    def submit(self, kind, data, fmt='png', title=None):
+        """Future resolving to (body, key). Served from the cache or joins an in-flight render when possible."""
+        if kind not in CHART_KINDS or fmt not in MIMETYPES:
+            raise ValueError(f"Unsupported chart {kind}.{fmt}")
+        key = chart_key(kind, data, fmt, title)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                done = Future()
+                done.set_result((body, key))
+                return done
+            if key in self._pending:
+                self.hits += 1
+                return self._pending[key]
+            result = Future()
+            self._pending[key] = result
+            self.renders += 1
+
+        def finish(render):
+            try:
+                body = render.result()
+            except BrokenProcessPool as e:
+                with self._lock:
+                    self._pending.pop(key, None)
+                self._discard_pool(pool)
+                result.set_exception(e)
+                return
+            except Exception as e:
+                with self._lock:
+                    self._pending.pop(key, None)
+                result.set_exception(e)
+                return
+            self._store(key, body)
+            result.set_result((body, key))
+
+        for attempt in range(2):
+            pool = None
+            try:
+                pool = self._get_pool()
+                pool.submit(_render_chart, kind, data, fmt, title).add_done_callback(finish)
+                break
+            except Exception as e:
+                if pool is not None:
+                    self._discard_pool(pool)
+                if isinstance(e, BrokenProcessPool) and attempt == 0:
+                    continue # The pool broke since its last render; retry on a fresh one
+                with self._lock:
+                    self._pending.pop(key, None)
+                result.set_exception(e)
+        return result
+
+    def render(self, kind, data, fmt='png', title=None, timeout=60):
+        """Blocking version of submit(): returns (body, key)."""
+        return self.submit(kind, data, fmt, title).result(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached_charts': len(self._cache),
+                'cache_bytes': self._cache_bytes,
+                'hits': self.hits,
+                'renders': self.renders,
+                'in_flight': len(self._pending),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -1,32 +1,40 @@
+import io
+import os
+
 import matplotlib
-matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
+matplotlib.use('Agg')
+import matplotlib.style
+from matplotlib.figure import Figure
 import seaborn as sns
-import pandas as pd
-from datetime import datetime, timedelta
-import numpy as np
-import os
+
+# Figures are built with the object-oriented API (matplotlib.figure.Figure), not
+# pyplot: nothing is registered in pyplot's global figure manager, so figures are
+# freed as soon as they go out of scope and save_plot() no longer has to close them.
 
 
 class SentimentPlotter:
     def __init__(self):
         # Use a different style if preferred
-        # plt.style.use('seaborn-v0_8-darkgrid') 
-        plt.style.use('seaborn-v0_8-whitegrid')
+        # matplotlib.style.use('seaborn-v0_8-darkgrid')
+        matplotlib.style.use('seaborn-v0_8-whitegrid')
         self.figsize = (10, 6) # Slightly smaller default size
 
-    
+    def _figure(self):
+        fig = Figure(figsize=self.figsize)
+        return fig, fig.add_subplot()
+
+    def _no_data(self, ax, message):
+        ax.text(0.5, 0.5, message,
+                horizontalalignment='center', verticalalignment='center', transform=ax.transAxes)
+
     def plot_sentiment_trend(self, sentiment_data, title="Sentiment Trend Over Time"):
         """Plot sentiment trend over time."""
+        fig, ax1 = self._figure()
         if sentiment_data.empty or sentiment_data.isnull().all():
-            fig, ax = plt.subplots(figsize=self.figsize)
-            ax.text(0.5, 0.5, 'No sentiment data available for trend plot',
-                   horizontalalignment='center', verticalalignment='center', transform=ax.transAxes)
-            plt.title(title)
+            self._no_data(ax1, 'No sentiment data available for trend plot')
+            ax1.set_title(title)
             return fig
 
-        fig, ax1 = plt.subplots(figsize=self.figsize)
-
         color = 'tab:blue'
         ax1.set_xlabel('Date')
         ax1.set_ylabel('Average Daily Sentiment Score', color=color)
@@ -34,57 +42,57 @@ class SentimentPlotter:
         ax1.tick_params(axis='y', labelcolor=color)
         ax1.axhline(0, color='grey', lw=0.8, linestyle='--')
 
-        
         if len(sentiment_data) >= 7:
              rolling_avg = sentiment_data.rolling(window=7).mean()
              ax1.plot(rolling_avg.index, rolling_avg.values, color='tab:orange', linestyle='--', label='7-Day Rolling Avg')
 
-        plt.title(title)
+        ax1.set_title(title)
         ax1.legend(loc='upper left')
         fig.tight_layout()
         return fig
 
     def plot_sentiment_distribution(self, sentiment_scores, title="Distribution of Review Sentiments"):
         """Plot distribution of sentiment scores from individual reviews."""
-        plt.figure(figsize=self.figsize)
+        fig, ax = self._figure()
         if sentiment_scores is not None and len(sentiment_scores) > 0:
-            sns.histplot(sentiment_scores, kde=True, bins=20, binrange=(-1, 1))
-            plt.axvline(sentiment_scores.mean(), color='r', linestyle='dashed', linewidth=1, label=f'Mean: {sentiment_scores.mean():.2f}')
-            plt.legend()
+            sns.histplot(sentiment_scores, kde=True, bins=20, binrange=(-1, 1), ax=ax)
+            ax.axvline(sentiment_scores.mean(), color='r', linestyle='dashed', linewidth=1, label=f'Mean: {sentiment_scores.mean():.2f}')
+            ax.legend()
         else:
-            plt.text(0.5, 0.5, 'No sentiment scores available',
-                    horizontalalignment='center', verticalalignment='center', transform=plt.gca().transAxes)
-        plt.title(title)
-        plt.xlabel('Sentiment Score (VADER Compound)')
-        plt.ylabel('Number of Reviews')
-        return plt.gcf() # Get current figure
-
+            self._no_data(ax, 'No sentiment scores available')
+        ax.set_title(title)
+        ax.set_xlabel('Sentiment Score (VADER Compound)')
+        ax.set_ylabel('Number of Reviews')
+        return fig
 
     def plot_quality_scores(self, posts_df, title="Review Quality Distribution"):
         """Plot distribution of calculated review quality scores."""
-        plt.figure(figsize=self.figsize)
+        fig, ax = self._figure()
         if 'quality_score' in posts_df.columns and not posts_df['quality_score'].isnull().all():
-            sns.histplot(posts_df['quality_score'], kde=True)
-            plt.axvline(posts_df['quality_score'].mean(), color='r', linestyle='dashed', linewidth=1, label=f'Mean: {posts_df["quality_score"].mean():.2f}')
-            plt.legend()
+            sns.histplot(posts_df['quality_score'], kde=True, ax=ax)
+            ax.axvline(posts_df['quality_score'].mean(), color='r', linestyle='dashed', linewidth=1, label=f'Mean: {posts_df["quality_score"].mean():.2f}')
+            ax.legend()
         else:
-            plt.text(0.5, 0.5, 'No quality score data available',
-                    horizontalalignment='center', verticalalignment='center', transform=plt.gca().transAxes)
-        plt.title(title)
-        plt.xlabel('Calculated Quality Score')
-        plt.ylabel('Frequency')
-        return plt.gcf()
+            self._no_data(ax, 'No quality score data available')
+        ax.set_title(title)
+        ax.set_xlabel('Calculated Quality Score')
+        ax.set_ylabel('Frequency')
+        return fig
 
+    def render(self, fig, fmt='png'):
+        """Render a figure to PNG or SVG bytes."""
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, bbox_inches='tight')
+        return buffer.getvalue()
 
     def save_plot(self, fig, filename):
         """Save plot to file."""
         try:
             # Ensure the directory exists
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            directory = os.path.dirname(filename)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
             fig.savefig(filename, bbox_inches='tight') # Use tight bounding box
             print(f"Plot saved to {filename}")
         except Exception as e:
             print(f"Error saving plot '{filename}': {str(e)}")
-        finally:
-            # Close the figure to free memory
-            plt.close(fig)
\ No newline at end of file